@@ -0,0 +1,92 @@
+"""
+Бенчмарк заливки платежей во временную таблицу temp_payments:
+COPY FROM STDIN против df.to_sql(method="multi").
+
+Данные генерируются DataGenerator (по умолчанию ~1.2 млн платежей),
+подключение к БД берётся из тех же переменных .env, что и у main.py.
+Транзакции откатываются, поэтому бенчмарк не оставляет данных в БД.
+
+Запуск (из корня проекта):
+    python benchmarks/bench_copy_load.py --num-clients 8000 --chunk-size 100000
+"""
+import os
+import sys
+import argparse
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generation.generator import DataGenerator
+from data_generation.config import FEATURE_CONFIG
+from database.db_extractor import DBExtractor
+
+CREATE_TEMP_SQL = "database/scripts/DDL comands/create_temp_table_payments.sql"
+
+
+def build_payments(num_clients: int, start_loan_date: str, folder: str):
+    """
+    Генерирует DataFrame платежей в том виде, в каком его получает cmd_load
+    (file_name и load_ts передаются отдельно, как constants в incremental_load).
+    """
+    generator = DataGenerator(FEATURE_CONFIG, folder)
+    clients_df = generator.generate_clients_df(num_clients)
+    start_date = datetime.strptime(start_loan_date, "%Y-%m-%d").date()
+    _, payments_df = generator.generate_loans_df(clients_df, start_date)
+
+    return payments_df.reset_index(drop=True)
+
+
+def run_once(extractor: DBExtractor, df, method: str, chunksize) -> float:
+    """Заливает df во временную таблицу выбранным способом и откатывает транзакцию."""
+    sql_create_temp = extractor._read_sql(CREATE_TEMP_SQL)
+
+    with extractor.engine.connect() as conn:
+        trans = conn.begin()
+        conn.execute(text(sql_create_temp))
+        started = time.perf_counter()
+        extractor._set_column_defaults(conn, "temp_payments",
+                                       {'file_name': 'payments_bench.json', 'load_ts': datetime.today()})
+        if method == "copy":
+            extractor._copy_dataframe(conn, df, "temp_payments", chunksize)
+        else:
+            df.to_sql(name="temp_payments", con=conn, index=False,
+                      if_exists="append", method="multi", chunksize=chunksize)
+        elapsed = time.perf_counter() - started
+        trans.rollback()
+
+    return elapsed
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="COPY vs to_sql(multi) для temp_payments")
+    parser.add_argument("--num-clients", type=int, default=8000,
+                        help="Сколько клиентов генерировать (8000 ≈ 1.2 млн платежей при START_LOAN_DATE=2010-01-01)")
+    parser.add_argument("--chunk-size", type=int, default=100_000,
+                        help="Размер порции строк для обоих способов")
+    parser.add_argument("--repeat", type=int, default=1, help="Сколько раз повторить каждый замер")
+    args = parser.parse_args()
+
+    extractor = DBExtractor(
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        host=os.getenv("DB_HOST"), port=int(os.getenv("DB_PORT"))
+    )
+
+    started = time.perf_counter()
+    df = build_payments(args.num_clients, os.getenv("START_LOAN_DATE", "2010-01-01"),
+                        os.getenv("RAW_DIR", "data_generation/raw_files"))
+    print(f"Сгенерировано {len(df):,} платежей за {time.perf_counter() - started:.1f} с")
+
+    for method in ("copy", "multi"):
+        timings = [run_once(extractor, df, method, args.chunk_size) for _ in range(args.repeat)]
+        best = min(timings)
+        print(f"{method:>6}: {best:8.2f} с, {len(df) / best:12,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
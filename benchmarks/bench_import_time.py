@@ -0,0 +1,113 @@
+"""
+Бенчмарк времени старта CLI: что и за сколько импортирует main.py до выполнения подкоманды.
+
+Каждый сценарий запускается отдельным процессом под `python -X importtime`:
+  --help   — сам `python main.py --help` (разбор аргументов без выполнения команды);
+  generate, split, shema/check/explain, load — `import main` плюс модули и библиотеки, которые подкоманда
+             импортирует при работе (без подключения к БД и без чтения файлов, см. GENERATE, SPLIT, DATABASE, LOAD).
+Файл .env не нужен: без него --help работает, а сценарии не подключаются к БД.
+Для сценария выводится медиана суммарного времени импорта (по --repeat запускам), время процесса
+и самые тяжёлые импортированные библиотеки.
+
+Проверки для CI (код выхода 1, если нарушены):
+  - время импорта сценария --help не больше --budget-ms;
+  - сценарий не импортирует пакеты, которые ему не нужны (см. SCENARIOS: например, shema — pandas и Faker).
+
+Запуск (из корня проекта):
+    python benchmarks/bench_import_time.py --budget-ms 150
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("pandas", "numpy", "pyarrow", "faker", "sqlalchemy", "psycopg2")
+
+# Пакеты проекта: их время складывается из импортов библиотек, поэтому в списке самых тяжёлых не показываются
+PROJECT_PACKAGES = {"main", "data_generation", "database", "utils"}
+
+# Модули, которые подкоманды импортируют при работе (внутри функций), а не при старте main.py:
+# генерация — DataGenerator и Faker (пулы ФИО и адресов), разбиение — DataGenerator без Faker,
+# подключение к БД — DBExtractor и диалект psycopg2 (create_engine подгружает его при создании движка),
+# загрузка — вдобавок pandas и numpy (incremental_load, COPY) и pyarrow.parquet (чтение Parquet-частей)
+GENERATE = "from data_generation.generator import DataGenerator, get_faker; get_faker()"
+SPLIT = "from data_generation.generator import DataGenerator"
+DATABASE = "from database.db_extractor import DBExtractor; import sqlalchemy.dialects.postgresql.psycopg2, psycopg2"
+LOAD = f"{DATABASE}; import pandas, numpy, pyarrow.parquet"
+
+# Сценарий: (аргументы python после -X importtime, пакеты, которые он не должен импортировать)
+SCENARIOS = {
+    "--help": (["main.py", "--help"], set(HEAVY)),
+    "generate": (["-c", f"import main; {GENERATE}"], {"sqlalchemy", "psycopg2"}),
+    "split": (["-c", f"import main; {SPLIT}"], {"sqlalchemy", "psycopg2", "faker"}),
+    "shema/check/explain": (["-c", f"import main; {DATABASE}"], {"pandas", "numpy", "pyarrow", "faker"}),
+    "load": (["-c", f"import main; {LOAD}"], {"faker"}),
+}
+
+
+def run_importtime(args: list) -> tuple:
+    """
+    Запускает python -X importtime с аргументами args и разбирает его вывод.
+    Возвращает (суммарное время импорта, мс; время процесса, мс; {пакет: мс}), где время пакета —
+    cumulative его самого внешнего импорта (вместе с тем, что он импортирует сам).
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    packages, total_us = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative) / 1000)
+        if not name.startswith("  "):
+            # модуль верхнего уровня вложенности: его cumulative включает все вложенные импорты
+            total_us += int(cumulative)
+    return total_us / 1000, wall_ms, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта при старте CLI и проверка бюджета")
+    parser.add_argument("--budget-ms", type=float, default=150,
+                        help="Предел времени импорта для main.py --help, мс (по умолчанию 150)")
+    parser.add_argument("--repeat", type=int, default=5, help="Сколько раз запускать каждый сценарий")
+    parser.add_argument("--top", type=int, default=5, help="Сколько самых тяжёлых пакетов показывать")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'сценарий':<20} {'импорт, мс':>11} {'процесс, мс':>12}  самые тяжёлые пакеты")
+    for scenario, (scenario_args, forbidden) in SCENARIOS.items():
+        runs = [run_importtime(scenario_args) for _ in range(args.repeat)]
+        import_ms = statistics.median(run[0] for run in runs)
+        wall_ms = statistics.median(run[1] for run in runs)
+        packages = runs[-1][2]
+
+        heaviest = sorted(
+            ((ms, name) for name, ms in packages.items() if name not in PROJECT_PACKAGES), reverse=True
+        )[:args.top]
+        print(f"{scenario:<20} {import_ms:>11.1f} {wall_ms:>12.1f}  "
+              + ", ".join(f"{name} {ms:.0f}" for ms, name in heaviest))
+
+        unexpected = sorted(forbidden & set(packages))
+        if unexpected:
+            failures.append(f"{scenario}: импортирует {', '.join(unexpected)}")
+        if scenario == "--help" and import_ms > args.budget_ms:
+            failures.append(f"{scenario}: импорт {import_ms:.1f} мс больше бюджета {args.budget_ms:g} мс")
+
+    if failures:
+        print("\n❌  Бюджет старта нарушен:")
+        for failure in failures:
+            print(f"    {failure}")
+        sys.exit(1)
+    print(f"\n✅  Бюджет старта соблюдён (--help не дольше {args.budget_ms:g} мс, лишних импортов нет).")
+
+
+if __name__ == "__main__":
+    main()
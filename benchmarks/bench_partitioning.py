@@ -0,0 +1,154 @@
+"""
+Бенчмарк отчётных запросов по витрине: обычная таблица против секционированной по месяцу payment_date
+(как mart.data_mart после `python main.py shema --partitioned`).
+
+Для каждой глубины истории (по умолчанию 12, 60 и 120 месяцев) во временной схеме bench_partitioning
+создаются две таблицы с колонками витрины, нужными отчёту, и заполняются одинаковыми синтетическими
+платежами (--rows-per-month строк на месяц). Секции создаются той же функцией core.ensure_month_partitions,
+что и при load. Замеряются:
+  - month  — пересчёт сводки за последний месяц (как refresh_overdue_rollup.sql при загрузке новой части);
+  - full   — сводка за всю историю (как полный пересчёт в check_overdue_rollup.sql).
+
+Подключение к БД берётся из тех же переменных .env, что и у main.py; схема bench_partitioning удаляется в конце.
+
+Запуск (из корня проекта):
+    python benchmarks/bench_partitioning.py --months 12 60 120 --rows-per-month 20000
+"""
+import os
+import sys
+import argparse
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_extractor import DBExtractor
+
+SCHEMA = "bench_partitioning"
+FIRST_PERIOD = "2010-01-01"
+
+COLUMNS_SQL = """
+    client_id        INTEGER   NOT NULL,
+    loan_name        TEXT      NOT NULL,
+    loan_amount      INTEGER   NOT NULL,
+    payment_number   SMALLINT  NOT NULL,
+    payment_date     TIMESTAMP NOT NULL,
+    paid_fact_amount INTEGER   NOT NULL,
+    status           BOOLEAN   NOT NULL
+"""
+
+# Строки на месяц: договоры 1..rows_per_month, номер платежа — номер месяца от начала истории
+FILL_SQL = f"""
+INSERT INTO {SCHEMA}.heap_mart
+SELECT
+    i % 5000 + 1,
+    'loan_' || i,
+    (i * 7919) % 990000 + 10000,
+    m + 1,
+    CAST(:first_period AS TIMESTAMP) + make_interval(months => m, days => i % 28),
+    (i * 31) % 50000,
+    (i * 13 + m) % 5 = 0
+FROM generate_series(0, :months - 1) AS m
+CROSS JOIN generate_series(1, :rows_per_month) AS i
+"""
+
+REPORT_SQL = """
+SELECT
+  CASE
+      WHEN m.loan_amount < 50000  THEN 'До 50 000'
+      WHEN m.loan_amount < 100000 THEN 'До 100 000'
+      WHEN m.loan_amount < 500000 THEN 'До 500 000'
+      ELSE 'От 500 000'
+    END AS loan_amount_bucket,
+  date_trunc('month', m.payment_date) AS period,
+  COUNT(DISTINCT (m.client_id, m.loan_name)) AS total_loans,
+  COUNT(DISTINCT m.client_id) AS total_clients,
+  SUM(m.loan_amount) AS sum_issued_loans,
+  COUNT(DISTINCT (m.client_id, m.loan_name)) FILTER (WHERE m.status) AS total_overdue_loans,
+  COALESCE(SUM(m.paid_fact_amount) FILTER (WHERE m.status), 0) AS sum_overdue_payments
+FROM {table} AS m
+WHERE m.payment_date >= :period_from AND m.payment_date < :period_to
+GROUP BY 1, 2
+"""
+
+
+def build_tables(conn, months: int, rows_per_month: int) -> None:
+    """Создаёт обычную и секционированную таблицы и заполняет их одинаковыми данными за months месяцев."""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.heap_mart ({COLUMNS_SQL}, PRIMARY KEY (client_id, loan_name, payment_number))"
+    ))
+    conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.part_mart ({COLUMNS_SQL}, "
+        f"PRIMARY KEY (client_id, loan_name, payment_number, payment_date)) PARTITION BY RANGE (payment_date)"
+    ))
+    conn.execute(text(FILL_SQL), {"first_period": FIRST_PERIOD, "months": months, "rows_per_month": rows_per_month})
+    conn.execute(text(
+        f"SELECT core.ensure_month_partitions('{SCHEMA}.part_mart', MIN(payment_date), MAX(payment_date)) "
+        f"FROM {SCHEMA}.heap_mart"
+    ))
+    conn.execute(text(f"INSERT INTO {SCHEMA}.part_mart SELECT * FROM {SCHEMA}.heap_mart"))
+    conn.execute(text(f"ANALYZE {SCHEMA}.heap_mart"))
+    conn.execute(text(f"ANALYZE {SCHEMA}.part_mart"))
+
+
+def best_time(conn, table: str, params: dict, repeat: int) -> float:
+    """Лучшее из repeat времён выполнения отчёта по таблице table."""
+    sql = text(REPORT_SQL.format(table=f"{SCHEMA}.{table}"))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Отчёты по витрине: обычная таблица vs секции по месяцам")
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 60, 120], help="Глубины истории в месяцах")
+    parser.add_argument("--rows-per-month", type=int, default=20_000, help="Сколько платежей приходится на месяц")
+    parser.add_argument("--repeat", type=int, default=3, help="Сколько раз повторить каждый замер")
+    args = parser.parse_args()
+
+    extractor = DBExtractor(
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+        host=os.getenv("DB_HOST"), port=int(os.getenv("DB_PORT"))
+    )
+    extractor.execute_sql_script("database/scripts/DDL comands/create_shemas.sql")
+    extractor.execute_sql_script("database/scripts/DDL comands/create_partition_functions.sql")
+
+    print(f"{'месяцев':>8} {'строк':>11} {'month: heap, мс':>16} {'секции, мс':>11} "
+          f"{'full: heap, мс':>15} {'секции, мс':>11}")
+    try:
+        for months in args.months:
+            with extractor.engine.begin() as conn:
+                build_tables(conn, months, args.rows_per_month)
+
+            with extractor.engine.connect() as conn:
+                last_period = conn.execute(text(
+                    f"SELECT date_trunc('month', MAX(payment_date)) FROM {SCHEMA}.heap_mart"
+                )).scalar()
+                last_month = {"period_from": last_period, "period_to": last_period.replace(
+                    year=last_period.year + last_period.month // 12, month=last_period.month % 12 + 1
+                )}
+                full_history = {"period_from": FIRST_PERIOD, "period_to": "infinity"}
+
+                timings = [
+                    best_time(conn, table, params, args.repeat) * 1000
+                    for params in (last_month, full_history)
+                    for table in ("heap_mart", "part_mart")
+                ]
+            print(f"{months:>8} {months * args.rows_per_month:>11,} {timings[0]:>16.1f} {timings[1]:>11.1f} "
+                  f"{timings[2]:>15.1f} {timings[3]:>11.1f}")
+    finally:
+        with extractor.engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
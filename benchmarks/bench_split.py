@@ -0,0 +1,108 @@
+"""
+Бенчмарк разбиения «сырых» файлов на части: однопроходный splitter
+(split_jsons_by_loan_start_date) против прежней схемы, где для каждой части
+заново соединялись все платежи с ключами кредитов части и фильтровались клиенты через isin.
+
+Данные генерируются движком numpy во временную папку, части пишутся туда же.
+По умолчанию режим delta: объём файлов частей в нём не зависит от --parts,
+поэтому хорошо видно, зависит ли от количества частей сама работа по разбиению.
+
+Запуск (из корня проекта):
+    python benchmarks/bench_split.py --num-clients 20000 --parts 1 5 50
+"""
+import os
+import sys
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generation.generator import DataGenerator, SPLIT_MODES
+from data_generation.config import FEATURE_CONFIG
+from data_generation.storage import DATA_FORMATS, read_table, table_path, write_table
+
+
+def legacy_split(raw_folder: str, output_dir: str, parts: int, mode: str, data_format: str) -> None:
+    """Прежний алгоритм: на каждую часть — merge всех платежей и isin по всем клиентам."""
+    clients_df = read_table(table_path(raw_folder, "clients", data_format), data_format)
+    loans_df = read_table(table_path(raw_folder, "loans", data_format), data_format)
+    payments_df = read_table(table_path(raw_folder, "payments", data_format), data_format)
+
+    loans_sorted = loans_df.sort_values('loan_start_date', kind='stable').reset_index(drop=True)
+    rows_per_part = len(loans_sorted) // parts + 1
+    seen_client_ids = set()
+
+    for i in range(1, parts + 1):
+        first_row = 0 if mode == "cumulative" else (i - 1) * rows_per_part
+        part_loans = loans_sorted.iloc[first_row: i * rows_per_part]
+        folder = Path(output_dir) / f"part_{i}"
+        folder.mkdir(parents=True, exist_ok=True)
+        write_table(part_loans, table_path(folder, f"loans_{i}", data_format), "loans", data_format)
+
+        part_payments = payments_df.merge(part_loans[['client_id', 'loan_name']], on=['client_id', 'loan_name'])
+        write_table(part_payments, table_path(folder, f"payments_{i}", data_format), "payments", data_format)
+
+        client_ids = part_loans['client_id'].unique()
+        if mode == "delta":
+            client_ids = [client_id for client_id in client_ids if client_id not in seen_client_ids]
+            seen_client_ids.update(client_ids)
+        part_clients = clients_df[clients_df['client_id'].isin(client_ids)]
+        write_table(part_clients, table_path(folder, f"clients_{i}", data_format), "clients", data_format)
+
+
+def count_rows(output_dir: str, parts: int, data_format: str) -> int:
+    """Сколько строк платежей записано во все части (для сверки двух алгоритмов)."""
+    return sum(
+        len(read_table(table_path(Path(output_dir) / f"part_{i}", f"payments_{i}", data_format), data_format))
+        for i in range(1, parts + 1)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Однопроходный splitter vs merge/isin на каждую часть")
+    parser.add_argument("--num-clients", type=int, default=20_000, help="Сколько клиентов генерировать")
+    parser.add_argument("--parts", type=int, nargs="+", default=[1, 5, 50], help="Количества частей для замера")
+    parser.add_argument("--mode", choices=SPLIT_MODES, default="delta", help="Режим разбиения")
+    parser.add_argument("--format", choices=DATA_FORMATS, default="parquet",
+                        help="Формат файлов (parquet — чтобы замер не упирался в разбор JSON)")
+    parser.add_argument("--start-loan-date", default=os.getenv("START_LOAN_DATE", "2010-01-01"))
+    parser.add_argument("--seed", type=int, default=42, help="Зерно numpy.random.Generator")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_split_")
+    try:
+        raw_folder = os.path.join(work_dir, "raw")
+        started = time.perf_counter()
+        generator = DataGenerator(FEATURE_CONFIG, raw_folder, engine="numpy", seed=args.seed, data_format=args.format)
+        generator.generate_data(args.num_clients, args.start_loan_date)
+        payments_total = len(read_table(table_path(raw_folder, "payments", args.format), args.format))
+        print(f"Сгенерировано {payments_total:,} платежей за {time.perf_counter() - started:.1f} с\n")
+
+        print(f"{'частей':>7} {'однопроходный, с':>17} {'merge/isin, с':>14} {'строк платежей':>15}")
+        for parts in args.parts:
+            timings, rows = {}, {}
+            for name in ("single_pass", "legacy"):
+                output_dir = os.path.join(work_dir, f"{name}_{parts}")
+                started = time.perf_counter()
+                if name == "single_pass":
+                    DataGenerator.split_jsons_by_loan_start_date(raw_folder, output_dir, parts, args.mode, args.format)
+                else:
+                    legacy_split(raw_folder, output_dir, parts, args.mode, args.format)
+                timings[name] = time.perf_counter() - started
+                rows[name] = count_rows(output_dir, parts, args.format)
+                shutil.rmtree(output_dir)
+
+            status = "" if rows['single_pass'] == rows['legacy'] else "  (❌ расхождение!)"
+            print(f"{parts:>7} {timings['single_pass']:>17.2f} {timings['legacy']:>14.2f} "
+                  f"{rows['single_pass']:>15,}{status}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Сквозной бенчмарк конвейера generate -> split -> shema -> load на нескольких масштабах
+с проверкой регрессий относительно сохранённого baseline.
+
+Для каждого числа клиентов (--scales) данные генерируются один раз, затем для каждого числа частей (--parts)
+выполняются split, shema и load --all в чистую БД. Команды main.py запускаются отдельными процессами,
+время этапов, пиковый RSS и строки берутся из их JSONL-отчётов (см. utils/stage_timer.py).
+После загрузки замеряется время отчётного запроса к vw_overdue_by_month_and_amount и считаются строки таблиц.
+
+БД — одноразовая: по умолчанию создаётся временный кластер PostgreSQL (initdb + pg_ctl из --pg-bin
+на свободном порту), который удаляется в конце. С --existing-server используется сервер из .env
+(DB_HOST, DB_PORT, DB_USER, DB_PASS), на нём для каждого прогона создаётся и затем удаляется
+отдельная база bench_pipeline_<pid>.
+
+Результаты дописываются строкой JSON в версионируемый файл истории (--results): версия формата,
+время, git-коммит, параметры и замеры каждого прогона. --save-baseline сохраняет их как baseline (--baseline),
+иначе результаты сравниваются с baseline, и метрики, выросшие больше чем на --threshold, помечаются
+как регрессии (код выхода 1).
+
+Запуск (из корня проекта):
+    python benchmarks/run_pipeline.py --scales 1000 100000 1000000 --parts 5 50 --pg-bin /usr/lib/postgresql/16/bin
+    python benchmarks/run_pipeline.py --scales 1000 --parts 5 --existing-server --save-baseline
+"""
+import os
+import sys
+import argparse
+import json
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db_extractor import DBExtractor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+
+# Версия формата файла результатов: меняется, если меняется состав или смысл метрик
+RESULTS_VERSION = 1
+
+# С какого числа клиентов generate запускается потоково (--stream), чтобы не держать всё в памяти
+STREAM_FROM_CLIENTS = 100_000
+
+REPORT_QUERY = "SELECT * FROM vw_overdue_by_month_and_amount"
+COUNT_TABLES = ("core.clients", "core.loans", "core.payments", "mart.data_mart", "mart.overdue_rollup")
+
+# Метрики прогона, которые сравниваются с baseline, и минимальный абсолютный рост, который считается значимым
+COMPARED_METRICS = {
+    "seconds": 0.5,
+    "peak_rss_mb": 20.0,
+    "report_query_ms": 5.0,
+}
+
+
+def free_port() -> int:
+    """Свободный TCP-порт на localhost для временного кластера."""
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> dict:
+    """Текущий коммит и наличие незакоммиченных изменений (None, если git недоступен)."""
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+class ThrowawayCluster:
+    """Временный кластер PostgreSQL: initdb во временную папку, запуск pg_ctl на свободном порту, удаление при выходе."""
+
+    def __init__(self, pg_bin: str, work_dir: str):
+        self.pg_bin = pg_bin
+        self.data_dir = os.path.join(work_dir, "pgdata")
+        self.port = free_port()
+        self.settings = {"DB_HOST": "localhost", "DB_PORT": str(self.port), "DB_USER": "postgres", "DB_PASS": ""}
+
+    def _run(self, tool: str, *args) -> None:
+        subprocess.run([os.path.join(self.pg_bin, tool), *args], check=True, stdout=subprocess.DEVNULL)
+
+    def __enter__(self):
+        self._run("initdb", "-D", self.data_dir, "-U", "postgres", "--auth=trust", "--no-sync")
+        self._run("pg_ctl", "-D", self.data_dir, "-l", os.path.join(self.data_dir, "server.log"), "-w",
+                  "-o", f"-p {self.port} -k {self.data_dir} -c listen_addresses=localhost -c fsync=off", "start")
+        return self
+
+    def __exit__(self, *exc):
+        self._run("pg_ctl", "-D", self.data_dir, "-m", "fast", "-w", "stop")
+
+
+class ExistingServer:
+    """Сервер из .env: отдельные базы прогонов создаются и удаляются на нём."""
+
+    def __init__(self):
+        self.settings = {name: os.getenv(name) for name in ("DB_HOST", "DB_PORT", "DB_USER", "DB_PASS")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def admin_extractor(settings: dict) -> DBExtractor:
+    """Подключение к служебной базе postgres — для создания и удаления баз прогонов."""
+    return DBExtractor(dbname="postgres", user=settings["DB_USER"], password=settings["DB_PASS"],
+                       host=settings["DB_HOST"], port=int(settings["DB_PORT"]), verbose=False)
+
+
+def recreate_database(settings: dict, dbname: str, drop_only: bool = False) -> None:
+    """Пересоздаёт (или только удаляет) базу dbname: CREATE/DROP DATABASE выполняются вне транзакции."""
+    with admin_extractor(settings).engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)'))
+        if not drop_only:
+            conn.execute(text(f'CREATE DATABASE "{dbname}"'))
+
+
+def run_command(args: list, env: dict, report_path: str) -> dict:
+    """Запускает подкоманду main.py отдельным процессом и возвращает сводку из её JSONL-отчёта."""
+    subprocess.run([sys.executable, "main.py", *args, "--report", report_path],
+                   cwd=PROJECT_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(report_path, "r", encoding="utf-8") as f:
+        return json.loads(f.readlines()[-1])
+
+
+def measure_report(extractor: DBExtractor, repeat: int) -> dict:
+    """Время отчётного запроса к vw_overdue_by_month_and_amount (мс) и число строк в таблицах."""
+    timings = []
+    with extractor.engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(text(REPORT_QUERY)).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        rows = {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in COUNT_TABLES}
+    return {"min": round(min(timings), 3), "median": round(statistics.median(timings), 3)}, rows
+
+
+def run_suite(args, server, work_dir: str) -> list:
+    """Все прогоны: generate на каждый масштаб, затем split/shema/load на каждое число частей."""
+    runs = []
+    dbname = f"bench_pipeline_{os.getpid()}"
+    reports_dir = os.path.join(work_dir, "reports")
+
+    for clients in args.scales:
+        raw_dir = os.path.join(work_dir, f"raw_{clients}")
+        env = dict(os.environ, **server.settings, DB_NAME=dbname, RAW_DIR=raw_dir,
+                   START_LOAN_DATE=args.start_loan_date, REPORT_DIR=reports_dir)
+
+        generate_args = ["generate", "--num-clients", str(clients), "--engine", "numpy",
+                         "--format", args.format, "--seed", str(args.seed)]
+        cache_args = [] if args.fixture_cache else ["--no-cache"]
+        if clients >= STREAM_FROM_CLIENTS:
+            generate_args.append("--stream")
+        print(f"▶️  generate: {clients:,} клиентов …")
+        generate = run_command(generate_args + cache_args, env, os.path.join(reports_dir, f"generate_{clients}.jsonl"))
+
+        for parts in args.parts:
+            split_dir = os.path.join(work_dir, f"split_{clients}_{parts}")
+            run_env = dict(env, SPLIT_DIR=split_dir)
+            label = f"{clients}_{parts}"
+            print(f"▶️  {clients:,} клиентов, {parts} частей: split, shema, load …")
+
+            summaries = {"generate": generate}
+            summaries["split"] = run_command(["split", "--parts", str(parts), "--mode", args.mode, "--format", args.format,
+                                              *cache_args],
+                                             run_env, os.path.join(reports_dir, f"split_{label}.jsonl"))
+            recreate_database(server.settings, dbname)
+            try:
+                summaries["shema"] = run_command(["shema"], run_env, os.path.join(reports_dir, f"shema_{label}.jsonl"))
+                summaries["load"] = run_command(["load", "--all"], run_env, os.path.join(reports_dir, f"load_{label}.jsonl"))
+
+                extractor = DBExtractor(dbname=dbname, user=server.settings["DB_USER"], password=server.settings["DB_PASS"],
+                                        host=server.settings["DB_HOST"], port=int(server.settings["DB_PORT"]), verbose=False)
+                report_query_ms, rows = measure_report(extractor, args.repeat)
+            finally:
+                recreate_database(server.settings, dbname, drop_only=True)
+                shutil.rmtree(split_dir, ignore_errors=True)
+
+            runs.append({
+                "clients": clients,
+                "parts": parts,
+                "stages": {
+                    name: {
+                        "seconds": summary["seconds"],
+                        "peak_rss_mb": summary["peak_rss_mb"],
+                        # самые долгие внутренние этапы — чтобы было видно, где именно изменилось время
+                        "top": dict(list(summary["stages"].items())[1:11]),
+                    }
+                    for name, summary in summaries.items()
+                },
+                "rows": rows,
+                "report_query_ms": report_query_ms,
+            })
+            print(f"    load {summaries['load']['seconds']:.1f} с, отчёт {report_query_ms['median']:.1f} мс, "
+                  f"строк в витрине {rows['mart.data_mart']:,}")
+
+        shutil.rmtree(raw_dir, ignore_errors=True)
+    return runs
+
+
+def run_metrics(run: dict) -> dict:
+    """Плоский набор сравниваемых метрик прогона: {'load.seconds': ..., 'report_query_ms': ...}."""
+    metrics = {}
+    for stage, values in run["stages"].items():
+        metrics[f"{stage}.seconds"] = values["seconds"]
+        metrics[f"{stage}.peak_rss_mb"] = values["peak_rss_mb"]
+    metrics["report_query_ms"] = run["report_query_ms"]["median"]
+    return metrics
+
+
+def find_regressions(result: dict, baseline: dict, threshold: float) -> list:
+    """
+    Сравнивает прогоны с одинаковыми (clients, parts) с baseline.
+    Регрессия — метрика выросла больше чем в (1 + threshold) раз и больше минимального значимого прироста.
+    """
+    baseline_runs = {(run["clients"], run["parts"]): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in result["runs"]:
+        base_run = baseline_runs.get((run["clients"], run["parts"]))
+        if base_run is None:
+            continue
+        base_metrics = run_metrics(base_run)
+        for name, value in run_metrics(run).items():
+            base = base_metrics.get(name)
+            min_delta = COMPARED_METRICS[name.rsplit(".", 1)[-1]]
+            if base is not None and value > base * (1 + threshold) and value - base > min_delta:
+                regressions.append({"clients": run["clients"], "parts": run["parts"], "metric": name,
+                                    "baseline": base, "current": value})
+    return regressions
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк generate -> split -> load с проверкой регрессий")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 100_000, 1_000_000], help="Числа клиентов")
+    parser.add_argument("--parts", type=int, nargs="+", default=[5, 50], help="Числа частей")
+    parser.add_argument("--mode", choices=("cumulative", "delta"), default="delta", help="Режим split")
+    parser.add_argument("--format", choices=("json", "parquet"), default="parquet", help="Формат файлов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генерации")
+    parser.add_argument("--start-loan-date", default=os.getenv("START_LOAN_DATE", "2010-01-01"))
+    parser.add_argument("--fixture-cache", action="store_true",
+                        help="Брать данные generate и split из кэша фикстур (их время тогда не сравнимо с baseline)")
+    parser.add_argument("--repeat", type=int, default=5, help="Сколько раз выполнить отчётный запрос")
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN", ""),
+                        help="Папка с initdb и pg_ctl для временного кластера (по умолчанию PG_BIN или PATH)")
+    parser.add_argument("--existing-server", action="store_true",
+                        help="Не создавать кластер, а использовать сервер из .env (с отдельной временной базой)")
+    parser.add_argument("--results", default=os.path.join(RESULTS_DIR, "pipeline_history.jsonl"),
+                        help="Файл истории результатов (JSONL, дописывается)")
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "pipeline_baseline.json"),
+                        help="Файл baseline для проверки регрессий")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как новый baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Допустимый относительный рост метрики относительно baseline (по умолчанию 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    pg_bin = args.pg_bin or os.path.dirname(shutil.which("initdb") or "")
+    if not args.existing_server:
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            parser.error("initdb не запускается от root: запустите бенчмарк от другого пользователя "
+                         "или используйте --existing-server")
+        if not os.path.exists(os.path.join(pg_bin, "initdb")):
+            parser.error("не найден initdb: укажите папку с бинарниками PostgreSQL через --pg-bin или PG_BIN")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        server = ExistingServer() if args.existing_server else ThrowawayCluster(pg_bin, work_dir)
+        with server:
+            with admin_extractor(server.settings).engine.connect() as conn:
+                server_version = conn.execute(text("SHOW server_version")).scalar()
+            runs = run_suite(args, server, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    result = {
+        "results_version": RESULTS_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": git_commit(),
+        "python": sys.version.split()[0],
+        "postgres": server_version,
+        "cpu_count": os.cpu_count(),
+        "config": {"mode": args.mode, "format": args.format, "seed": args.seed, "start_loan_date": args.start_loan_date,
+                   "fixture_cache": args.fixture_cache},
+        "runs": runs,
+    }
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"\n📝  Результаты дописаны в {args.results}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"📌  Baseline сохранён в {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("⚠️  Baseline не найден — сравнивать не с чем (сохраните его через --save-baseline).")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("results_version") != RESULTS_VERSION:
+        print(f"⚠️  Baseline записан в формате версии {baseline.get('results_version')}, "
+              f"текущая — {RESULTS_VERSION}: пересохраните его через --save-baseline.")
+        return
+
+    regressions = find_regressions(result, baseline, args.threshold)
+    if not regressions:
+        print(f"✅  Регрессий относительно baseline ({baseline['git'].get('commit')}) нет.")
+        return
+    print(f"❌  Регрессии относительно baseline ({baseline['git'].get('commit')}), порог {args.threshold:.0%}:")
+    for item in regressions:
+        print(f"    {item['clients']:,} клиентов, {item['parts']} частей, {item['metric']}: "
+              f"{item['baseline']} -> {item['current']}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -89,3 +89,12 @@ FEATURE_CONFIG = {
     # ---- Вклад за неизвестное или пропущенное значение ----
     "unknow": 0.05
 }
+
+# Движки генерации (построчный на random/Faker и векторизованный на numpy.random.Generator),
+# режимы разбиения «сырых» файлов на части, имя файла с описанием разбиения
+# и метка полностью записанной части (по ней load --watch понимает, что часть можно загружать).
+# Объявлены здесь, а не в generator.py, чтобы CLI строил parser без импорта numpy, pandas и Faker.
+GENERATION_ENGINES = ("python", "numpy")
+SPLIT_MODES = ("cumulative", "delta")
+SPLIT_MANIFEST = "manifest.json"
+PART_COMPLETE_MARKER = "_SUCCESS"
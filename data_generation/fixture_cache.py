@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from datetime import date
+from typing import Iterable, Optional
+
+from data_generation.config import PART_COMPLETE_MARKER, SPLIT_MANIFEST
+
+# Папка кэша и его предельный размер по умолчанию (переопределяются FIXTURE_CACHE_DIR и FIXTURE_CACHE_MAX_MB)
+DEFAULT_CACHE_DIR = ".fixture_cache"
+DEFAULT_MAX_MB = 2048
+
+# Описание записи кэша внутри её папки и метка в папке raw: из какой записи кэша взяты «сырые» файлы
+ENTRY_META = "entry.json"
+FIXTURE_MARKER = ".fixture.json"
+
+# Метки готовности частей split: load --watch считает часть готовой по part_N/_SUCCESS (в пределах манифеста),
+# поэтому при восстановлении записи они снимаются до копирования данных и ставятся последними
+COMPLETION_FILES = (SPLIT_MANIFEST, PART_COMPLETE_MARKER)
+
+# Исходники, от которых зависит результат генерации и разбиения: их изменение делает старые записи недействительными
+SOURCE_FILES = ("generator.py", "storage.py")
+
+
+def config_hash(feature_config: dict) -> str:
+    """Короткий хэш конфигурации признаков (FEATURE_CONFIG): ключи сортируются, поэтому порядок не важен."""
+    payload = json.dumps(feature_config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def code_hash() -> str:
+    """Короткий хэш исходников генератора и форматов файлов (SOURCE_FILES)."""
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCE_FILES:
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def list_files(folder: str) -> list:
+    """Относительные пути всех файлов в папке folder (рекурсивно), в отсортированном порядке."""
+    files = []
+    for root, _, names in os.walk(folder):
+        files.extend(os.path.relpath(os.path.join(root, name), folder) for name in names)
+    return sorted(files)
+
+
+def file_stats(folder: str, files: Iterable[str]) -> dict:
+    """Размер и время изменения файлов — по ним проверяется, что файлы не менялись после записи метки."""
+    stats = {}
+    for name in files:
+        st = os.stat(os.path.join(folder, name))
+        stats[name] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+def write_marker(folder: str, key: str, files: Iterable[str]) -> None:
+    """Помечает папку folder как содержащую файлы files из записи кэша key."""
+    with open(os.path.join(folder, FIXTURE_MARKER), 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'files': file_stats(folder, files)}, f, ensure_ascii=False, indent=2)
+
+
+def read_marker(folder: str) -> Optional[str]:
+    """
+    Ключ записи кэша, из которой взяты файлы папки folder, или None —
+    если метки нет или хотя бы один из отмеченных файлов с тех пор изменился или удалён.
+    """
+    try:
+        with open(os.path.join(folder, FIXTURE_MARKER), 'r', encoding='utf-8') as f:
+            marker = json.load(f)
+        if file_stats(folder, marker['files']) != marker['files']:
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return marker['key']
+
+
+def clear_marker(folder: str) -> None:
+    """Снимает метку с папки folder (перед тем как её файлы будут перезаписаны)."""
+    try:
+        os.remove(os.path.join(folder, FIXTURE_MARKER))
+    except FileNotFoundError:
+        pass
+
+
+class FixtureCache:
+    """
+    Дисковый кэш наборов данных: «сырых» файлов generate и частей split.
+
+    Запись кэша — папка <cache_dir>/<key> с копиями файлов и описанием entry.json
+    (параметры, размер, время последнего использования). Ключ — хэш параметров, полностью
+    определяющих содержимое файлов, поэтому повторный запуск с теми же параметрами
+    просто копирует файлы из кэша. Файлы копируются, а не связываются жёсткими ссылками:
+    generate и split перезаписывают свои файлы на месте и испортили бы запись.
+
+    Суммарный размер записей ограничен max_mb: при превышении удаляются записи,
+    которые дольше всего не использовались (LRU).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB):
+        """
+        Параметры:
+        -- cache_dir: папка кэша;
+        -- max_mb: предельный суммарный размер записей в мегабайтах.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(kind: str, **params) -> str:
+        """Ключ записи: хэш вида записи (raw или split) и её параметров."""
+        payload = json.dumps({'kind': kind, **params}, sort_keys=True, ensure_ascii=False, default=str)
+        return f"{kind}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]}"
+
+    def generation_key(self, num_clients: int, seed: int, start_loan_date: str, feature_config: dict,
+                       engine: str, data_format: str, chunk_size: Optional[int] = None) -> tuple:
+        """
+        Ключ и параметры «сырых» файлов generate. Даты клиентов и платежей считаются от сегодняшнего дня,
+        поэтому в ключ входит и текущая дата; chunk_size — только для потоковой генерации (иначе None).
+        """
+        params = {
+            'num_clients': num_clients,
+            'seed': seed,
+            'start_loan_date': start_loan_date,
+            'feature_config': config_hash(feature_config),
+            'today': date.today().isoformat(),
+            'engine': engine,
+            'format': data_format,
+            'chunk_size': chunk_size,
+            'code': code_hash(),
+        }
+        return self.make_key("raw", **params), params
+
+    def split_key(self, raw_key: str, parts: int, mode: str, data_format: str) -> tuple:
+        """Ключ и параметры частей split, полученных из «сырых» файлов записи raw_key."""
+        params = {'raw_key': raw_key, 'parts': parts, 'mode': mode, 'format': data_format, 'code': code_hash()}
+        return self.make_key("split", **params), params
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._entry_dir(key), ENTRY_META), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, folder: str, meta: dict) -> None:
+        with open(os.path.join(folder, ENTRY_META), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def restore(self, key: str, target_dir: str) -> Optional[list]:
+        """
+        Копирует файлы записи key в папку target_dir и отмечает запись использованной.
+        Возвращает список скопированных файлов (относительные пути) или None, если записи нет.
+
+        Метки готовности (COMPLETION_FILES) в target_dir удаляются до копирования, а метки записи
+        копируются после всех остальных файлов (манифест — первым из них, как при split):
+        пока данные перезаписываются, ни одна часть не выглядит готовой.
+        """
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+
+        for root, _, names in os.walk(target_dir):
+            for name in names:
+                if name in COMPLETION_FILES:
+                    os.remove(os.path.join(root, name))
+
+        entry_dir = self._entry_dir(key)
+        markers = [name for name in meta['files'] if os.path.basename(name) in COMPLETION_FILES]
+        markers.sort(key=lambda name: os.path.basename(name) != SPLIT_MANIFEST)
+        data_files = [name for name in meta['files'] if name not in markers]
+        for name in data_files + markers:
+            destination = os.path.join(target_dir, name)
+            os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+            shutil.copy2(os.path.join(entry_dir, name), destination)
+
+        meta['last_used'] = time.time()
+        meta['hits'] = meta.get('hits', 0) + 1
+        self._write_meta(entry_dir, meta)
+        return meta['files']
+
+    def store(self, key: str, source_dir: str, files: Iterable[str], params: Optional[dict] = None) -> bool:
+        """
+        Сохраняет файлы files из папки source_dir как запись key и вытесняет старые записи сверх предела.
+        Запись собирается во временной папке и переименовывается целиком, поэтому прерванное
+        сохранение не оставляет неполной записи. Возвращает False, если запись больше всего кэша.
+        """
+        files = list(files)
+        size = sum(os.path.getsize(os.path.join(source_dir, name)) for name in files)
+        if size > self.max_bytes:
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = os.path.join(self.cache_dir, f".tmp_{key}_{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            for name in files:
+                destination = os.path.join(tmp_dir, name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.copy2(os.path.join(source_dir, name), destination)
+            now = time.time()
+            self._write_meta(tmp_dir, {
+                'key': key, 'params': params or {}, 'files': files, 'size_bytes': size,
+                'created': now, 'last_used': now, 'hits': 0,
+            })
+
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            os.replace(tmp_dir, self._entry_dir(key))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict(keep=key)
+        return True
+
+    def entries(self) -> list:
+        """Описания всех записей кэша (entry.json), от давно не использованных к недавним."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        metas = [self._read_meta(key) for key in os.listdir(self.cache_dir) if not key.startswith('.')]
+        return sorted((meta for meta in metas if meta is not None), key=lambda meta: meta['last_used'])
+
+    def evict(self, keep: Optional[str] = None) -> list:
+        """
+        Удаляет давно не использованные записи, пока суммарный размер больше max_bytes.
+        Запись keep (только что сохранённая) не удаляется. Возвращает ключи удалённых записей.
+        """
+        entries = self.entries()
+        total = sum(meta['size_bytes'] for meta in entries)
+        evicted = []
+        for meta in entries:
+            if total <= self.max_bytes:
+                break
+            if meta['key'] == keep:
+                continue
+            shutil.rmtree(self._entry_dir(meta['key']), ignore_errors=True)
+            total -= meta['size_bytes']
+            evicted.append(meta['key'])
+        return evicted
@@ -1,5 +1,5 @@
+import numpy as np
 import pandas as pd
-from faker import Faker
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import random
@@ -7,12 +7,98 @@ import string
 from typing import Optional, Union, Tuple
 from pathlib import Path
 import os
-fake = Faker('ru_RU')
+import json
+import shutil
+import tempfile
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+from data_generation.storage import (
+    DATA_FORMATS, BATCH_SIZE, detect_format, iter_table_batches, open_table_writer,
+    table_path, write_table
+)
+from data_generation.config import GENERATION_ENGINES, SPLIT_MODES, SPLIT_MANIFEST, PART_COMPLETE_MARKER
+from utils.stage_timer import StageTimer, peak_rss_mb
+
+# Экземпляр Faker('ru_RU') создаётся при первом обращении (get_faker): импорт Faker и загрузка
+# локали заметно удлиняют старт, а нужны они только при генерации клиентов
+_fake = None
+
+# Размер заранее сгенерированных пулов Faker (ФИО, адреса, телефоны) для движка numpy
+FAKER_POOL_SIZE = 10_000
+
+# Паспорт в движке numpy — аффинная перестановка client_id по модулю 10^10:
+# шаг взаимно прост с 10, поэтому разные client_id всегда дают разные номера
+PASSPORT_SPACE = 10 ** 10
+PASSPORT_STRIDE = 7_919_357_131
+
+# Код кредита 'ABC-12345' в движке numpy — такая же перестановка глобального номера кредита
+# (client_id - 1) * max(LOAN_COUNTS) + порядковый номер кредита клиента по модулю 26^3 * 10^5:
+# коды не пересекаются между клиентами, блоками и процессами
+LOAN_CODE_SPACE = 26 ** 3 * 10 ** 5
+LOAN_CODE_STRIDE = 982_451_653
+
+# Количество кредитов у клиента и их вероятности (общие для обоих движков)
+LOAN_COUNTS = [1, 2, 3, 4, 5]
+LOAN_COUNT_WEIGHTS = [0.7, 0.15, 0.1, 0.04, 0.01]
+
+# Поля клиента, влияющие на риск, и соответствующие разделы FEATURE_CONFIG
+RISK_FIELDS = {
+    'gender': 'gender',
+    'education': 'education',
+    'job_type': 'employment_type',
+    'family_status': 'marital_status',
+    'count_of_children': 'children_count',
+}
+
+
+def get_faker():
+    """Общий экземпляр Faker('ru_RU'); при первом вызове импортирует Faker и создаёт экземпляр."""
+    global _fake
+    if _fake is None:
+        from faker import Faker
+
+        _fake = Faker('ru_RU')
+    return _fake
 
 
 class DataGenerator:
-    def __init__(self, feature_config, output_folder: str):
+    # Пулы Faker общие для всех экземпляров: пополняются по мере надобности и переиспользуются
+    _faker_pools = {'fio': [], 'address': [], 'phone': []}
+    _faker_pool_seed = None
+
+    def __init__(self, feature_config, output_folder: str, engine: str = "python", seed: Optional[int] = None,
+                 data_format: str = "json", timer: Optional[StageTimer] = None):
+        """
+        Параметры:
+        -- feature_config: конфигурация признаков клиентов (FEATURE_CONFIG);
+        -- output_folder: папка для «сырых» файлов;
+        -- engine: движок генерации кредитов и платежей ('python' или 'numpy');
+        -- seed: зерно генерации — numpy.random.Generator векторизованного движка, random и Faker построчного
+           (если не задано, выбирается случайно, но одно на весь запуск — его получают все процессы);
+        -- data_format: формат «сырых» файлов ('json' или 'parquet');
+        -- timer: StageTimer для замеров этапов генерации (None — без замеров).
+        """
+        if engine not in GENERATION_ENGINES:
+            raise ValueError(f"Неизвестный движок генерации '{engine}'. Допустимые: {', '.join(GENERATION_ENGINES)}")
+        if data_format not in DATA_FORMATS:
+            raise ValueError(f"Неизвестный формат файлов '{data_format}'. Допустимые: {', '.join(DATA_FORMATS)}")
+
         self.feature_config = feature_config
+        self.engine = engine
+        self.data_format = data_format
+        self.timer = timer or StageTimer(enabled=False)
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.rng = np.random.default_rng(self.seed)
+
+        # Сдвиги перестановок паспортов и кодов кредитов зависят только от seed,
+        # поэтому совпадают во всех блоках и процессах одного запуска
+        offsets_rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(0,)))
+        self.passport_offset = int(offsets_rng.integers(0, PASSPORT_SPACE))
+        self.loan_code_offset = int(offsets_rng.integers(0, LOAN_CODE_SPACE))
+
+        if engine == "python":
+            self.seed_python_engine()
 
         os.makedirs(output_folder, exist_ok=True)
         self.output_folder = output_folder
@@ -25,7 +111,7 @@ class DataGenerator:
     @staticmethod
     def generate_loan_count() -> int:
         """Генерирует количество кредитов для клиента по заданным вероятностям."""
-        return random.choices([1, 2, 3, 4, 5], weights=[0.7, 0.15, 0.1, 0.04, 0.01], k=1)[0]
+        return random.choices(LOAN_COUNTS, weights=LOAN_COUNT_WEIGHTS, k=1)[0]
 
     @staticmethod
     def to_json(df: pd.DataFrame, path) -> None:
@@ -93,6 +179,30 @@ class DataGenerator:
                     risk += d['children_count']['risk_value'][value]
         return min(max(risk, 0), 1)
 
+    def compute_risk_vectorized(self, clients_df: pd.DataFrame) -> np.ndarray:
+        """
+        Векторизованный аналог compute_risk: риск сразу для всех клиентов clients_df.
+        Как и в compute_risk, каждое пропущенное значение любого поля добавляет d['unknow'].
+        """
+        d = self.feature_config
+        risk = np.full(len(clients_df), 0.1)  # базовый
+        today = pd.Timestamp(datetime.today().date())
+
+        for column in clients_df.columns:
+            values = clients_df[column]
+            risk += np.where(values.isna().to_numpy(), d['unknow'], 0.0)
+
+            if column in RISK_FIELDS:
+                risk_values = d[RISK_FIELDS[column]]['risk_value']
+                risk += values.map(risk_values).fillna(0.0).to_numpy(dtype=float)
+            elif column == 'birth_date':
+                age = ((today - pd.to_datetime(values)).dt.days // 365).to_numpy()
+                for age_range, risk_value in d['age']['risk_value'].items():
+                    start, end = map(int, age_range.split('-'))
+                    risk += np.where((age >= start) & (age <= end), risk_value, 0.0)
+
+        return np.clip(risk, 0, 1)
+
     def generate_birth_date(self, today: datetime) -> datetime.date:
         """Генерирует дату рождения на основе возрастных групп из feature_config."""
         age_config = self.feature_config['age']
@@ -105,17 +215,18 @@ class DataGenerator:
         birth_date = (today - timedelta(days=random_days)).date()
         return birth_date
 
-    def generate_clients_df(self, num_clients: int) -> pd.DataFrame:
+    def generate_clients_df(self, num_clients: int, start_id: int = 1) -> pd.DataFrame:
         """
-        Генерирует DataFrame с данными о клиентах.
+        Генерирует DataFrame с данными о клиентах (client_id начиная со start_id).
 
         Колонки: client_id, fio, gender, birth_date, education, count_of_children,
         job_type, region, family_status, address, phone, income.
         """
         today = datetime.today()
+        faker = get_faker()
         records = []
 
-        for i in range(1, num_clients + 1):
+        for i in range(start_id, start_id + num_clients):
             gender, age, education, children, employment, marital, region = [
                 random.choices(k['role'], weights=k['p_value'], k=1)[0]
                 for k in self.feature_config.values()
@@ -124,9 +235,9 @@ class DataGenerator:
             birth_date = self.generate_birth_date(today)
             passport = self.generate_passport_number()
 
-            fio = fake.name()
-            address = fake.address()
-            phone = fake.phone_number()
+            fio = faker.name()
+            address = faker.address()
+            phone = faker.phone_number()
             income = random.randint(20000, 300000)
 
             records.append({
@@ -147,6 +258,108 @@ class DataGenerator:
 
         return pd.DataFrame(records)
 
+    def block_rng(self, block_idx: int) -> np.random.Generator:
+        """
+        Независимый генератор для блока клиентов block_idx, зависящий только от seed и номера блока.
+        Поэтому результат не зависит от того, сколько процессов и в каком порядке считают блоки.
+        """
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(1, block_idx)))
+
+    def seed_python_engine(self, *spawn_key: int) -> None:
+        """
+        Инициализирует модуль random и Faker построчного движка зерном, производным от seed
+        и spawn_key (например, номера блока потоковой генерации), — при одном seed движок python
+        выдаёт одинаковые данные. Пулы Faker векторизованного движка после этого будут собраны заново.
+        """
+        state = int(np.random.SeedSequence(self.seed, spawn_key=(2, *spawn_key)).generate_state(1)[0])
+        random.seed(state)
+        get_faker().seed_instance(state)
+        DataGenerator._faker_pool_seed = None
+
+    @classmethod
+    def get_faker_pools(cls, size: int, seed: Optional[int] = None) -> dict:
+        """
+        Возвращает пулы ФИО, адресов и телефонов не меньше size элементов,
+        догенерируя недостающие значения через Faker. Пулы хранятся на уровне класса;
+        при заданном seed Faker инициализируется им, и i-й элемент пула одинаков в любом процессе.
+        """
+        faker = get_faker()
+        if seed is not None and cls._faker_pool_seed != seed:
+            cls._faker_pools = {'fio': [], 'address': [], 'phone': []}
+            cls._faker_pool_seed = seed
+            faker.seed_instance(seed)
+
+        pools = cls._faker_pools
+        for _ in range(len(pools['fio']), size):
+            pools['fio'].append(faker.name())
+            pools['address'].append(faker.address())
+            pools['phone'].append(faker.phone_number())
+        return {key: np.array(values[:size], dtype=object) for key, values in pools.items()}
+
+    def mask_nan(self, values: np.ndarray, fill_prob: float = 0.2) -> np.ndarray:
+        """Векторизованный аналог maybe_nan: заменяет значения на None с вероятностью fill_prob."""
+        values = values.astype(object)
+        values[self.rng.random(len(values)) <= fill_prob] = None
+        return values
+
+    def generate_passport_numbers(self, client_ids: np.ndarray) -> np.ndarray:
+        """
+        Векторизованно генерирует паспорта 'XX XX XXXXXX' как перестановку client_id:
+        номера уникальны без проверок, что исключает конфликт с uq_clients_passport.
+        """
+        numbers = (self.passport_offset + client_ids.astype(np.int64) * PASSPORT_STRIDE) % PASSPORT_SPACE
+        series = pd.Series(numbers)
+        return (
+            (series // 10 ** 8).astype(str).str.zfill(2) + ' '
+            + (series // 10 ** 6 % 100).astype(str).str.zfill(2) + ' '
+            + (series % 10 ** 6).astype(str).str.zfill(6)
+        ).to_numpy(dtype=object)
+
+    def generate_clients_df_numpy(self, num_clients: int, start_id: int = 1) -> pd.DataFrame:
+        """
+        Векторизованный аналог generate_clients_df: каждый признак из FEATURE_CONFIG выбирается
+        одним вызовом self.rng.choice на всю колонку, ФИО/адреса/телефоны берутся из пулов Faker,
+        паспорта — уникальная перестановка client_id.
+
+        Параметры:
+        -- num_clients: сколько клиентов генерировать;
+        -- start_id: client_id первого клиента.
+        """
+        rng = self.rng
+        config = self.feature_config
+        client_ids = np.arange(start_id, start_id + num_clients)
+
+        def choose(feature: str) -> np.ndarray:
+            return rng.choice(np.array(config[feature]['role'], dtype=object), size=num_clients, p=config[feature]['p_value'])
+
+        # дата рождения: возрастная группа, затем случайное число дней внутри неё
+        age_bounds = np.array([list(map(int, group.split('-'))) for group in config['age']['role']]) * 365
+        age_group = rng.choice(len(age_bounds), size=num_clients, p=config['age']['p_value'])
+        age_days = rng.integers(age_bounds[age_group, 0], age_bounds[age_group, 1], endpoint=True)
+        birth_date = np.datetime64(datetime.today().date(), 'D') - age_days
+
+        pools = self.get_faker_pools(min(num_clients, FAKER_POOL_SIZE), self.seed)
+        pool_size = len(pools['fio'])
+
+        children = choose('children_count').astype(float)
+        children[rng.random(num_clients) <= 0.2] = np.nan
+
+        return pd.DataFrame({
+            'client_id': client_ids,
+            'fio': pools['fio'][rng.integers(0, pool_size, size=num_clients)],
+            'passport': self.generate_passport_numbers(client_ids),
+            'gender': choose('gender'),
+            'birth_date': self.iso_dates(birth_date),
+            'education': choose('education'),
+            'count_of_children': children,
+            'job_type': choose('employment_type'),
+            'region': self.mask_nan(choose('region')),
+            'family_status': self.mask_nan(choose('marital_status')),
+            'address': self.mask_nan(pools['address'][rng.integers(0, pool_size, size=num_clients)]),
+            'phone': self.mask_nan(pools['phone'][rng.integers(0, pool_size, size=num_clients)]),
+            'income': rng.integers(20000, 300000, size=num_clients, endpoint=True)
+        })
+
     def generate_loans_df(self, clients_df: pd.DataFrame, loan_start_date: datetime.date) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Генерирует два DataFrame:
@@ -220,77 +433,378 @@ class DataGenerator:
 
         return sort_schedule, sort_payments
 
+    def generate_loan_codes(self, loan_index: np.ndarray) -> np.ndarray:
+        """
+        Векторизованно строит коды кредита вида 'ABC-12345' по глобальным номерам кредитов:
+        перестановка по модулю LOAN_CODE_SPACE даёт разные коды для разных номеров.
+        """
+        numbers = (self.loan_code_offset + loan_index.astype(np.int64) * LOAN_CODE_STRIDE) % LOAN_CODE_SPACE
+        letters_number, digits_number = numbers // 10 ** 5, numbers % 10 ** 5
+        alphabet = np.array(list(string.ascii_uppercase))
+        letters = np.stack([alphabet[letters_number // 26 ** k % 26] for k in (2, 1, 0)], axis=1)
+        digits = np.array(list(string.digits))[np.stack([digits_number // 10 ** k % 10 for k in range(4, -1, -1)], axis=1)]
+        dash = np.full((len(numbers), 1), '-')
+        chars = np.ascontiguousarray(np.concatenate([letters, dash, digits], axis=1))
+        return chars.view('<U9').ravel().astype(object)
+
+    @staticmethod
+    def iso_dates(dates: np.ndarray) -> np.ndarray:
+        """
+        Переводит массив datetime64[D] в строки 'YYYY-MM-DD' (object):
+        форматируются только уникальные даты, которых на порядки меньше, чем строк.
+        """
+        unique_dates, inverse = np.unique(dates, return_inverse=True)
+        return np.datetime_as_string(unique_dates, unit='D').astype(object)[inverse]
+
+    def generate_loans_df_numpy(self, clients_df: pd.DataFrame, loan_start_date: datetime.date) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Векторизованный аналог generate_loans_df: те же два DataFrame с той же схемой и теми же
+        распределениями, но все случайные величины (число кредитов, даты начала, суммы, график,
+        просрочки и недоплаты) выбираются целыми массивами из self.rng (numpy.random.Generator).
+        """
+        rng = self.rng
+        today = datetime.today().date()
+        risk = self.compute_risk_vectorized(clients_df)
+
+        # --- кредиты: по n_loans строк на клиента ---
+        n_loans = rng.choice(LOAN_COUNTS, size=len(clients_df), p=LOAN_COUNT_WEIGHTS)
+        client_idx = np.repeat(np.arange(len(clients_df)), n_loans)
+        total_loans = len(client_idx)
+
+        max_days = (today - loan_start_date).days
+        loan_start = np.datetime64(loan_start_date, 'D') + rng.integers(0, max_days, size=total_loans, endpoint=True)
+        start_month = loan_start.astype('datetime64[M]')
+        num_months = (np.datetime64(today, 'M') - start_month).astype(np.int64) + 1
+
+        loan_amount = rng.integers(10_000, 1_000_000, size=total_loans, endpoint=True)
+        monthly_payment = np.round(loan_amount / num_months).astype(np.int64)
+        client_ids = clients_df['client_id'].to_numpy()[client_idx]
+        loan_of_client = np.arange(total_loans) - np.repeat(np.cumsum(n_loans) - n_loans, n_loans)
+        loan_name = self.generate_loan_codes((client_ids - 1) * max(LOAN_COUNTS) + loan_of_client)
+
+        loan_schedule = pd.DataFrame({
+            'client_id': client_ids,
+            'loan_name': loan_name,
+            'loan_amount': loan_amount,
+            'loan_start_date': self.iso_dates(loan_start),
+            'loan_end_date': today.isoformat(),
+            'payment_numbers': num_months,
+            'paid_amount': monthly_payment
+        })
+
+        # --- платежи: по num_months строк на кредит ---
+        loan_idx = np.repeat(np.arange(total_loans), num_months)
+        total_payments = len(loan_idx)
+        month_offset = np.arange(total_payments) - np.repeat(np.cumsum(num_months) - num_months, num_months)
+
+        # аналог loan_start + relativedelta(months=month): день месяца «прижимается» к концу короткого месяца
+        payment_month = start_month[loan_idx] + month_offset
+        start_day = (loan_start - start_month.astype('datetime64[D]')).astype(np.int64)
+        month_length = ((payment_month + 1).astype('datetime64[D]') - payment_month.astype('datetime64[D]')).astype(np.int64)
+        payment_date = payment_month.astype('datetime64[D]') + np.minimum(start_day[loan_idx], month_length - 1)
+
+        actual_payment = monthly_payment[loan_idx].copy()
+        payment_fact_date = payment_date - rng.integers(0, 20, size=total_payments, endpoint=True)
+
+        payment_risk = risk[client_idx][loan_idx]
+        risky = (payment_risk > 0.3) & (rng.random(total_payments) < payment_risk)
+        underpaid = risky & (rng.random(total_payments) < 0.5)
+        delayed = risky & ~underpaid
+
+        actual_payment[underpaid] -= rng.integers(1, actual_payment[underpaid], endpoint=True)
+        payment_fact_date[delayed] = payment_date[delayed] + rng.integers(1, 30, size=int(delayed.sum()), endpoint=True)
+
+        loan_payments = pd.DataFrame({
+            'client_id': client_ids[loan_idx],
+            'loan_name': loan_name[loan_idx],
+            'payment_number': month_offset + 1,
+            'payment_date': self.iso_dates(payment_date),
+            'payment_fact_date': self.iso_dates(payment_fact_date),
+            'paid_fact_amount': actual_payment,
+            'loan_start_date': self.iso_dates(loan_start)[loan_idx]
+        })
+
+        sort_schedule = loan_schedule.sort_values('loan_start_date', kind='stable')
+        sort_payments = (
+            loan_payments
+            .sort_values(['loan_start_date', 'payment_number'], kind='stable')
+            .drop('loan_start_date', axis=1)
+        )
+
+        return sort_schedule, sort_payments
+
     def generate_data(self, num_clients: int, loan_start_date: str) -> None:
         """
         Основной метод генерации данных:
-        1) генерирует клиентов и сохраняет в JSON
-        2) генерирует кредиты и платежи и сохраняет тоже в JSON
-        Принимает именованные аргументы:
-          clients_file, loans_file, payments_file — пути до JSON-файлов.
+        1) генерирует клиентов и сохраняет в JSON (или Parquet, см. data_format)
+        2) генерирует кредиты и платежи и сохраняет в том же формате
+        Файлы: clients, loans, payments с расширением формата в папке output_folder.
         """
         # Преобразование строк в даты
         start_date = datetime.strptime(loan_start_date, "%Y-%m-%d").date()
 
-        clients_path = f"{self.output_folder}/clients.json"
-        loans_path = f"{self.output_folder}/loans.json"
-        payments_path = f"{self.output_folder}/payments.json"
+        clients_path = table_path(self.output_folder, "clients", self.data_format)
+        loans_path = table_path(self.output_folder, "loans", self.data_format)
+        payments_path = table_path(self.output_folder, "payments", self.data_format)
 
         # Генерация клиентов
-        clients_df = self.generate_clients_df(num_clients)
-        clients_df.to_json(clients_path, orient='records', indent=2, force_ascii=False)
+        with self.timer.stage("generate_clients", rows_in=num_clients, engine=self.engine) as stage:
+            if self.engine == "numpy":
+                clients_df = self.generate_clients_df_numpy(num_clients)
+            else:
+                clients_df = self.generate_clients_df(num_clients)
+            stage['rows_out'] = len(clients_df)
+        with self.timer.stage("write_clients", rows_in=len(clients_df), data_format=self.data_format):
+            write_table(clients_df, clients_path, "clients", self.data_format)
 
         # Генерация займов и платежей
-        loan_schedule_df, loan_payments_df = self.generate_loans_df(clients_df, start_date)
-        loan_schedule_df.to_json(loans_path, orient='records', indent=2, force_ascii=False)
-        loan_payments_df.to_json(payments_path, orient='records', indent=2, force_ascii=False)
+        with self.timer.stage("generate_loans", rows_in=len(clients_df), engine=self.engine) as stage:
+            if self.engine == "numpy":
+                loan_schedule_df, loan_payments_df = self.generate_loans_df_numpy(clients_df, start_date)
+            else:
+                loan_schedule_df, loan_payments_df = self.generate_loans_df(clients_df, start_date)
+            stage['rows_out'] = len(loan_schedule_df) + len(loan_payments_df)
+        with self.timer.stage("write_loans", rows_in=len(loan_schedule_df), data_format=self.data_format):
+            write_table(loan_schedule_df, loans_path, "loans", self.data_format)
+        with self.timer.stage("write_payments", rows_in=len(loan_payments_df), data_format=self.data_format):
+            write_table(loan_payments_df, payments_path, "payments", self.data_format)
+
+    def generate_block(self, start_id: int, num_clients: int, start_date: datetime.date) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Генерирует один блок данных: num_clients клиентов начиная со start_id, их кредиты и платежи.
+        У платежей сохраняется колонка loan_start_date — она нужна для глобальной сортировки.
+        """
+        if self.engine == "numpy":
+            clients_df = self.generate_clients_df_numpy(num_clients, start_id)
+            loans_df, payments_df = self.generate_loans_df_numpy(clients_df, start_date)
+        else:
+            clients_df = self.generate_clients_df(num_clients, start_id)
+            loans_df, payments_df = self.generate_loans_df(clients_df, start_date)
+
+        payments_df = payments_df.merge(
+            loans_df[['client_id', 'loan_name', 'loan_start_date']], on=['client_id', 'loan_name'], how='left'
+        )
+        return clients_df, loans_df, payments_df
+
+    @staticmethod
+    def spool_block(spool_dir: str, block_idx: int, clients_df: pd.DataFrame, loans_df: pd.DataFrame, payments_df: pd.DataFrame) -> None:
+        """
+        Сбрасывает блок на диск:
+          spool_dir/clients/<block>.jsonl — клиенты блока (NDJSON, склеиваются без разбора);
+          spool_dir/loans/<YYYY-MM>/<block>.pkl и spool_dir/payments/<YYYY-MM>/<block>.pkl —
+          кредиты и платежи, разложенные по месяцу даты старта кредита (bucket-ы для внешней сортировки).
+          Bucket-ы пишутся pickle-ом, чтобы при сборке не разбирать JSON повторно.
+        """
+        block_name = f"{block_idx:06d}"
+        clients_folder = Path(spool_dir) / "clients"
+        clients_folder.mkdir(parents=True, exist_ok=True)
+        clients_df.to_json(clients_folder / f"{block_name}.jsonl", orient='records', lines=True, force_ascii=False)
 
+        for table, df in (("loans", loans_df), ("payments", payments_df)):
+            for month, bucket_df in df.groupby(df['loan_start_date'].str[:7], sort=False):
+                bucket_folder = Path(spool_dir) / table / month
+                bucket_folder.mkdir(parents=True, exist_ok=True)
+                bucket_df.to_pickle(bucket_folder / f"{block_name}.pkl")
 
     @staticmethod
-    def split_jsons_by_loan_start_date(raw_files_folder: str, output_dir: str, parts: int = 5):
+    def merge_spool(spool_dir: str, output_folder: str, data_format: str = "json") -> dict:
         """
-        Разбивает три JSON-файла (clients.json, loans.json, payments.json)
-        из папки raw_files_folder на N кумулятивных частей по дате старта кредита.
+        Собирает clients, loans и payments (JSON или Parquet) из spool-папки:
+        клиенты склеиваются в порядке блоков, кредиты и платежи — по bucket-ам месяцев
+        в хронологическом порядке, внутри bucket-а строки сортируются в памяти (устойчиво).
+        В памяти одновременно находится не больше одного bucket-а.
 
-        В output_dir будут созданы подпапки:
-          parts/part_1, parts/part_2, …, parts/part_N
-        и внутри каждой — три JSON: clients_i.json, loans_i.json, payments_i.json.
-        """
-        clients_path = f"{raw_files_folder}/clients.json"
-        loans_path = f"{raw_files_folder}/loans.json"
-        payments_path = f"{raw_files_folder}/payments.json"
-
-        clients_df = pd.read_json(clients_path)
-        loans_df = pd.read_json(loans_path)
-        payments_df = pd.read_json(payments_path)
-
-        # сортируем кредиты по дате начала
-        loans_sorted = loans_df.sort_values('loan_start_date').reset_index(drop=True)
-        total_loans = len(loans_sorted)
-        rows_per_part = total_loans // parts + 1
-
-        for i in range(1, parts + 1):
-            part_loans = loans_sorted.iloc[: i * rows_per_part].copy()
-
-            # сохраняем кредиты
-            part_loans_folder = Path(output_dir) / f"part_{i}"
-            part_loans_folder.mkdir(parents=True, exist_ok=True)
-            part_loans.to_json(
-                part_loans_folder / f"loans_{i}.json",
-                orient='records', indent=2, force_ascii=False
-            )
+        Возвращает количество записанных строк по каждому файлу.
+        """
+        spool = Path(spool_dir)
+        counts = {}
+
+        def open_writer(table: str):
+            return open_table_writer(table_path(output_folder, table, data_format), table, data_format)
+
+        with open_writer("clients") as writer:
+            for block_file in sorted((spool / "clients").glob("*.jsonl")):
+                writer.write_ndjson_file(block_file)
+            counts['clients'] = writer.rows
+
+        sort_keys = {"loans": ['loan_start_date'], "payments": ['loan_start_date', 'payment_number']}
+        for table, keys in sort_keys.items():
+            with open_writer(table) as writer:
+                table_folder = spool / table
+                months = sorted(p.name for p in table_folder.iterdir()) if table_folder.exists() else []
+                for month in months:
+                    bucket_df = pd.concat(
+                        [pd.read_pickle(f) for f in sorted((table_folder / month).glob("*.pkl"))],
+                        ignore_index=True
+                    ).sort_values(keys, kind='stable')
+                    if table == "payments":
+                        bucket_df = bucket_df.drop('loan_start_date', axis=1)
+                    writer.write_frame(bucket_df)
+                counts[table] = writer.rows
+
+        return counts
+
+    def generate_data_stream(self, num_clients: int, loan_start_date: str, chunk_size: int = 50_000, workers: int = 1) -> dict:
+        """
+        Потоковая генерация для объёмов больше оперативной памяти:
+        клиенты генерируются блоками по chunk_size, каждый блок вместе с кредитами и платежами
+        сразу сбрасывается на диск (spool_block), а итоговые JSON собираются внешней
+        bucket-сортировкой по месяцу старта кредита (merge_spool). Пиковая память ограничена
+        размером блока и одного bucket-а, а не всем набором данных.
 
-            # платежи для этих кредитов
-            part_keys = part_loans[['client_id', 'loan_name']]
-            part_payments = payments_df.merge(part_keys, on=['client_id', 'loan_name'], how='inner')
-            part_payments.to_json(
-                part_loans_folder / f"payments_{i}.json",
-                orient='records', indent=2, force_ascii=False
-            )
+        При workers > 1 блоки (шарды по диапазонам client_id) считаются в отдельных процессах.
+        Каждый блок получает свой генератор block_rng(block_idx), а сборка идёт в порядке блоков,
+        поэтому при одном seed и chunk_size результат побайтно одинаков при любом числе процессов.
+
+        Возвращает количество строк по файлам и пиковый RSS процесса (МБ).
+        """
+        if workers > 1 and self.engine != "numpy":
+            raise ValueError("Параллельная генерация (workers > 1) доступна только для движка numpy.")
 
-            # клиенты, участвующие в этой части
-            client_ids = part_loans['client_id'].unique()
-            part_clients = clients_df[clients_df['client_id'].isin(client_ids)]
-            part_clients.to_json(
-                part_loans_folder / f"clients_{i}.json",
-                orient='records', indent=2, force_ascii=False
+        start_date = datetime.strptime(loan_start_date, "%Y-%m-%d").date()
+        spool_dir = tempfile.mkdtemp(prefix=".spool_", dir=self.output_folder)
+        tasks = [
+            (self.feature_config, self.output_folder, self.engine, self.seed, spool_dir,
+             block_idx, start_id, min(chunk_size, num_clients - start_id + 1), start_date)
+            for block_idx, start_id in enumerate(range(1, num_clients + 1, chunk_size))
+        ]
+
+        try:
+            with self.timer.stage("generate_blocks", rows_in=num_clients, blocks=len(tasks), workers=workers):
+                if workers > 1:
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        list(executor.map(generate_block_task, tasks))
+                else:
+                    for task in tasks:
+                        generate_block_task(task)
+
+            with self.timer.stage("merge_spool", data_format=self.data_format) as stage:
+                stats = self.merge_spool(spool_dir, self.output_folder, self.data_format)
+                stage['rows_out'] = sum(stats.values())
+                stage['affected'] = dict(stats)
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+        stats['peak_rss_mb'] = peak_rss_mb()
+        return stats
+
+    @staticmethod
+    def split_jsons_by_loan_start_date(raw_files_folder: str, output_dir: str, parts: int = 5, mode: str = "cumulative",
+                                       data_format: str = "json", batch_size: int = BATCH_SIZE,
+                                       timer: Optional[StageTimer] = None):
+        """
+        Разбивает три «сырых» файла (clients, loans, payments — JSON или Parquet)
+        из папки raw_files_folder на N частей по дате старта кредита.
+
+        Режимы (mode):
+          cumulative — part_i содержит все кредиты частей 1..i, их платежи и клиентов;
+          delta      — part_i содержит только новые кредиты своего окна дат, их платежи
+                       и только тех клиентов, которые ещё не встречались в предыдущих частях
+                       (в «сырых» данных у клиента одна версия строки, поэтому изменённых клиентов нет).
+
+        В output_dir будут созданы подпапки:
+          parts/part_1, parts/part_2, …, parts/part_N
+        и внутри каждой — три файла формата data_format: clients_i, loans_i, payments_i
+        и пустой файл-метка _SUCCESS, который появляется после того, как все файлы части записаны,
+        а также файл manifest.json с режимом, количеством частей и форматом.
+        «Сырые» файлы читаются в том формате, в котором они есть (сначала ищется data_format).
+
+        Разбиение однопроходное: каждому кредиту один раз назначается номер части
+        (по позиции в отсортированном по дате старта списке), платежи получают его одним
+        хэш-соединением по (client_id, loan_name), клиенты — минимальный номер части своих кредитов.
+        Затем клиенты и платежи читаются один раз порциями по batch_size строк и раскладываются
+        сразу по всем частям: строка с номером части k попадает в part_k (delta) или в part_k..part_N
+        (cumulative). Объём работы не зависит от parts (кроме самого объёма кумулятивных файлов).
+        В памяти целиком держатся только кредиты.
+        Этапы (чтение и запись кредитов, раскладка платежей и клиентов) замеряются таймером timer, если он задан.
+        """
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Неизвестный режим разбиения '{mode}'. Допустимые: {', '.join(SPLIT_MODES)}")
+        if data_format not in DATA_FORMATS:
+            raise ValueError(f"Неизвестный формат файлов '{data_format}'. Допустимые: {', '.join(DATA_FORMATS)}")
+
+        raw_files = {}
+        for table in ("clients", "loans", "payments"):
+            raw_format = detect_format(raw_files_folder, table, preferred=data_format)
+            if raw_format is None:
+                raise FileNotFoundError(f"В папке '{raw_files_folder}' нет файла {table} ни в одном из форматов.")
+            raw_files[table] = (table_path(raw_files_folder, table, raw_format), raw_format)
+
+        def raw_batches(table: str):
+            path, raw_format = raw_files[table]
+            return iter_table_batches(path, raw_format, batch_size)
+
+        timer = timer or StageTimer(enabled=False)
+
+        # сортируем кредиты по дате начала и один раз назначаем каждому номер части
+        with timer.stage("split_assign_loans", parts=parts, mode=mode) as stage:
+            loans_df = pd.concat(raw_batches("loans"), ignore_index=True)
+            loans_sorted = loans_df.sort_values('loan_start_date', kind='stable').reset_index(drop=True)
+            rows_per_part = len(loans_sorted) // parts + 1
+            loan_parts = loans_sorted[['client_id', 'loan_name']].assign(
+                part=np.arange(len(loans_sorted)) // rows_per_part + 1
             )
+            client_parts = loan_parts.groupby('client_id', sort=False)['part'].min().rename('part').reset_index()
+            stage['rows_in'] = len(loans_df)
+
+        part_folders = []
+        with timer.stage("split_write_loans", data_format=data_format) as stage:
+            stage['rows_out'] = 0
+            for i in range(1, parts + 1):
+                part_folder = Path(output_dir) / f"part_{i}"
+                part_folder.mkdir(parents=True, exist_ok=True)
+                (part_folder / PART_COMPLETE_MARKER).unlink(missing_ok=True)
+                part_folders.append(part_folder)
+
+                # кредиты части — срез отсортированного списка
+                first_row = 0 if mode == "cumulative" else (i - 1) * rows_per_part
+                part_loans = loans_sorted.iloc[first_row: i * rows_per_part]
+                write_table(part_loans, table_path(part_folder, f"loans_{i}", data_format), "loans", data_format)
+                stage['rows_out'] += len(part_loans)
+
+        def route(table: str, assignment: pd.DataFrame, key) -> None:
+            """Один проход по таблице table: каждая порция раскладывается по файлам всех частей."""
+            with timer.stage(f"split_route_{table}", data_format=data_format) as stage, ExitStack() as stack:
+                writers = [
+                    stack.enter_context(open_table_writer(table_path(folder, f"{table}_{i}", data_format), table, data_format))
+                    for i, folder in enumerate(part_folders, start=1)
+                ]
+                stage['rows_in'] = 0
+                for batch in raw_batches(table):
+                    stage['rows_in'] += len(batch)
+                    batch = batch.merge(assignment, on=key, how='inner')
+                    batch_parts = batch.pop('part').to_numpy()
+                    if mode == "delta":
+                        # строка попадает только в свою часть
+                        for part, part_batch in batch.groupby(batch_parts, sort=False):
+                            writers[part - 1].write_frame(part_batch)
+                    else:
+                        # строка попадает в свою часть и во все следующие
+                        for i, writer in enumerate(writers, start=1):
+                            writer.write_frame(batch[batch_parts <= i])
+                stage['rows_out'] = sum(writer.rows for writer in writers)
+
+        route("payments", loan_parts, ['client_id', 'loan_name'])
+        route("clients", client_parts, 'client_id')
+
+        with open(Path(output_dir) / SPLIT_MANIFEST, 'w', encoding='utf-8') as f:
+            json.dump({'mode': mode, 'parts': parts, 'format': data_format}, f, ensure_ascii=False, indent=2)
+
+        for part_folder in part_folders:
+            (part_folder / PART_COMPLETE_MARKER).touch()
+
+
+def generate_block_task(task: tuple) -> int:
+    """
+    Задача одного блока потоковой генерации (в том числе в отдельном процессе):
+    создаёт DataGenerator с общим seed, переключает его на генератор блока и сбрасывает блок в spool.
+    """
+    feature_config, output_folder, engine, seed, spool_dir, block_idx, start_id, block_size, start_date = task
+
+    generator = DataGenerator(feature_config, output_folder, engine=engine, seed=seed)
+    generator.rng = generator.block_rng(block_idx)
+    if engine == "python":
+        generator.seed_python_engine(block_idx)
+    clients_df, loans_df, payments_df = generator.generate_block(start_id, block_size, start_date)
+    DataGenerator.spool_block(spool_dir, block_idx, clients_df, loans_df, payments_df)
+    return block_idx
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import os
+import json
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from data_generation.config import FEATURE_CONFIG
+
+# pandas импортируется внутри функций: константы и пути модуля нужны CLI ещё до того,
+# как понятно, будет ли команда читать или писать файлы
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Форматы файлов с данными: JSON (по умолчанию, для совместимости) и колоночный Parquet
+DATA_FORMATS = ("json", "parquet")
+FILE_EXTENSIONS = {"json": ".json", "parquet": ".parquet"}
+
+# Сколько строк в одной порции при потоковом чтении и сколько символов JSON читается с диска за раз
+BATCH_SIZE = 100_000
+JSON_READ_SIZE = 1 << 20
+
+# Колонки-перечисления и разделы FEATURE_CONFIG, из которых берутся их допустимые значения
+CATEGORY_COLUMNS = {
+    'gender': 'gender',
+    'education': 'education',
+    'job_type': 'employment_type',
+    'region': 'region',
+    'family_status': 'marital_status',
+}
+
+# Явные типы колонок для Parquet: 'category' — словарное кодирование, 'date' — date32
+TABLE_DTYPES = {
+    'clients': {
+        'client_id': 'int32',
+        'fio': 'string',
+        'passport': 'string',
+        'gender': 'category',
+        'birth_date': 'date',
+        'education': 'category',
+        'count_of_children': 'int8',
+        'job_type': 'category',
+        'region': 'category',
+        'family_status': 'category',
+        'address': 'string',
+        'phone': 'string',
+        'income': 'int32',
+    },
+    'loans': {
+        'client_id': 'int32',
+        'loan_name': 'string',
+        'loan_amount': 'int32',
+        'loan_start_date': 'date',
+        'loan_end_date': 'date',
+        'payment_numbers': 'int16',
+        'paid_amount': 'int32',
+    },
+    'payments': {
+        'client_id': 'int32',
+        'loan_name': 'string',
+        'payment_number': 'int16',
+        'payment_date': 'date',
+        'payment_fact_date': 'date',
+        'paid_fact_amount': 'int32',
+    },
+}
+
+
+def table_path(folder, name: str, data_format: str) -> str:
+    """Путь до файла таблицы name (например, 'clients' или 'clients_3') в формате data_format."""
+    return os.path.join(str(folder), f"{name}{FILE_EXTENSIONS[data_format]}")
+
+
+def detect_format(folder, name: str, preferred: str = "json") -> Optional[str]:
+    """
+    Возвращает формат, в котором в папке folder лежит таблица name:
+    сначала проверяется preferred, затем остальные форматы. None — если файла нет ни в одном.
+    """
+    for data_format in (preferred,) + tuple(f for f in DATA_FORMATS if f != preferred):
+        if os.path.exists(table_path(folder, name, data_format)):
+            return data_format
+    return None
+
+
+def arrow_schema(table: str):
+    """Схема pyarrow для таблицы table по TABLE_DTYPES."""
+    import pyarrow as pa
+
+    arrow_types = {
+        'int8': pa.int8(),
+        'int16': pa.int16(),
+        'int32': pa.int32(),
+        'string': pa.string(),
+        'date': pa.date32(),
+        'category': pa.dictionary(pa.int8(), pa.string()),
+    }
+    return pa.schema([(column, arrow_types[dtype]) for column, dtype in TABLE_DTYPES[table].items()])
+
+
+def apply_dtypes(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """
+    Приводит колонки таблицы table к типам из TABLE_DTYPES:
+    перечисления — к category с категориями из FEATURE_CONFIG, даты — к datetime64,
+    целые — к (nullable) целым нужной разрядности.
+    Значение перечисления не из FEATURE_CONFIG — ValueError (иначе оно молча стало бы NaN).
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for column, dtype in TABLE_DTYPES[table].items():
+        if column not in df.columns:
+            continue
+        if dtype == 'category':
+            roles = FEATURE_CONFIG[CATEGORY_COLUMNS[column]]['role']
+            values = df[column].dropna()
+            unknown = sorted(values[~values.isin(roles)].astype(str).unique())
+            if unknown:
+                raise ValueError(f"Колонка {table}.{column}: значения вне FEATURE_CONFIG: {', '.join(unknown)}")
+            df[column] = pd.Categorical(df[column], categories=roles)
+        elif dtype == 'date':
+            df[column] = pd.to_datetime(df[column])
+        elif dtype.startswith('int'):
+            df[column] = df[column].astype(dtype.capitalize() if df[column].isna().any() else dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def iso_dates(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """
+    Возвращает df, в котором даты таблицы table записаны строками 'YYYY-MM-DD',
+    как в JSON-файлах generate (после чтения Parquet даты приходят объектами datetime.date).
+    """
+    import pandas as pd
+
+    date_columns = [
+        column for column, dtype in TABLE_DTYPES[table].items()
+        if dtype == 'date' and column in df.columns and not pd.api.types.is_string_dtype(df[column])
+    ]
+    if not date_columns:
+        return df
+
+    df = df.copy()
+    for column in date_columns:
+        df[column] = pd.to_datetime(df[column]).dt.strftime('%Y-%m-%d')
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str, table: str, data_format: str) -> None:
+    """Сохраняет DataFrame таблицы table в файл path в формате data_format."""
+    if data_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_table = pa.Table.from_pandas(apply_dtypes(df, table), schema=arrow_schema(table), preserve_index=False)
+        pq.write_table(arrow_table, path)
+    else:
+        iso_dates(df, table).to_json(path, orient='records', indent=2, force_ascii=False)
+
+
+def read_table(path: str, data_format: str) -> pd.DataFrame:
+    """
+    Читает файл таблицы в DataFrame. Parquet читается через memory map,
+    даты приходят объектами datetime.date, перечисления — категориями.
+    """
+    import pandas as pd
+
+    if data_format == "parquet":
+        return pd.read_parquet(path, engine='pyarrow', memory_map=True)
+    return pd.read_json(path)
+
+
+def iter_json_records(path: str, batch_size: int = BATCH_SIZE) -> Iterator[list]:
+    """
+    Инкрементально разбирает JSON-файл и отдаёт записи списками по batch_size штук.
+    Поддерживаются JSON-массив записей (как пишет generate) и NDJSON (по записи на строку).
+    С диска читается по JSON_READ_SIZE символов, в памяти держится только текущий буфер
+    и одна порция записей, а не весь файл. Обрезанный файл (недописанная запись
+    или массив без закрывающей скобки) — json.JSONDecodeError.
+    """
+    decoder = json.JSONDecoder()
+    batch = []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = '', 0, False
+        started = in_array = False
+
+        while True:
+            # пропускаем пробелы и разделители между записями
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if not started and pos < len(buffer):
+                started = True
+                if buffer[pos] == '[':
+                    in_array = True
+                    pos += 1
+                    continue
+            if pos < len(buffer) and buffer[pos] == ']':
+                in_array = False
+                break
+
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("Нужны следующие данные", buffer, pos)
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if pos < len(buffer):
+                        raise
+                    if in_array:
+                        raise json.JSONDecodeError("Массив JSON не закрыт: файл обрезан", buffer, pos)
+                    break
+                chunk = f.read(JSON_READ_SIZE)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+    if batch:
+        yield batch
+
+
+def iter_table_batches(path: str, data_format: str, batch_size: int = BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Потоково читает файл таблицы порциями DataFrame по batch_size строк:
+    JSON — инкрементальным разбором (iter_json_records), Parquet — по row group-ам через memory map.
+    """
+    if data_format == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield record_batch.to_pandas()
+        return
+
+    import pandas as pd
+
+    for records in iter_json_records(path, batch_size):
+        yield pd.DataFrame(records)
+
+
+class TableBatches:
+    """
+    Повторно итерируемое потоковое чтение файла таблицы: каждый проход заново открывает файл
+    и отдаёт порции DataFrame (iter_table_batches), к которым добавлены колонки-константы columns.
+    Нужен там, где порции может понадобиться прочитать ещё раз (повтор этапа загрузки).
+    """
+
+    def __init__(self, path: str, data_format: str, batch_size: int = BATCH_SIZE, columns: Optional[dict] = None):
+        self.path = path
+        self.data_format = data_format
+        self.batch_size = batch_size
+        self.columns = columns or {}
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        for df in iter_table_batches(self.path, self.data_format, self.batch_size):
+            for column, value in self.columns.items():
+                df[column] = value
+            yield df
+
+
+class JsonArrayWriter:
+    """
+    Потоково пишет JSON-массив записей по одной записи на строку, не держа весь массив в памяти.
+    Результат читается и json.load, и pd.read_json, как и файлы обычного режима generate.
+    Если указана таблица table, её даты записываются строками 'YYYY-MM-DD' (см. iso_dates).
+    """
+
+    def __init__(self, path, table: Optional[str] = None):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('[')
+        self.table = table
+        self.rows = 0
+
+    def write_lines(self, lines) -> None:
+        """Дописывает записи, каждая из которых — готовая JSON-строка."""
+        for line in lines:
+            line = line.strip()
+            if line:
+                self.file.write(('\n' if self.rows == 0 else ',\n') + line)
+                self.rows += 1
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        """Дописывает строки DataFrame."""
+        if df.empty:
+            return
+        if self.table is not None:
+            df = iso_dates(df, self.table)
+        text = df.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n')
+        self.file.write(('\n' if self.rows == 0 else ',\n') + text.replace('\n', ',\n'))
+        self.rows += len(df)
+
+    def write_ndjson_file(self, path) -> None:
+        """Дописывает записи из NDJSON-файла без их разбора."""
+        with open(path, 'r', encoding='utf-8') as f:
+            self.write_lines(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.write('\n]\n')
+        self.file.close()
+
+
+class ParquetTableWriter:
+    """
+    Потоково пишет Parquet-файл таблицы table: каждая порция строк — отдельная row group.
+    Интерфейс совпадает с JsonArrayWriter.
+    """
+
+    def __init__(self, path, table: str):
+        import pyarrow.parquet as pq
+
+        self.table = table
+        self.schema = arrow_schema(table)
+        self.writer = pq.ParquetWriter(str(path), self.schema)
+        self.rows = 0
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        """Дописывает строки DataFrame отдельной row group."""
+        import pyarrow as pa
+
+        if df.empty:
+            return
+        self.writer.write_table(pa.Table.from_pandas(apply_dtypes(df, self.table), schema=self.schema, preserve_index=False))
+        self.rows += len(df)
+
+    def write_ndjson_file(self, path) -> None:
+        """Дописывает записи из NDJSON-файла."""
+        import pandas as pd
+
+        self.write_frame(pd.read_json(path, lines=True, dtype=False, convert_dates=False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.writer.close()
+
+
+def open_table_writer(path, table: str, data_format: str):
+    """Потоковый писатель файла таблицы table в формате data_format (JsonArrayWriter или ParquetTableWriter)."""
+    if data_format == "parquet":
+        return ParquetTableWriter(path, table)
+    return JsonArrayWriter(path, table)
@@ -1,21 +1,87 @@
+from __future__ import annotations
+
+import io
+import json
 import os
-import pandas as pd
+import queue
+import threading
+import time
+import uuid
+from itertools import chain
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Union
+from psycopg2 import sql as psql
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 
+from database.settings import LOAD_METHODS, POOL_DEFAULTS
+from utils.stage_timer import StageTimer
+
+# pandas и numpy импортируются там, где заливаются DataFrame: shema, check и explain без них обходятся
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class DBExtractor:
     _connected_once = False
+    # Движки (с пулами соединений) общие для всех экземпляров: один на строку подключения и настройки пула
+    _engines = {}
+    # Реестр SQL-скриптов в памяти: каждый файл читается с диска один раз за процесс
+    _sql_registry = {}
 
-    def __init__(self, dbname, user, password, host, port, verbose: bool = True):
+    def __init__(self, dbname, user, password, host, port, verbose: bool = True,
+                 pool_size: Optional[int] = None,
+                 max_overflow: Optional[int] = None,
+                 statement_timeout_ms: Optional[int] = None,
+                 application_name: Optional[str] = None,
+                 timer: Optional[StageTimer] = None):
         """
-        Инициализирует подключение к PostgreSQL.
+        Инициализирует подключение к PostgreSQL через пул соединений.
+        Движок создаётся один раз на процесс и переиспользуется всеми экземплярами DBExtractor
+        с теми же параметрами, поэтому пул живёт весь запуск load --all или долгоживущего процесса.
+
+        Параметры пула (None — из переменных .env, иначе POOL_DEFAULTS):
+        -- pool_size: DB_POOL_SIZE — сколько соединений держать открытыми;
+        -- max_overflow: DB_MAX_OVERFLOW — сколько соединений можно открыть сверх pool_size;
+        -- statement_timeout_ms: DB_STATEMENT_TIMEOUT_MS — statement_timeout сессии (0 — без ограничения);
+        -- application_name: DB_APP_NAME — имя приложения в pg_stat_activity.
+
+        -- timer: StageTimer для замеров SQL-скриптов и заливки (None — без замеров).
         """
+        settings = {
+            'pool_size': pool_size if pool_size is not None else int(self._env("DB_POOL_SIZE")),
+            'max_overflow': max_overflow if max_overflow is not None else int(self._env("DB_MAX_OVERFLOW")),
+            'statement_timeout_ms': (statement_timeout_ms if statement_timeout_ms is not None
+                                     else int(self._env("DB_STATEMENT_TIMEOUT_MS"))),
+            'application_name': application_name or self._env("DB_APP_NAME"),
+        }
         conn_str = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}"
+        self.timer = timer or StageTimer(enabled=False)
+        # статистика потоков последней параллельной заливки (см. _copy_sharded)
+        self.last_load_stats = []
+        # шарды, которые читала ещё не завершённая транзакция загрузки (см. drop_pending_shards)
+        self.pending_shards = []
+        # что вернул скрипт переноса последней incremental_load (вставлено/обновлено/пропущено строк)
+        self.last_insert_stats = {}
+        # сколько соединений пул может выдать одновременно (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        self.pool_capacity = settings['pool_size'] + settings['max_overflow']
+        engine_key = (conn_str, tuple(sorted(settings.items())))
+
         try:
-            self.engine = create_engine(conn_str)
-            with self.engine.connect() as connection:
-                connection.execute(text("SELECT 1"))
+            self.engine = DBExtractor._engines.get(engine_key)
+            if self.engine is None:
+                self.engine = create_engine(
+                    conn_str,
+                    pool_size=settings['pool_size'],
+                    max_overflow=settings['max_overflow'],
+                    pool_pre_ping=True,
+                    connect_args={
+                        'application_name': settings['application_name'],
+                        'options': f"-c statement_timeout={settings['statement_timeout_ms']}",
+                    },
+                )
+                with self.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                DBExtractor._engines[engine_key] = self.engine
 
             if verbose and not DBExtractor._connected_once:
                 print(f"✅  Успешное подключение к БД {dbname}!")
@@ -24,53 +90,415 @@ class DBExtractor:
             print(f"❌ Ошибка при подключении к базе данных: {e}")
             raise
 
+    @staticmethod
+    def _env(name: str) -> str:
+        """Значение настройки пула из окружения (.env) или POOL_DEFAULTS."""
+        return os.getenv(name) or str(POOL_DEFAULTS[name])
+
     def _read_sql(self, path: str) -> str:
         """
-        Считывает SQL из файла по полному пути path.
+        Возвращает SQL из файла по полному пути path.
+        Файл читается с диска при первом обращении и дальше берётся из реестра в памяти.
         """
+        sql_text = DBExtractor._sql_registry.get(path)
+        if sql_text is not None:
+            return sql_text
+
         if not os.path.exists(path):
             raise FileNotFoundError(f"SQL-файл не найден: {path}")
         try:
             with open(path, 'r', encoding='utf-8') as f:
-                return f.read()
+                sql_text = f.read()
         except Exception as e:
             print(f"❌ Ошибка при чтении SQL-файла {path}: {e}")
             raise
 
-    def execute_sql_script(self, sql_file_path: str):
+        DBExtractor._sql_registry[path] = sql_text
+        return sql_text
+
+    def execute_sql_script(self, sql_file_path: str, params: Optional[dict] = None, conn=None) -> Optional[dict]:
         """
         Считывает и выполняет SQL-скрипт целиком.
+        Если последний запрос скрипта возвращает строки, возвращает первую из них в виде dict
+        (так скрипты отдают статистику: сколько строк вставлено/обновлено), иначе None.
+
+        Параметры:
+        -- params: значения для именованных параметров скрипта (:name);
+        -- conn: открытое соединение — скрипт выполняется в его транзакции
+           (None — в отдельной транзакции).
         """
+        def run(connection) -> Optional[dict]:
+            result = connection.execute(text(sql_text), params or {})
+            if result.returns_rows:
+                row = result.mappings().first()
+                return dict(row) if row is not None else None
+            return None
+
         try:
             sql_text = self._read_sql(sql_file_path)
-            with self.engine.begin() as conn:
-                conn.execute(text(sql_text))
+            with self.timer.stage(f"sql:{os.path.basename(sql_file_path)}") as stage:
+                if conn is not None:
+                    stage['affected'] = run(conn)
+                else:
+                    with self.engine.begin() as new_conn:
+                        stage['affected'] = run(new_conn)
+            return stage['affected']
         except SQLAlchemyError as e:
             print(f"❌ Ошибка при выполнении SQL-скрипта {sql_file_path}: {e}")
             raise
 
+    def explain_sql_script(self, sql_file_path: str, params: Optional[dict] = None) -> dict:
+        """
+        Выполняет запрос из SQL-скрипта под EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+        и возвращает план в виде dict (ключи 'Plan', 'Planning Time', 'Execution Time' и т.д.).
+        Скрипт должен состоять из одного запроса. Транзакция откатывается,
+        поэтому так можно разбирать и запросы, изменяющие данные.
+
+        Параметры:
+        -- params: значения для именованных параметров скрипта (:name).
+        """
+        sql_text = self._read_sql(sql_file_path).strip().rstrip(';')
+        try:
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)\n{sql_text}"), params or {}).scalar()
+                finally:
+                    trans.rollback()
+        except SQLAlchemyError as e:
+            print(f"❌ Ошибка при разборе плана SQL-скрипта {sql_file_path}: {e}")
+            raise
+        # psycopg2 разбирает json сам, но на всякий случай принимаем и строку
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return plan[0]
+
+    @staticmethod
+    def _prepare_for_copy(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Готовит DataFrame к выгрузке в CSV для COPY:
+        целочисленные колонки, превращённые pandas во float из-за пропусков (NaN),
+        приводятся обратно к nullable Int64, чтобы PostgreSQL не получал '1.0' для SMALLINT/INTEGER.
+        """
+        df = df.copy(deep=False)
+        for column in df.select_dtypes(include='float').columns:
+            values = df[column].dropna()
+            if (values == values.round()).all():
+                df[column] = df[column].astype('Int64')
+        return df
+
+    @staticmethod
+    def _set_column_defaults(conn, table_name: str, constants: dict) -> None:
+        """
+        Ставит значения constants ({колонка: значение}) DEFAULT-ами колонок таблицы table_name.
+        Так одинаковые для всей загрузки значения (file_name, load_ts) задаются один раз,
+        а не передаются в COPY в каждой строке.
+        """
+        import numpy as np
+
+        cursor = conn.connection.cursor()
+        try:
+            for column, value in constants.items():
+                value = value.item() if isinstance(value, np.generic) else value
+                cursor.execute(
+                    psql.SQL("ALTER TABLE {} ALTER COLUMN {} SET DEFAULT {}").format(
+                        psql.Identifier(*table_name.split('.')), psql.Identifier(column), psql.Literal(value)
+                    )
+                )
+        finally:
+            cursor.close()
+
+    def _copy_dataframe(self, conn, df: pd.DataFrame, table_name: str, chunksize: Optional[int] = None,
+                        skip_columns: Iterable[str] = ()) -> int:
+        """
+        Заливает DataFrame в таблицу table_name через COPY FROM STDIN (формат CSV)
+        по уже открытому SQLAlchemy-соединению conn (в рамках его транзакции).
+
+        Параметры:
+        -- conn: открытое соединение SQLAlchemy;
+        -- df: данные для загрузки;
+        -- table_name: имя целевой (временной) таблицы, можно со схемой ('staging.x');
+        -- chunksize: сколько строк отправлять одной командой COPY (None — всё сразу);
+        -- skip_columns: колонки, которые не передаются в COPY — их значения берутся
+           из DEFAULT-ов таблицы (см. _set_column_defaults).
+
+        Возвращает количество отправленных строк.
+        """
+        skip_columns = set(skip_columns)
+        copy_columns = [column for column in df.columns if column not in skip_columns]
+        copy_df = self._prepare_for_copy(df[copy_columns])
+        copy_sql = f"COPY {table_name} ({', '.join(copy_columns)}) FROM STDIN WITH (FORMAT csv)"
+        step = chunksize or max(len(df), 1)
+
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(df), step):
+                buffer = io.StringIO()
+                copy_df.iloc[start:start + step].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+        finally:
+            cursor.close()
+
+        return len(df)
+
+    def _copy_sharded(self, conn, frames: Iterable[pd.DataFrame], table_name: str, shard_like_table: str,
+                      shard_column: str, workers: int, chunksize: Optional[int] = None,
+                      skip_columns: Iterable[str] = ()) -> int:
+        """
+        Параллельная заливка порций в таблицу table_name (временную таблицу соединения conn):
+        строки раскладываются по шардам по shard_column % workers, каждый шард заливается
+        своим потоком через COPY по отдельному соединению из пула в собственную UNLOGGED-таблицу
+        (колонки и типы — как у shard_like_table), затем шарды переносятся в table_name
+        одним INSERT ... SELECT в транзакции conn. Колонки skip_columns в шарды не попадают:
+        их значения при переносе берутся из DEFAULT-ов table_name.
+
+        Шарды создаются отдельной зафиксированной транзакцией, поэтому DROP в транзакции conn
+        откатился бы вместе с ней. Если до переноса что-то упало, шарды удаляются сразу;
+        иначе они попадают в self.pending_shards и удаляются drop_pending_shards
+        после завершения транзакции conn — фиксации или отката.
+
+        Статистика потоков (строки, время COPY) сохраняется в self.last_load_stats.
+        Возвращает количество залитых строк.
+        """
+        self.last_load_stats = []
+        frames = iter(frames)
+        first = next((frame for frame in frames if not frame.empty), None)
+        if first is None:
+            return 0
+
+        schema = shard_like_table.split('.')[0]
+        token = uuid.uuid4().hex[:12]
+        shard_tables = [f"{schema}.{table_name}_shard_{token}_{i}" for i in range(workers)]
+        shard_idents = [psql.Identifier(*shard.split('.')) for shard in shard_tables]
+        skip_columns = set(skip_columns)
+        column_list = psql.SQL(', ').join(
+            psql.Identifier(column) for column in first.columns if column not in skip_columns
+        )
+
+        shard_queues = [queue.Queue(maxsize=2) for _ in range(workers)]
+        stats = [{'worker': i, 'rows': 0, 'seconds': 0.0} for i in range(workers)]
+        errors = []
+        read_by_conn = False
+
+        def worker(i: int) -> None:
+            finished = False
+            try:
+                with self.engine.connect() as worker_conn:
+                    trans = worker_conn.begin()
+                    while True:
+                        shard_df = shard_queues[i].get()
+                        if shard_df is None:
+                            finished = True
+                            break
+                        if errors:
+                            # после ошибки любого потока только вычитываем очередь
+                            continue
+                        started = time.perf_counter()
+                        self._copy_dataframe(worker_conn, shard_df, shard_tables[i], chunksize, skip_columns)
+                        stats[i]['seconds'] += time.perf_counter() - started
+                        stats[i]['rows'] += len(shard_df)
+                    if errors:
+                        trans.rollback()
+                    else:
+                        trans.commit()
+            except Exception as e:
+                # в том числе ошибка подключения (пул исчерпан, сеть): без ошибки в errors
+                # и вычитывания очереди до конца основной поток заблокировался бы на put
+                errors.append(e)
+                while not finished:
+                    finished = shard_queues[i].get() is None
+
+        try:
+            # шарды создаются и фиксируются отдельной транзакцией, чтобы их видели соединения потоков
+            with self.engine.begin() as ddl_conn:
+                cursor = ddl_conn.connection.cursor()
+                for shard_ident in shard_idents:
+                    cursor.execute(psql.SQL("CREATE UNLOGGED TABLE {} AS SELECT {} FROM {} WITH NO DATA").format(
+                        shard_ident, column_list, psql.Identifier(*shard_like_table.split('.'))
+                    ))
+                cursor.close()
+
+            threads = [threading.Thread(target=worker, args=(i,), name=f"copy-shard-{i}") for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                for frame in chain([first], frames):
+                    if errors:
+                        break
+                    if frame.empty:
+                        continue
+                    shard_ids = frame[shard_column].to_numpy() % workers
+                    for i, shard_df in frame.groupby(shard_ids, sort=False):
+                        if errors:
+                            break
+                        shard_queues[i].put(shard_df)
+            finally:
+                for shard_queue in shard_queues:
+                    shard_queue.put(None)
+                for thread in threads:
+                    thread.join()
+            if errors:
+                raise errors[0]
+
+            # одним INSERT ... SELECT переносим все шарды во временную таблицу; с этого момента
+            # их читает транзакция conn, и удалить их можно только после её завершения
+            read_by_conn = True
+            self.pending_shards.extend(shard_idents)
+            cursor = conn.connection.cursor()
+            cursor.execute(psql.SQL("INSERT INTO {} ({}) {}").format(
+                psql.Identifier(table_name), column_list,
+                psql.SQL(" UNION ALL ").join(
+                    psql.SQL("SELECT {} FROM {}").format(column_list, shard_ident) for shard_ident in shard_idents
+                )
+            ))
+            cursor.close()
+        finally:
+            if not read_by_conn:
+                self._drop_shards(shard_idents)
+
+        self.last_load_stats = stats
+        return sum(stat['rows'] for stat in stats)
+
+    def drop_pending_shards(self) -> None:
+        """
+        Удаляет шарды параллельной заливки из self.pending_shards отдельным соединением.
+        Вызывается, когда транзакция загрузки, в которой шарды переносились (см. _copy_sharded),
+        уже зафиксирована или откачена.
+        """
+        if self.pending_shards:
+            shard_idents, self.pending_shards = self.pending_shards, []
+            self._drop_shards(shard_idents)
+
+    def _drop_shards(self, shard_idents: list) -> None:
+        """Удаляет шарды отдельным соединением (не дольше lock_timeout)."""
+        try:
+            with self.engine.begin() as cleanup_conn:
+                cursor = cleanup_conn.connection.cursor()
+                cursor.execute("SET LOCAL lock_timeout = '2s'")
+                cursor.execute(psql.SQL("DROP TABLE IF EXISTS {}").format(psql.SQL(', ').join(shard_idents)))
+                cursor.close()
+        except SQLAlchemyError as e:
+            print(f"⚠️  Не удалось удалить шарды заливки, удалите их вручную: {e}")
+
     def incremental_load(self,
-                         df: pd.DataFrame,
+                         df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
                          create_temp_sql_path: str,
                          insert_sql_path: str,
-                         temp_table_name: str):
+                         temp_table_name: str,
+                         method: str = "copy",
+                         chunksize: Optional[int] = None,
+                         finalize: Optional[Callable] = None,
+                         conn=None,
+                         workers: int = 1,
+                         shard_like_table: Optional[str] = None,
+                         shard_column: str = "client_id",
+                         constants: Optional[dict] = None) -> int:
         """
         Инкрементальная загрузка данных во временную таблицу и далее в целевую.
+        Пустые данные пропускаются. Возвращает количество залитых строк;
+        первая строка результата скрипта insert_sql_path (например, число вставленных,
+        обновлённых и пропущенных строк) сохраняется в self.last_insert_stats.
+
+        Параметры:
+        -- df: DataFrame или итератор порций DataFrame (например, потоковое чтение файла):
+           порции заливаются во временную таблицу по мере чтения, в одной транзакции;
+        -- method: способ заливки во временную таблицу:
+           'copy'  — потоковый COPY FROM STDIN через psycopg2 (по умолчанию),
+           'multi' — df.to_sql(method="multi"), запасной вариант;
+        -- chunksize: размер порции строк для COPY / to_sql (None — одной порцией);
+        -- finalize: функция finalize(conn, rows), которая выполняется в той же транзакции
+           после заливки (например, перенос в core и запись в журнал загрузок);
+        -- conn: открытое соединение — загрузка выполняется в его транзакции
+           (None — в отдельной транзакции); при workers > 1 после завершения этой транзакции
+           нужно вызвать drop_pending_shards;
+        -- workers: сколько потоков COPY заливают данные параллельно (только method='copy'):
+           строки шардируются по shard_column, см. _copy_sharded; вместе с соединением загрузки
+           потокам нужно workers + 1 соединений — не больше pool_capacity;
+        -- shard_like_table: постоянная таблица, по колонкам которой создаются UNLOGGED-шарды
+           (обязательна при workers > 1). Уникальность и внешние ключи проверяются как обычно —
+           при переносе из временной таблицы скриптом insert_sql_path;
+        -- constants: значения, одинаковые для всех строк загрузки ({колонка: значение}, например
+           file_name и load_ts): ставятся DEFAULT-ами временной таблицы один раз и не передаются
+           построчно (одноимённые колонки порций игнорируются).
         """
+        if method not in LOAD_METHODS:
+            raise ValueError(f"Неизвестный способ загрузки '{method}'. Допустимые: {', '.join(LOAD_METHODS)}")
+        if workers > 1 and method == "copy" and not shard_like_table:
+            raise ValueError("Для параллельной заливки (workers > 1) нужна таблица shard_like_table.")
+        if workers > 1 and method == "copy" and workers + 1 > self.pool_capacity:
+            # кроме соединений потоков COPY, одно занято транзакцией загрузки
+            raise ValueError(f"Параллельной заливке в {workers} потоков нужно {workers + 1} соединений, "
+                             f"а пул выдаёт не больше {self.pool_capacity} (DB_POOL_SIZE + DB_MAX_OVERFLOW).")
+        import pandas as pd
+
+        frames = [df] if isinstance(df, pd.DataFrame) else df
+        constants = constants or {}
+
         try:
             sql_create_temp = self._read_sql(create_temp_sql_path)
             sql_insert = self._read_sql(insert_sql_path)
 
-            with self.engine.begin() as conn:
-                conn.execute(text(sql_create_temp))
-                df.to_sql(
-                    name=temp_table_name,
-                    con=conn,
-                    index=False,
-                    if_exists="append",
-                    method="multi"
-                )
-                conn.execute(text(sql_insert))
+            def run(connection) -> int:
+                rows = 0
+                connection.execute(text(sql_create_temp))
+                if constants:
+                    self._set_column_defaults(connection, temp_table_name, constants)
+                if method == "copy" and workers > 1:
+                    with self.timer.stage(f"copy_sharded:{temp_table_name}", workers=workers) as stage:
+                        rows = self._copy_sharded(connection, frames, temp_table_name, shard_like_table,
+                                                  shard_column, workers, chunksize, constants)
+                        stage['rows_out'] = rows
+                    for stat in self.last_load_stats:
+                        self.timer.record(f"copy_shard:{temp_table_name}", stat['seconds'], rows_out=stat['rows'],
+                                          worker=stat['worker'])
+                else:
+                    # время чтения порций (разбор файла) и заливки считается раздельно
+                    read_seconds = load_seconds = 0.0
+                    frames_iter = iter(frames)
+                    while True:
+                        started = time.perf_counter()
+                        frame = next(frames_iter, None)
+                        read_seconds += time.perf_counter() - started
+                        if frame is None:
+                            break
+                        if frame.empty:
+                            continue
+                        started = time.perf_counter()
+                        if method == "copy":
+                            self._copy_dataframe(connection, frame, temp_table_name, chunksize, constants)
+                        else:
+                            frame.drop(columns=[column for column in constants if column in frame.columns]).to_sql(
+                                name=temp_table_name,
+                                con=connection,
+                                index=False,
+                                if_exists="append",
+                                method="multi",
+                                chunksize=chunksize
+                            )
+                        load_seconds += time.perf_counter() - started
+                        rows += len(frame)
+                    self.timer.record(f"read:{temp_table_name}", read_seconds, rows_out=rows)
+                    self.timer.record(f"{method}:{temp_table_name}", load_seconds, rows_in=rows)
+                # пустая часть (например, дельта-часть без новых клиентов) — переносить нечего
+                self.last_insert_stats = {}
+                if rows:
+                    with self.timer.stage(f"sql:{os.path.basename(insert_sql_path)}", rows_in=rows) as stage:
+                        result = connection.execute(text(sql_insert))
+                        if result.returns_rows:
+                            row = result.mappings().first()
+                            self.last_insert_stats = dict(row) if row is not None else {}
+                        stage['affected'] = self.last_insert_stats
+                if finalize is not None:
+                    finalize(connection, rows)
+                return rows
+
+            if conn is not None:
+                return run(conn)
+            try:
+                with self.engine.begin() as new_conn:
+                    return run(new_conn)
+            finally:
+                self.drop_pending_shards()
         except FileNotFoundError as e:
             print(f"❌ Ошибка загрузки: файл не найден — {e}")
             raise
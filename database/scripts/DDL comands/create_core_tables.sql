@@ -15,9 +15,13 @@ CREATE TABLE IF NOT EXISTS core.clients
     family_status     marital_enum,
     address           TEXT,
     phone             TEXT,
-    income            INTEGER NOT NULL
+    income            INTEGER NOT NULL,
+    row_hash          BIGINT
 );
 
+-- хеш содержимого из staging.clients; ADD COLUMN — для БД, созданных до появления колонки
+ALTER TABLE core.clients ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+
 
 -- ===================================================================
 -- 2. Таблица core.loans (копия staging.loans без file_name/load_ts)
@@ -22,4 +22,50 @@ CREATE TABLE IF NOT EXISTS mart.data_mart
     paid_fact_amount  INTEGER              NOT NULL,
     status            BOOLEAN              not null,
     PRIMARY KEY (client_id, loan_name, payment_number)
-);
\ No newline at end of file
+);
+
+
+-- ===================================================================
+-- Предагрегированная сводка по просрочкам: одна строка на (месяц, bucket суммы кредита).
+-- Пополняется при каждой загрузке скриптом refresh_overdue_rollup.sql —
+-- пересчитываются только месяцы, в которые попали платежи новой порции.
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS mart.overdue_rollup
+(
+    period               DATE      NOT NULL,
+    loan_amount_bucket   TEXT      NOT NULL,
+    total_loans          BIGINT    NOT NULL,
+    total_clients        BIGINT    NOT NULL,
+    sum_issued_loans     BIGINT    NOT NULL,
+    total_overdue_loans  BIGINT    NOT NULL,
+    sum_overdue_payments BIGINT    NOT NULL,
+    updated_at           TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (period, loan_amount_bucket)
+);
+
+
+-- ===================================================================
+-- Представление для Power BI: доля просрочек по месяцам и bucket-ам суммы кредита.
+-- Читает готовую сводку mart.overdue_rollup, а не сканирует mart.data_mart.
+-- ===================================================================
+DROP VIEW IF EXISTS vw_overdue_by_month_and_amount;
+CREATE VIEW vw_overdue_by_month_and_amount AS
+SELECT
+  r.period,
+  EXTRACT(YEAR FROM r.period)::INT AS year,
+  EXTRACT(MONTH FROM r.period)::INT AS month,
+  r.loan_amount_bucket,
+  -- Сколько ВСЕГО активных договоров (клиент+loan_name) было в этом месяце и bucket-е:
+  r.total_loans,
+  -- Сколько из них (тех же договоров) оказались просрочеными:
+  r.total_overdue_loans,
+  -- Доля просроченных договоров в процентах (0 если total_loans = 0):
+  ROUND(100.0 * r.total_overdue_loans / NULLIF(r.total_loans, 0), 2) AS pct_overdue_loans,
+  -- Сумма всех выданных кредитов (loan_amount) в этом месяце и bucket-е:
+  r.sum_issued_loans,
+  -- Сумма всех просроченных фактических выплат в этом месяце и bucket-е:
+  r.sum_overdue_payments
+FROM mart.overdue_rollup AS r
+ORDER BY
+  r.period,
+  r.loan_amount_bucket;
@@ -0,0 +1,24 @@
+-- ===================================================================
+-- Управляемый набор вторичных индексов хранилища (кроме PK и ограничений уникальности,
+-- на которые опираются ON CONFLICT в скриптах загрузки).
+-- Создаётся командой shema; load --rebuild-indexes удаляет эти индексы перед загрузкой
+-- (drop_indexes.sql) и строит заново после неё. На секционированных таблицах
+-- (shema --partitioned) индекс создаётся на каждой секции, в том числе на будущих.
+--
+-- Соединения staging -> core по (client_id, loan_name) уже обслуживаются
+-- uq_core_loans_client и uq_core_payments_client, отдельные индексы для них не нужны.
+-- ===================================================================
+
+-- Частичный индекс по просроченным платежам витрины: отчёт о просрочках соединяет
+-- data_mart сам с собой по (client_id, loan_name, месяц) и берёт только status = TRUE.
+-- Месяц — выражением, как в отчёте; paid_fact_amount в INCLUDE — для сумм без чтения таблицы.
+CREATE INDEX IF NOT EXISTS ix_data_mart_overdue_month
+    ON mart.data_mart (client_id, loan_name, (date_trunc('month', payment_date)::date))
+    INCLUDE (paid_fact_amount)
+    WHERE status;
+
+-- Покрывающий индекс по дате платежа: пересчёт сводки за затронутые месяцы
+-- (refresh_overdue_rollup.sql) читает диапазон payment_date только из индекса.
+CREATE INDEX IF NOT EXISTS ix_data_mart_payment_date
+    ON mart.data_mart (payment_date)
+    INCLUDE (client_id, loan_name, loan_amount, paid_fact_amount, status);
@@ -0,0 +1,32 @@
+-- ===================================================================
+-- Таблица staging.load_ledger
+--   журнал загрузок: одна строка на часть и этап загрузки
+--   (clients, loans, payments — staging + core, mart — витрина и сводка).
+--   Строка со статусом 'loaded' пишется в той же транзакции, что и данные этапа,
+--   поэтому по журналу видно, какие этапы части уже зафиксированы в БД.
+--   Строка 'failed' пишется отдельной транзакцией при ошибке этапа.
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS staging.load_ledger
+(
+    part_num    INTEGER   NOT NULL,
+    table_name  TEXT      NOT NULL,
+    file_name   TEXT,
+    row_count   BIGINT,
+    checksum    TEXT,
+    started_at  TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    status      TEXT      NOT NULL CHECK (status IN ('loaded', 'failed')),
+    PRIMARY KEY (part_num, table_name)
+);
+
+-- Базы, загруженные до появления журнала: переносим номера уже загруженных частей
+-- из file_name в staging.loans (однократно, пока журнал пуст).
+INSERT INTO staging.load_ledger (part_num, table_name, started_at, finished_at, status)
+SELECT loaded.part_num, 'mart', MIN(loaded.load_ts), MAX(loaded.load_ts), 'loaded'
+FROM (
+    SELECT (regexp_match(file_name, 'loans_(\d+)\.'))[1]::INTEGER AS part_num, load_ts
+    FROM staging.loans
+) AS loaded
+WHERE loaded.part_num IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM staging.load_ledger)
+GROUP BY loaded.part_num;
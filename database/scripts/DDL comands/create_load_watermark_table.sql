@@ -0,0 +1,15 @@
+-- ===================================================================
+-- Таблица staging.load_watermark
+--   водяные отметки переноса данных: для каждой целевой таблицы хранится
+--   максимальный load_ts из staging, который уже перенесён в неё.
+--   load_ts выдаёт сама БД (DML comands/next_load_ts.sql) и он растёт от части к части,
+--   поэтому отметки не зависят от часов клиента.
+--   Скрипты insert_to_*.sql берут только строки с load_ts новее отметки
+--   и сдвигают её в той же транзакции.
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS staging.load_watermark
+(
+    target_table TEXT PRIMARY KEY,
+    last_load_ts TIMESTAMP NOT NULL,
+    updated_at   TIMESTAMP NOT NULL DEFAULT now()
+);
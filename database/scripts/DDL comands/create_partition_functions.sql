@@ -0,0 +1,44 @@
+-- ===================================================================
+-- Функция досоздания помесячных секций для таблиц, секционированных по payment_date
+-- (core.payments и mart.data_mart после shema --partitioned, см. create_partitioned_tables.sql).
+-- Создаёт секции <таблица>_YYYY_MM для всех месяцев от first_day до last_day, которых ещё нет,
+-- и возвращает число созданных секций. Для обычной (несекционированной) таблицы ничего не делает,
+-- поэтому скрипты загрузки вызывают её всегда, независимо от того, как создавалась схема.
+-- ===================================================================
+CREATE OR REPLACE FUNCTION core.ensure_month_partitions(parent REGCLASS, first_day TIMESTAMP, last_day TIMESTAMP)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    parent_schema  TEXT;
+    parent_name    TEXT;
+    period_start   DATE;
+    partition_name TEXT;
+    created        INTEGER := 0;
+BEGIN
+    IF first_day IS NULL OR NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = parent) THEN
+        RETURN 0;
+    END IF;
+
+    SELECT n.nspname, c.relname
+    INTO parent_schema, parent_name
+    FROM pg_class AS c
+    JOIN pg_namespace AS n ON n.oid = c.relnamespace
+    WHERE c.oid = parent;
+
+    FOR period_start IN
+        SELECT generate_series(date_trunc('month', first_day), date_trunc('month', last_day), INTERVAL '1 month')::date
+    LOOP
+        partition_name := format('%s_%s', parent_name, to_char(period_start, 'YYYY_MM'));
+        -- существующую секцию не трогаем: CREATE ... PARTITION OF блокирует родительскую таблицу
+        CONTINUE WHEN to_regclass(format('%I.%I', parent_schema, partition_name)) IS NOT NULL;
+
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+            parent_schema, partition_name, parent, period_start, (period_start + INTERVAL '1 month')::date
+        );
+        created := created + 1;
+    END LOOP;
+
+    RETURN created;
+END $$;
@@ -0,0 +1,79 @@
+-- ===================================================================
+-- Секционированные по месяцу payment_date варианты core.payments и mart.data_mart
+-- (команда shema --partitioned, запускается после create_core_tables.sql и create_datamart_table.sql).
+-- Секции создаются во время load функцией core.ensure_month_partitions.
+--
+-- Ключ секционирования должен входить в первичный ключ и ограничения уникальности,
+-- поэтому в них добавлен payment_date. Дата платежа однозначно определяется
+-- (client_id, loan_name, payment_number), а staging.payments такие строки не перезаписывает,
+-- так что прежняя уникальность сохраняется.
+--
+-- Пустая обычная таблица (только что созданная или ещё не загружавшаяся) заменяется секционированной,
+-- таблица с данными не переделывается — для неё скрипт завершается ошибкой.
+-- ===================================================================
+DO $$
+DECLARE
+    target TEXT;
+    has_rows BOOLEAN;
+BEGIN
+    FOREACH target IN ARRAY ARRAY['core.payments', 'mart.data_mart'] LOOP
+        CONTINUE WHEN to_regclass(target) IS NULL
+                   OR EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(target));
+
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s)', target) INTO has_rows;
+        IF has_rows THEN
+            RAISE EXCEPTION 'Таблица % уже содержит данные: секционировать можно только пустую таблицу', target;
+        END IF;
+        EXECUTE format('DROP TABLE %s', target);
+    END LOOP;
+END $$;
+
+
+-- ===================================================================
+-- 1. Таблица core.payments, секции по месяцам payment_date
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS core.payments
+(
+    id                SERIAL,
+    client_id         INTEGER   NOT NULL,
+    loan_name         TEXT      NOT NULL,
+    payment_number    SMALLINT  NOT NULL,
+    payment_date      TIMESTAMP NOT NULL,
+    payment_fact_date TIMESTAMP NOT NULL,
+    paid_fact_amount  INTEGER   NOT NULL,
+    status            BOOLEAN   NOT NULL,
+    PRIMARY KEY (id, payment_date),
+    FOREIGN KEY (client_id) REFERENCES core.clients (client_id),
+    FOREIGN KEY (client_id, loan_name) REFERENCES core.loans (client_id, loan_name),
+    CONSTRAINT uq_core_payments_client UNIQUE (client_id, loan_name, payment_number, payment_date)
+) PARTITION BY RANGE (payment_date);
+
+
+-- ===================================================================
+-- 2. Витрина mart.data_mart, секции по месяцам payment_date
+-- ===================================================================
+CREATE TABLE IF NOT EXISTS mart.data_mart
+(
+    client_id         INTEGER   NOT NULL,
+    fio               TEXT      NOT NULL,
+    passport          TEXT      NOT NULL,
+    gender            TEXT      NOT NULL,
+    birth_date        DATE      NOT NULL,
+    education         TEXT      NOT NULL,
+    count_of_children SMALLINT,
+    job_type          TEXT      NOT NULL,
+    region            TEXT,
+    family_status     TEXT,
+    income            INTEGER   NOT NULL,
+    loan_name         TEXT      NOT NULL,
+    loan_amount       INTEGER   NOT NULL,
+    loan_start_date   TIMESTAMP NOT NULL,
+    loan_end_date     TIMESTAMP NOT NULL,
+    paid_amount       INTEGER   NOT NULL,
+    payment_number    SMALLINT  NOT NULL,
+    payment_date      TIMESTAMP NOT NULL,
+    payment_fact_date TIMESTAMP NOT NULL,
+    paid_fact_amount  INTEGER   NOT NULL,
+    status            BOOLEAN   NOT NULL,
+    PRIMARY KEY (client_id, loan_name, payment_number, payment_date)
+) PARTITION BY RANGE (payment_date);
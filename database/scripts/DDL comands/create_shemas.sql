@@ -7,8 +7,21 @@ CREATE SCHEMA IF NOT EXISTS mart;
 
 -- ===================================================================
 -- 2. ENUM для пола, образования, типа занятости, семейного статуса
+--    (обёрнуты в DO-блоки, чтобы команду shema можно было запускать повторно)
 -- ===================================================================
-CREATE TYPE gender_enum AS ENUM ('Мужчина','Женщина');
-CREATE TYPE education_enum AS ENUM ('Начальное','Среднее','Высшее','Два высших');
-CREATE TYPE employment_enum AS ENUM ('Безработный','ИП','Самозанятый','Работает по найму');
-CREATE TYPE marital_enum AS ENUM ('В браке','Не в браке');
+DO $$ BEGIN
+    CREATE TYPE gender_enum AS ENUM ('Мужчина','Женщина');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+DO $$ BEGIN
+    CREATE TYPE education_enum AS ENUM ('Начальное','Среднее','Высшее','Два высших');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+DO $$ BEGIN
+    CREATE TYPE employment_enum AS ENUM ('Безработный','ИП','Самозанятый','Работает по найму');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+DO $$ BEGIN
+    CREATE TYPE marital_enum AS ENUM ('В браке','Не в браке');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
@@ -16,6 +16,7 @@ CREATE TABLE IF NOT EXISTS staging.clients
     address           TEXT,
     phone             TEXT,
     income            INTEGER NOT NULL,
+    row_hash          BIGINT,
     file_name         TEXT NOT NULL,
     load_ts           TIMESTAMP NOT NULL,
     CONSTRAINT uq_clients_passport UNIQUE (passport)
@@ -60,3 +61,19 @@ CREATE TABLE IF NOT EXISTS staging.payments
     FOREIGN KEY (client_id) REFERENCES staging.clients (client_id),
     FOREIGN KEY (client_id, loan_name) REFERENCES staging.loans (client_id, loan_name)
 );
+
+
+-- ===================================================================
+-- 4. Индексы по load_ts: перенос в core выбирает только строки текущей порции
+--    (load_ts новее водяной отметки в staging.load_watermark)
+-- ===================================================================
+CREATE INDEX IF NOT EXISTS ix_staging_clients_load_ts ON staging.clients (load_ts);
+CREATE INDEX IF NOT EXISTS ix_staging_loans_load_ts ON staging.loans (load_ts);
+CREATE INDEX IF NOT EXISTS ix_staging_payments_load_ts ON staging.payments (load_ts);
+
+
+-- ===================================================================
+-- 5. Хеш содержимого строки клиента (upsert_clients.sql перезаписывает только изменённые строки).
+--    ADD COLUMN — для БД, созданных до появления колонки.
+-- ===================================================================
+ALTER TABLE staging.clients ADD COLUMN IF NOT EXISTS row_hash BIGINT;
@@ -0,0 +1,4 @@
+-- Удаление управляемых вторичных индексов (create_indexes.sql) перед большой загрузкой:
+-- вставка не обновляет их построчно, после загрузки индексы строятся заново одним проходом.
+DROP INDEX IF EXISTS mart.ix_data_mart_overdue_month;
+DROP INDEX IF EXISTS mart.ix_data_mart_payment_date;
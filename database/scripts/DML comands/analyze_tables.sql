@@ -0,0 +1,7 @@
+-- Обновление статистики планировщика после загрузки части:
+-- без неё оценки строк по новым месяцам и клиентам отстают, и планы отчётов деградируют.
+ANALYZE core.clients;
+ANALYZE core.loans;
+ANALYZE core.payments;
+ANALYZE mart.data_mart;
+ANALYZE mart.overdue_rollup;
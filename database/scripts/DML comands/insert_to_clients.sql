@@ -1,48 +1,89 @@
 -- Переносим клиентов из staging.clients в core.clients.
--- При конфликте по client_id обновляем все остальные поля.
+-- Берём только строки текущей порции: load_ts новее водяной отметки 'core.clients'.
+-- При конфликте по client_id обновляем остальные поля, только если изменился row_hash
+-- (у строк, загруженных до появления хеша, он пустой — такие строки обновятся один раз).
+-- Перенос и сдвиг водяной отметки выполняются одним запросом (все CTE видят один снимок данных),
+-- который возвращает число вставленных, обновлённых и пропущенных строк.
 
-INSERT INTO core.clients
-(
-    client_id,
-    fio,
-    passport,
-    gender,
-    birth_date,
-    education,
-    count_of_children,
-    job_type,
-    region,
-    family_status,
-    address,
-    phone,
-    income
-)
+WITH
+  watermark AS (
+    SELECT COALESCE(
+      (SELECT w.last_load_ts FROM staging.load_watermark AS w WHERE w.target_table = 'core.clients'),
+      '-infinity'
+    )::timestamp AS last_load_ts
+  ),
+  batch AS (
+    SELECT s.*
+    FROM staging.clients AS s
+    CROSS JOIN watermark AS w
+    WHERE s.load_ts > w.last_load_ts
+  ),
+  upserted AS (
+    INSERT INTO core.clients
+    (
+        client_id,
+        fio,
+        passport,
+        gender,
+        birth_date,
+        education,
+        count_of_children,
+        job_type,
+        region,
+        family_status,
+        address,
+        phone,
+        income,
+        row_hash
+    )
+    SELECT
+        b.client_id,
+        b.fio,
+        b.passport,
+        b.gender,
+        b.birth_date,
+        b.education,
+        b.count_of_children,
+        b.job_type,
+        b.region,
+        b.family_status,
+        b.address,
+        b.phone,
+        b.income,
+        b.row_hash
+    FROM batch AS b
+    ON CONFLICT (client_id) DO UPDATE
+      SET
+        fio               = EXCLUDED.fio,
+        passport          = EXCLUDED.passport,
+        gender            = EXCLUDED.gender,
+        birth_date        = EXCLUDED.birth_date,
+        education         = EXCLUDED.education,
+        count_of_children = EXCLUDED.count_of_children,
+        job_type          = EXCLUDED.job_type,
+        region            = EXCLUDED.region,
+        family_status     = EXCLUDED.family_status,
+        address           = EXCLUDED.address,
+        phone             = EXCLUDED.phone,
+        income            = EXCLUDED.income,
+        row_hash          = EXCLUDED.row_hash
+      WHERE core.clients.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING (xmax = 0) AS is_inserted
+  ),
+  -- Сдвигаем водяную отметку core.clients на последний перенесённый load_ts.
+  watermark_moved AS (
+    INSERT INTO staging.load_watermark (target_table, last_load_ts)
+    SELECT 'core.clients', MAX(load_ts)
+    FROM staging.clients
+    HAVING MAX(load_ts) IS NOT NULL
+    ON CONFLICT (target_table) DO UPDATE
+      SET
+        last_load_ts = GREATEST(staging.load_watermark.last_load_ts, EXCLUDED.last_load_ts),
+        updated_at   = now()
+    RETURNING 1
+  )
 SELECT
-    s.client_id,
-    s.fio,
-    s.passport,
-    s.gender,
-    s.birth_date,
-    s.education,
-    s.count_of_children,
-    s.job_type,
-    s.region,
-    s.family_status,
-    s.address,
-    s.phone,
-    s.income
-FROM staging.clients AS s
-ON CONFLICT (client_id) DO UPDATE
-  SET
-    fio               = EXCLUDED.fio,
-    passport          = EXCLUDED.passport,
-    gender            = EXCLUDED.gender,
-    birth_date        = EXCLUDED.birth_date,
-    education         = EXCLUDED.education,
-    count_of_children = EXCLUDED.count_of_children,
-    job_type          = EXCLUDED.job_type,
-    region            = EXCLUDED.region,
-    family_status     = EXCLUDED.family_status,
-    address           = EXCLUDED.address,
-    phone             = EXCLUDED.phone,
-    income            = EXCLUDED.income;
+  COUNT(*) FILTER (WHERE is_inserted)     AS inserted,
+  COUNT(*) FILTER (WHERE NOT is_inserted) AS updated,
+  (SELECT COUNT(*) FROM batch) - COUNT(*) AS skipped
+FROM upserted;
@@ -1,23 +1,59 @@
 -- Переносим кредиты из staging.loans в core.loans.
+-- Берём только строки текущей порции: load_ts новее водяной отметки 'core.loans'.
 -- При конфликте по (client_id, loan_name) НЕ вставляем повторно.
+-- Перенос и сдвиг водяной отметки выполняются одним запросом (все CTE видят один снимок данных),
+-- который возвращает число вставленных, обновлённых (всегда 0) и пропущенных строк.
 
-INSERT INTO core.loans
-(
-    client_id,
-    loan_name,
-    loan_amount,
-    loan_start_date,
-    loan_end_date,
-    payment_numbers,
-    paid_amount
-)
+WITH
+  watermark AS (
+    SELECT COALESCE(
+      (SELECT w.last_load_ts FROM staging.load_watermark AS w WHERE w.target_table = 'core.loans'),
+      '-infinity'
+    )::timestamp AS last_load_ts
+  ),
+  batch AS (
+    SELECT s.*
+    FROM staging.loans AS s
+    CROSS JOIN watermark AS w
+    WHERE s.load_ts > w.last_load_ts
+  ),
+  inserted AS (
+    INSERT INTO core.loans
+    (
+        client_id,
+        loan_name,
+        loan_amount,
+        loan_start_date,
+        loan_end_date,
+        payment_numbers,
+        paid_amount
+    )
+    SELECT
+        b.client_id,
+        b.loan_name,
+        b.loan_amount,
+        b.loan_start_date,
+        b.loan_end_date,
+        b.payment_numbers,
+        b.paid_amount
+    FROM batch AS b
+    ON CONFLICT (client_id, loan_name) DO NOTHING
+    RETURNING 1
+  ),
+  -- Сдвигаем водяную отметку core.loans на последний перенесённый load_ts.
+  watermark_moved AS (
+    INSERT INTO staging.load_watermark (target_table, last_load_ts)
+    SELECT 'core.loans', MAX(load_ts)
+    FROM staging.loans
+    HAVING MAX(load_ts) IS NOT NULL
+    ON CONFLICT (target_table) DO UPDATE
+      SET
+        last_load_ts = GREATEST(staging.load_watermark.last_load_ts, EXCLUDED.last_load_ts),
+        updated_at   = now()
+    RETURNING 1
+  )
 SELECT
-    s.client_id,
-    s.loan_name,
-    s.loan_amount,
-    s.loan_start_date,
-    s.loan_end_date,
-    s.payment_numbers,
-    s.paid_amount
-FROM staging.loans AS s
-ON CONFLICT (client_id, loan_name) DO NOTHING;
+  COUNT(*) AS inserted,
+  0 AS updated,
+  (SELECT COUNT(*) FROM batch) - COUNT(*) AS skipped
+FROM inserted;
@@ -1,28 +1,74 @@
 -- Переносим платежи из staging.payments в core.payments.
+-- Берём только строки текущей порции: load_ts новее водяной отметки 'core.payments'.
 -- При конфликте по (client_id, loan_name, payment_number) — пропускаем.
+-- ON CONFLICT без списка колонок: у секционированной core.payments (shema --partitioned)
+-- ограничение уникальности дополнительно включает payment_date.
 
-INSERT INTO core.payments
-(
-    client_id,
-    loan_name,
-    payment_number,
-    payment_date,
-    payment_fact_date,
-    paid_fact_amount,
-    status
-)
-SELECT
-    sp.client_id,
-    sp.loan_name,
-    sp.payment_number,
-    sp.payment_date,
-    sp.payment_fact_date,
-    sp.paid_fact_amount,
-    CASE
-        WHEN sp.payment_fact_date > sp.payment_date OR sp.paid_fact_amount < cl.paid_amount THEN TRUE
-        ELSE FALSE
-    END AS status
+-- Досоздаём помесячные секции под даты платежей порции (для обычной таблицы — ничего не делает).
+SELECT core.ensure_month_partitions('core.payments', MIN(sp.payment_date), MAX(sp.payment_date))
 FROM staging.payments AS sp
-JOIN core.loans AS cl
-    ON sp.client_id = cl.client_id AND sp.loan_name = cl.loan_name
-ON CONFLICT (client_id, loan_name, payment_number) DO NOTHING;
+WHERE sp.load_ts > COALESCE(
+    (SELECT w.last_load_ts FROM staging.load_watermark AS w WHERE w.target_table = 'core.payments'),
+    '-infinity'
+);
+
+-- Перенос и сдвиг водяной отметки выполняются одним запросом (все CTE видят один снимок данных),
+-- который возвращает число вставленных, обновлённых (всегда 0) и пропущенных строк.
+WITH
+  watermark AS (
+    SELECT COALESCE(
+      (SELECT w.last_load_ts FROM staging.load_watermark AS w WHERE w.target_table = 'core.payments'),
+      '-infinity'
+    )::timestamp AS last_load_ts
+  ),
+  batch AS (
+    SELECT sp.*
+    FROM staging.payments AS sp
+    CROSS JOIN watermark AS w
+    WHERE sp.load_ts > w.last_load_ts
+  ),
+  inserted AS (
+    INSERT INTO core.payments
+    (
+        client_id,
+        loan_name,
+        payment_number,
+        payment_date,
+        payment_fact_date,
+        paid_fact_amount,
+        status
+    )
+    SELECT
+        b.client_id,
+        b.loan_name,
+        b.payment_number,
+        b.payment_date,
+        b.payment_fact_date,
+        b.paid_fact_amount,
+        CASE
+            WHEN b.payment_fact_date > b.payment_date OR b.paid_fact_amount < cl.paid_amount THEN TRUE
+            ELSE FALSE
+        END AS status
+    FROM batch AS b
+    JOIN core.loans AS cl
+        ON b.client_id = cl.client_id AND b.loan_name = cl.loan_name
+    ON CONFLICT DO NOTHING
+    RETURNING 1
+  ),
+  -- Сдвигаем водяную отметку core.payments на последний перенесённый load_ts.
+  watermark_moved AS (
+    INSERT INTO staging.load_watermark (target_table, last_load_ts)
+    SELECT 'core.payments', MAX(load_ts)
+    FROM staging.payments
+    HAVING MAX(load_ts) IS NOT NULL
+    ON CONFLICT (target_table) DO UPDATE
+      SET
+        last_load_ts = GREATEST(staging.load_watermark.last_load_ts, EXCLUDED.last_load_ts),
+        updated_at   = now()
+    RETURNING 1
+  )
+SELECT
+  COUNT(*) AS inserted,
+  0 AS updated,
+  (SELECT COUNT(*) FROM batch) - COUNT(*) AS skipped
+FROM inserted;
@@ -0,0 +1,11 @@
+-- Ключ порции (load_ts) для очередной части: берётся из часов БД, а не клиента,
+-- и всегда строго больше любой водяной отметки и любого load_ts, уже лежащего в staging.
+-- Поэтому сравнение load_ts > last_load_ts в insert_to_*.sql не теряет порцию,
+-- даже если часы клиента или сервера отстали или перевелись назад.
+SELECT GREATEST(
+    clock_timestamp()::timestamp,
+    (SELECT MAX(w.last_load_ts) FROM staging.load_watermark AS w) + INTERVAL '1 microsecond',
+    (SELECT MAX(c.load_ts) FROM staging.clients AS c) + INTERVAL '1 microsecond',
+    (SELECT MAX(l.load_ts) FROM staging.loans AS l) + INTERVAL '1 microsecond',
+    (SELECT MAX(p.load_ts) FROM staging.payments AS p) + INTERVAL '1 microsecond'
+) AS load_ts;
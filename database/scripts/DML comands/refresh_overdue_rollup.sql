@@ -0,0 +1,95 @@
+-- Инкрементальное обновление сводки mart.overdue_rollup.
+-- Порция — платежи staging с load_ts новее водяной отметки 'mart.overdue_rollup'.
+-- Пересчитываются только месяцы (period), в которые попали платежи порции:
+-- по каждому такому месяцу агрегаты заново считаются из mart.data_mart одним проходом
+-- (число договоров и клиентов нельзя просто прибавить — нужен COUNT DISTINCT внутри месяца).
+-- Запускать после insert_to_mart.sql. Возвращает число пересчитанных месяцев и строк сводки.
+
+WITH
+  watermark AS (
+    SELECT COALESCE(
+      (SELECT w.last_load_ts FROM staging.load_watermark AS w WHERE w.target_table = 'mart.overdue_rollup'),
+      '-infinity'
+    )::timestamp AS last_load_ts
+  ),
+  touched_periods AS (
+    SELECT DISTINCT date_trunc('month', sp.payment_date)::date AS period
+    FROM staging.payments AS sp
+    CROSS JOIN watermark AS w
+    WHERE sp.load_ts > w.last_load_ts
+  ),
+  -- общие границы пересчитываемых месяцев: по ним секционированная витрина
+  -- отсекает лишние секции ещё до соединения (partition pruning)
+  touched_range AS (
+    SELECT MIN(period) AS first_period, MAX(period) + INTERVAL '1 month' AS end_period
+    FROM touched_periods
+  ),
+  recomputed AS (
+    SELECT
+      t.period,
+      CASE
+          WHEN m.loan_amount < 50000  THEN 'До 50 000'
+          WHEN m.loan_amount < 100000 THEN 'До 100 000'
+          WHEN m.loan_amount < 500000 THEN 'До 500 000'
+          ELSE 'От 500 000'
+        END AS loan_amount_bucket,
+      COUNT(DISTINCT (m.client_id, m.loan_name)) AS total_loans,
+      COUNT(DISTINCT m.client_id) AS total_clients,
+      SUM(m.loan_amount) AS sum_issued_loans,
+      COUNT(DISTINCT (m.client_id, m.loan_name)) FILTER (WHERE m.status) AS total_overdue_loans,
+      COALESCE(SUM(m.paid_fact_amount) FILTER (WHERE m.status), 0) AS sum_overdue_payments
+    FROM touched_periods AS t
+    JOIN mart.data_mart AS m
+      ON m.payment_date >= t.period
+     AND m.payment_date < t.period + INTERVAL '1 month'
+    WHERE m.payment_date >= (SELECT first_period FROM touched_range)
+      AND m.payment_date <  (SELECT end_period FROM touched_range)
+    GROUP BY
+      t.period,
+      loan_amount_bucket
+  ),
+  upserted AS (
+    INSERT INTO mart.overdue_rollup (
+        period, loan_amount_bucket, total_loans, total_clients,
+        sum_issued_loans, total_overdue_loans, sum_overdue_payments
+    )
+    SELECT
+        period, loan_amount_bucket, total_loans, total_clients,
+        sum_issued_loans, total_overdue_loans, sum_overdue_payments
+    FROM recomputed
+    ON CONFLICT (period, loan_amount_bucket) DO UPDATE
+      SET
+        total_loans          = EXCLUDED.total_loans,
+        total_clients        = EXCLUDED.total_clients,
+        sum_issued_loans     = EXCLUDED.sum_issued_loans,
+        total_overdue_loans  = EXCLUDED.total_overdue_loans,
+        sum_overdue_payments = EXCLUDED.sum_overdue_payments,
+        updated_at           = now()
+    RETURNING 1
+  ),
+  -- bucket-ы пересчитанных месяцев, которых больше нет в витрине
+  deleted AS (
+    DELETE FROM mart.overdue_rollup AS r
+    USING touched_periods AS t
+    WHERE r.period = t.period
+      AND NOT EXISTS (
+        SELECT 1 FROM recomputed AS c
+        WHERE c.period = r.period AND c.loan_amount_bucket = r.loan_amount_bucket
+      )
+    RETURNING 1
+  ),
+  watermark_moved AS (
+    INSERT INTO staging.load_watermark (target_table, last_load_ts)
+    SELECT 'mart.overdue_rollup', MAX(load_ts)
+    FROM staging.payments
+    HAVING MAX(load_ts) IS NOT NULL
+    ON CONFLICT (target_table) DO UPDATE
+      SET
+        last_load_ts = GREATEST(staging.load_watermark.last_load_ts, EXCLUDED.last_load_ts),
+        updated_at   = now()
+    RETURNING 1
+  )
+SELECT
+  (SELECT COUNT(*) FROM touched_periods) AS periods,
+  (SELECT COUNT(*) FROM upserted)        AS rows_upserted,
+  (SELECT COUNT(*) FROM deleted)         AS rows_deleted;
@@ -1,51 +1,84 @@
-INSERT INTO staging.clients
-(
-    client_id,
-    passport,
-    fio,
-    gender,
-    birth_date,
-    education,
-    count_of_children,
-    job_type,
-    region,
-    family_status,
-    address,
-    phone,
-    income,
-    file_name,
-    load_ts
-)
+-- Заливаем клиентов из temp_clients в staging.clients.
+-- row_hash — хеш содержимого строки (все поля, кроме file_name и load_ts), считается один раз при заливке.
+-- При конфликте по passport строка перезаписывается, только если хеш изменился: неизменённые клиенты
+-- (например, повторяющиеся в cumulative-частях) не порождают новых версий строк, WAL и мёртвых кортежей,
+-- сохраняют прежний load_ts и поэтому не переносятся в core и витрину повторно.
+-- Возвращает число вставленных, обновлённых и пропущенных (неизменённых) строк.
+
+WITH
+  source AS (
+    SELECT
+        t.*,
+        hashtextextended(
+            ROW(
+                t.client_id, t.passport, t.fio, t.gender, t.birth_date, t.education, t.count_of_children,
+                t.job_type, t.region, t.family_status, t.address, t.phone, t.income
+            )::text,
+            0
+        ) AS row_hash
+    FROM temp_clients AS t
+  ),
+  upserted AS (
+    INSERT INTO staging.clients
+    (
+        client_id,
+        passport,
+        fio,
+        gender,
+        birth_date,
+        education,
+        count_of_children,
+        job_type,
+        region,
+        family_status,
+        address,
+        phone,
+        income,
+        row_hash,
+        file_name,
+        load_ts
+    )
+    SELECT
+        s.client_id,
+        s.passport,
+        s.fio,
+        s.gender,
+        s.birth_date,
+        s.education,
+        s.count_of_children,
+        s.job_type,
+        s.region,
+        s.family_status,
+        s.address,
+        s.phone,
+        s.income,
+        s.row_hash,
+        s.file_name,
+        s.load_ts
+    FROM source AS s
+    ON CONFLICT (passport) DO UPDATE
+      SET
+        client_id         = EXCLUDED.client_id,
+        fio               = EXCLUDED.fio,
+        gender            = EXCLUDED.gender,
+        birth_date        = EXCLUDED.birth_date,
+        education         = EXCLUDED.education,
+        count_of_children = EXCLUDED.count_of_children,
+        job_type          = EXCLUDED.job_type,
+        region            = EXCLUDED.region,
+        family_status     = EXCLUDED.family_status,
+        address           = EXCLUDED.address,
+        phone             = EXCLUDED.phone,
+        income            = EXCLUDED.income,
+        row_hash          = EXCLUDED.row_hash,
+        file_name         = EXCLUDED.file_name,
+        load_ts           = EXCLUDED.load_ts
+      WHERE staging.clients.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    -- xmax = 0 только у только что вставленной версии строки, у обновлённой — id обновившей транзакции
+    RETURNING (xmax = 0) AS is_inserted
+  )
 SELECT
-    t.client_id,
-    t.passport,
-    t.fio,
-    t.gender,
-    t.birth_date,
-    t.education,
-    t.count_of_children,
-    t.job_type,
-    t.region,
-    t.family_status,
-    t.address,
-    t.phone,
-    t.income,
-    t.file_name,
-    t.load_ts
-FROM temp_clients AS t
-ON CONFLICT (passport) DO UPDATE
-  SET
-    client_id         = EXCLUDED.client_id,
-    fio               = EXCLUDED.fio,
-    gender            = EXCLUDED.gender,
-    birth_date        = EXCLUDED.birth_date,
-    education         = EXCLUDED.education,
-    count_of_children = EXCLUDED.count_of_children,
-    job_type          = EXCLUDED.job_type,
-    region            = EXCLUDED.region,
-    family_status     = EXCLUDED.family_status,
-    address           = EXCLUDED.address,
-    phone             = EXCLUDED.phone,
-    income            = EXCLUDED.income,
-    file_name         = EXCLUDED.file_name,
-    load_ts           = EXCLUDED.load_ts;
+  COUNT(*) FILTER (WHERE is_inserted)     AS inserted,
+  COUNT(*) FILTER (WHERE NOT is_inserted) AS updated,
+  (SELECT COUNT(*) FROM temp_clients) - COUNT(*) AS skipped
+FROM upserted;
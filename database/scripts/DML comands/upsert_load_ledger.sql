@@ -0,0 +1,32 @@
+-- Записываем (или перезаписываем после неудачной попытки) строку журнала загрузок
+-- для этапа :table_name части :part_num. Выполняется в транзакции этапа.
+INSERT INTO staging.load_ledger
+(
+    part_num,
+    table_name,
+    file_name,
+    row_count,
+    checksum,
+    started_at,
+    finished_at,
+    status
+)
+VALUES
+(
+    :part_num,
+    :table_name,
+    :file_name,
+    :row_count,
+    :checksum,
+    :started_at,
+    clock_timestamp(),
+    :status
+)
+ON CONFLICT (part_num, table_name) DO UPDATE
+  SET
+    file_name   = EXCLUDED.file_name,
+    row_count   = EXCLUDED.row_count,
+    checksum    = EXCLUDED.checksum,
+    started_at  = EXCLUDED.started_at,
+    finished_at = EXCLUDED.finished_at,
+    status      = EXCLUDED.status;
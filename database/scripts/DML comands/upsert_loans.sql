@@ -1,24 +1,36 @@
-INSERT INTO staging.loans
-(
-    client_id,
-    loan_name,
-    loan_amount,
-    loan_start_date,
-    loan_end_date,
-    payment_numbers,
-    paid_amount,
-    file_name,
-    load_ts
-)
+-- Заливаем кредиты из temp_loans в staging.loans; уже загруженные строки пропускаются.
+-- Возвращает число вставленных, обновлённых (всегда 0) и пропущенных строк.
+
+WITH
+  inserted AS (
+    INSERT INTO staging.loans
+    (
+        client_id,
+        loan_name,
+        loan_amount,
+        loan_start_date,
+        loan_end_date,
+        payment_numbers,
+        paid_amount,
+        file_name,
+        load_ts
+    )
+    SELECT
+        t.client_id,
+        t.loan_name,
+        t.loan_amount,
+        t.loan_start_date,
+        t.loan_end_date,
+        t.payment_numbers,
+        t.paid_amount,
+        t.file_name,
+        t.load_ts
+    FROM temp_loans AS t
+    ON CONFLICT (client_id, loan_name) DO NOTHING
+    RETURNING 1
+  )
 SELECT
-    t.client_id,
-    t.loan_name,
-    t.loan_amount,
-    t.loan_start_date,
-    t.loan_end_date,
-    t.payment_numbers,
-    t.paid_amount,
-    t.file_name,
-    t.load_ts
-FROM temp_loans AS t
-ON CONFLICT (client_id, loan_name) DO NOTHING;
+  COUNT(*) AS inserted,
+  0 AS updated,
+  (SELECT COUNT(*) FROM temp_loans) - COUNT(*) AS skipped
+FROM inserted;
@@ -1,22 +1,34 @@
-INSERT INTO staging.payments
-(
-    client_id,
-    loan_name,
-    payment_number,
-    payment_date,
-    payment_fact_date,
-    paid_fact_amount,
-    file_name,
-    load_ts
-)
+-- Заливаем платежи из temp_payments в staging.payments; уже загруженные строки пропускаются.
+-- Возвращает число вставленных, обновлённых (всегда 0) и пропущенных строк.
+
+WITH
+  inserted AS (
+    INSERT INTO staging.payments
+    (
+        client_id,
+        loan_name,
+        payment_number,
+        payment_date,
+        payment_fact_date,
+        paid_fact_amount,
+        file_name,
+        load_ts
+    )
+    SELECT
+        t.client_id,
+        t.loan_name,
+        t.payment_number,
+        t.payment_date,
+        t.payment_fact_date,
+        t.paid_fact_amount,
+        t.file_name,
+        t.load_ts
+    FROM temp_payments AS t
+    ON CONFLICT (client_id, loan_name, payment_number) DO NOTHING
+    RETURNING 1
+  )
 SELECT
-    t.client_id,
-    t.loan_name,
-    t.payment_number,
-    t.payment_date,
-    t.payment_fact_date,
-    t.paid_fact_amount,
-    t.file_name,
-    t.load_ts
-FROM temp_payments AS t
-ON CONFLICT (client_id, loan_name, payment_number) DO NOTHING;
+  COUNT(*) AS inserted,
+  0 AS updated,
+  (SELECT COUNT(*) FROM temp_payments) - COUNT(*) AS skipped
+FROM inserted;
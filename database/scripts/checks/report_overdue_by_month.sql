@@ -0,0 +1,6 @@
+-- Отчёт о просрочках по месяцам и bucket-ам суммы кредита — тот же запрос, что выполняет Power BI:
+-- чтение представления vw_overdue_by_month_and_amount (готовая сводка mart.overdue_rollup).
+-- Используется командой explain для сравнения планов до и после изменения индексов.
+
+SELECT *
+FROM vw_overdue_by_month_and_amount;
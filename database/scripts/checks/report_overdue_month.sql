@@ -0,0 +1,25 @@
+-- Отчёт о просрочках за последний месяц витрины по bucket-ам суммы кредита
+-- (те же агрегаты, что refresh_overdue_rollup.sql считает для каждого затронутого месяца).
+-- Используется командой explain для сравнения планов до и после изменения индексов.
+
+WITH
+  last_period AS (
+    SELECT date_trunc('month', MAX(payment_date)) AS period FROM mart.data_mart
+  )
+SELECT
+  CASE
+      WHEN m.loan_amount < 50000  THEN 'До 50 000'
+      WHEN m.loan_amount < 100000 THEN 'До 100 000'
+      WHEN m.loan_amount < 500000 THEN 'До 500 000'
+      ELSE 'От 500 000'
+    END AS loan_amount_bucket,
+  COUNT(DISTINCT (m.client_id, m.loan_name)) AS total_loans,
+  COUNT(DISTINCT m.client_id) AS total_clients,
+  SUM(m.loan_amount) AS sum_issued_loans,
+  COUNT(DISTINCT (m.client_id, m.loan_name)) FILTER (WHERE m.status) AS total_overdue_loans,
+  COALESCE(SUM(m.paid_fact_amount) FILTER (WHERE m.status), 0) AS sum_overdue_payments
+FROM mart.data_mart AS m
+WHERE m.payment_date >= (SELECT period FROM last_period)
+  AND m.payment_date <  (SELECT period FROM last_period) + INTERVAL '1 month'
+GROUP BY
+  loan_amount_bucket;
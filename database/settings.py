@@ -0,0 +1,10 @@
+# Способы заливки DataFrame во временную таблицу
+LOAD_METHODS = ("copy", "multi")
+
+# Настройки пула соединений по умолчанию (переопределяются переменными .env с теми же именами)
+POOL_DEFAULTS = {
+    "DB_POOL_SIZE": 5,
+    "DB_MAX_OVERFLOW": 10,
+    "DB_STATEMENT_TIMEOUT_MS": 0,
+    "DB_APP_NAME": "liga_loader",
+}
@@ -1,82 +1,347 @@
+from __future__ import annotations
+
 import os
 import sys
 import argparse
 import json
+import hashlib
+import queue
+import signal
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-import pandas as pd
+from typing import TYPE_CHECKING, Iterator, Optional
 from dotenv import load_dotenv
-from sqlalchemy import text
 
-from data_generation.generator import DataGenerator
-from data_generation.config import FEATURE_CONFIG
-from database.db_extractor import DBExtractor
+from data_generation.config import (
+    FEATURE_CONFIG, SPLIT_MODES, SPLIT_MANIFEST, PART_COMPLETE_MARKER, GENERATION_ENGINES
+)
+from data_generation.fixture_cache import (
+    DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, FixtureCache, clear_marker, read_marker, write_marker
+)
+from data_generation.storage import DATA_FORMATS, BATCH_SIZE, TABLE_DTYPES, TableBatches, detect_format, table_path
+from database.settings import LOAD_METHODS
+from utils.stage_timer import PROFILERS, StageTimer, profiled
+
+# Тяжёлые библиотеки (pandas, numpy, Faker, SQLAlchemy) импортируются внутри команд, которым они нужны:
+# --help и подкоманды не платят при старте за то, чем не пользуются (см. benchmarks/bench_import_time.py)
+if TYPE_CHECKING:
+    import pandas as pd
+    from database.db_extractor import DBExtractor
 
 
-def json_to_dataframe(path: str) -> pd.DataFrame:
+def file_to_batches(path: str,
+                    data_format: str = "json",
+                    batch_size: Optional[int] = None) -> TableBatches:
     """
-    Преобразует JSON-файл в pandas.DataFrame с добавлением полей:
-    -- file_name: имя файла (basename),
-    -- load_ts: текущий timestamp.
+    Потоково читает файл части (JSON-массив, NDJSON или Parquet) порциями pandas.DataFrame
+    с добавлением поля file_name: имя файла (basename).
+    Порции можно сразу отправлять в БД, не дожидаясь разбора всего файла;
+    при повторном проходе (повтор этапа загрузки) файл читается заново.
 
     Параметры:
-    -- path: путь до JSON-файла
+    -- path: путь до файла
+    -- data_format: формат файла ('json' или 'parquet'; Parquet читается через memory map)
+    -- batch_size: сколько строк в одной порции (None — BATCH_SIZE из storage)
     """
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    return TableBatches(path, data_format, batch_size or BATCH_SIZE, columns={'file_name': os.path.basename(path)})
 
-    df = pd.DataFrame(data)
-    df['file_name'] = os.path.basename(path)
-    df['load_ts'] = datetime.today()
 
-    return df
+def read_split_manifest(parts_files_folder: str) -> dict:
+    """
+    Читает manifest.json, который split кладёт в папку с частями.
+    Для папок, разбитых до появления манифеста, считаем режим кумулятивным, а формат — JSON.
+    """
+    manifest_path = os.path.join(parts_files_folder, SPLIT_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {'mode': 'cumulative', 'parts': None, 'format': 'json'}
 
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest.setdefault('format', 'json')
+    return manifest
 
-def cmd_generate(args, raw_files_folder: str, start_loan_date: str) -> None:
+
+def list_part_numbers(parts_files_folder: str) -> list:
     """
-    Режим generate: пересоздаём полностью «сырые» JSON: clients.json, loans.json, payments.json.
+    Возвращает отсортированные номера частей part_N из папки с частями
+    (не больше количества частей из манифеста, чтобы не подхватить остатки прошлого разбиения).
     """
-    generator = DataGenerator(FEATURE_CONFIG, raw_files_folder)
+    manifest = read_split_manifest(parts_files_folder)
+    part_nums = sorted(
+        int(d.split("_")[1]) for d in os.listdir(parts_files_folder)
+        if d.startswith("part_") and os.path.isdir(os.path.join(parts_files_folder, d))
+    )
+    if manifest['parts'] is not None:
+        part_nums = [n for n in part_nums if n <= manifest['parts']]
+    return part_nums
 
-    generator.generate_data(args.num_clients, start_loan_date)
-    print('✅  «Сырые» JSON-файлы успешно сгенерированы.\n')
+
+def open_fixture_cache(args) -> Optional[FixtureCache]:
+    """
+    Кэш фикстур для generate и split (FIXTURE_CACHE_DIR, предел FIXTURE_CACHE_MAX_MB)
+    или None, если он выключен через --no-cache.
+    """
+    if args.no_cache:
+        return None
+    return FixtureCache(
+        os.getenv("FIXTURE_CACHE_DIR", DEFAULT_CACHE_DIR), float(os.getenv("FIXTURE_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    )
 
 
-def cmd_split(args, raw_files_folder: str, parts_files_folder: str) -> None:
+def cmd_generate(args, raw_files_folder: str, start_loan_date: str, timer: Optional[StageTimer] = None) -> None:
     """
-    Режим split: разбиваем существующие JSON на кумулятивные части по дате старта кредита.
+    Режим generate: пересоздаём полностью «сырые» файлы clients, loans, payments
+    в формате --format (JSON по умолчанию или Parquet). Этапы замеряются таймером timer.
+
+    При заданном --seed результат детерминирован, поэтому файлы берутся из кэша фикстур,
+    если такой набор (те же число клиентов, seed, START_LOAN_DATE, FEATURE_CONFIG, движок, формат
+    и дата запуска) уже генерировался, а новый набор сохраняется в кэш.
     """
-    existing_jsons = [f for f in os.listdir(raw_files_folder) if f.endswith(".json")]
-    if len(existing_jsons) != 3:
-        print("❌  ОШИБКА: в папке raw отсутствуют все три JSON (clients.json, loans.json, payments.json).")
+    if args.workers > 1 and args.engine != "numpy":
+        print("❌  ОШИБКА: параллельная генерация (--workers) доступна только для --engine numpy.")
+        sys.exit(1)
+
+    timer = timer or StageTimer(enabled=False)
+    # Генерация с --seed всегда идёт блоками со своими SeedSequence (как при --workers > 1):
+    # тогда результат зависит только от seed и --chunk-size, а не от --workers и --stream
+    stream = args.stream or args.workers > 1 or args.seed is not None
+    cache = open_fixture_cache(args) if args.seed is not None else None
+    os.makedirs(raw_files_folder, exist_ok=True)
+    clear_marker(raw_files_folder)
+
+    if cache is not None:
+        key, params = cache.generation_key(args.num_clients, args.seed, start_loan_date, FEATURE_CONFIG,
+                                           args.engine, args.format, args.chunk_size if stream else None)
+        with timer.stage("fixture_restore", key=key) as stage:
+            files = cache.restore(key, raw_files_folder)
+            stage['affected'] = {'hit': files is not None}
+        if files is not None:
+            write_marker(raw_files_folder, key, files)
+            print(f"♻️  «Сырые» {args.format}-файлы взяты из кэша фикстур ({key}).\n")
+            return
+
+    from data_generation.generator import DataGenerator
+
+    generator = DataGenerator(FEATURE_CONFIG, raw_files_folder, engine=args.engine, seed=args.seed,
+                              data_format=args.format, timer=timer)
+
+    if stream:
+        stats = generator.generate_data_stream(args.num_clients, start_loan_date, args.chunk_size, args.workers)
+        print(f"✅  «Сырые» {args.format}-файлы успешно сгенерированы потоково: клиентов {stats['clients']}, "
+              f"кредитов {stats['loans']}, платежей {stats['payments']}.")
+        print(f"📈  Пиковый RSS: {stats['peak_rss_mb']:.1f} МБ.\n")
+    else:
+        generator.generate_data(args.num_clients, start_loan_date)
+        print(f'✅  «Сырые» {args.format}-файлы успешно сгенерированы.\n')
+
+    if cache is not None:
+        files = [os.path.basename(table_path(raw_files_folder, table, args.format))
+                 for table in ("clients", "loans", "payments")]
+        with timer.stage("fixture_store", key=key):
+            stored = cache.store(key, raw_files_folder, files, params)
+        if stored:
+            write_marker(raw_files_folder, key, files)
+            print(f"💾  Набор сохранён в кэш фикстур ({key}).\n")
+        else:
+            print("⚠️  Набор больше предела кэша фикстур (FIXTURE_CACHE_MAX_MB) и не сохранён.\n")
+
+
+def cmd_split(args, raw_files_folder: str, parts_files_folder: str, timer: Optional[StageTimer] = None) -> None:
+    """
+    Режим split: разбиваем существующие «сырые» файлы на части по дате старта кредита
+    (кумулятивные или дельта-части, см. --mode) и сохраняем части в формате --format.
+    Этапы замеряются таймером timer.
+
+    Если «сырые» файлы взяты из кэша фикстур или сохранены в него (см. cmd_generate) и не менялись,
+    части с теми же --parts, --mode и --format тоже берутся из кэша или сохраняются в него.
+    """
+    if any(detect_format(raw_files_folder, table, args.format) is None for table in ("clients", "loans", "payments")):
+        print("❌  ОШИБКА: в папке raw отсутствуют все три файла (clients, loans, payments в JSON или Parquet).")
         print("Сначала выполните: python main.py generate")
         sys.exit(1)
 
     os.makedirs(parts_files_folder, exist_ok=True)
 
+    timer = timer or StageTimer(enabled=False)
+    raw_key = read_marker(raw_files_folder)
+    cache = open_fixture_cache(args) if raw_key is not None else None
+
+    if cache is not None:
+        key, params = cache.split_key(raw_key, args.parts, args.mode, args.format)
+        with timer.stage("fixture_restore", key=key) as stage:
+            files = cache.restore(key, parts_files_folder)
+            stage['affected'] = {'hit': files is not None}
+        if files is not None:
+            print(f'♻️  Части ({args.parts}, {args.mode}, {args.format}) взяты из кэша фикстур ({key}) '
+                  f'в папку "{parts_files_folder}".\n')
+            return
+
+    from data_generation.generator import DataGenerator
+
     generator = DataGenerator(FEATURE_CONFIG, raw_files_folder)
     generator.split_jsons_by_loan_start_date(
         raw_files_folder=raw_files_folder,
         output_dir=parts_files_folder,
-        parts=args.parts
+        parts=args.parts,
+        mode=args.mode,
+        data_format=args.format,
+        timer=timer
     )
-    print(f'✅  «Сырые» данные разбиты на {args.parts} частей в папке "{parts_files_folder}".\n')
+    print(f'✅  «Сырые» данные разбиты на {args.parts} частей ({args.mode}, {args.format}) в папке "{parts_files_folder}".\n')
 
+    if cache is not None:
+        files = [SPLIT_MANIFEST] + [
+            os.path.relpath(table_path(os.path.join(parts_files_folder, f"part_{i}"), f"{table}_{i}", args.format),
+                            parts_files_folder)
+            for i in range(1, args.parts + 1)
+            for table in ("clients", "loans", "payments")
+        ] + [os.path.join(f"part_{i}", PART_COMPLETE_MARKER) for i in range(1, args.parts + 1)]
+        with timer.stage("fixture_store", key=key):
+            stored = cache.store(key, parts_files_folder, files, params)
+        if stored:
+            print(f"💾  Части сохранены в кэш фикстур ({key}).\n")
 
-def cmd_shema(extractor: DBExtractor) -> None:
+
+def cmd_shema(extractor: DBExtractor, partitioned: bool = False) -> None:
     """
     Режим shema: создаём схемы staging и core + необходимые таблицы и типы.
+    Скрипты идемпотентны, поэтому команду можно повторить для обновления структуры.
+
+    Параметры:
+    -- extractor: экземпляр DBExtractor;
+    -- partitioned: создать core.payments и mart.data_mart секционированными по месяцу payment_date
+                    (пустые обычные таблицы заменяются, секции досоздаются во время load).
     """
     extractor.execute_sql_script("database/scripts/DDL comands/create_shemas.sql")
+    extractor.execute_sql_script("database/scripts/DDL comands/create_partition_functions.sql")
     extractor.execute_sql_script("database/scripts/DDL comands/create_staging_tables.sql")
     extractor.execute_sql_script("database/scripts/DDL comands/create_core_tables.sql")
     extractor.execute_sql_script("database/scripts/DDL comands/create_datamart_table.sql")
+    if partitioned:
+        extractor.execute_sql_script("database/scripts/DDL comands/create_partitioned_tables.sql")
+    extractor.execute_sql_script("database/scripts/DDL comands/create_indexes.sql")
+    extractor.execute_sql_script("database/scripts/DDL comands/create_load_watermark_table.sql")
+    extractor.execute_sql_script("database/scripts/DDL comands/create_load_ledger_table.sql")
     print("✅  Схемы и таблицы успешно созданы.\n")
 
 
-def cmd_load(part_num: int, parts_files_folder: str, extractor: DBExtractor) -> None:
+def cmd_check(extractor: DBExtractor) -> None:
     """
-    Режим load: инкрементально загружаем в staging и core одну указанную часть part_num.
-    Проверяем, что нельзя пропустить части (на основе staging.clients.file_name).
+    Режим check: сверяем сводку mart.overdue_rollup (через vw_overdue_by_month_and_amount)
+    с полным пересчётом по mart.data_mart, как это делало прежнее представление.
+    """
+    stats = extractor.execute_sql_script("database/scripts/checks/check_overdue_rollup.sql")
+    if stats['mismatched_rows']:
+        print(f"❌  ОШИБКА: сводка расходится с полным пересчётом в {stats['mismatched_rows']} строках "
+              f"(строк в сводке: {stats['rollup_rows']}, в пересчёте: {stats['reference_rows']}).")
+        sys.exit(1)
+    print(f"✅  Сводка совпадает с полным пересчётом ({stats['rollup_rows']} строк).\n")
+
+
+# Отчётные запросы, планы которых сравнивает команда explain
+EXPLAIN_SCRIPTS = {
+    "overdue_by_month": "database/scripts/checks/report_overdue_by_month.sql",
+    "overdue_last_month": "database/scripts/checks/report_overdue_month.sql",
+    # пересчёт сводки при загрузке части (под EXPLAIN ANALYZE изменения откатываются)
+    "overdue_rollup_refresh": "database/scripts/DML comands/refresh_overdue_rollup.sql",
+}
+
+
+def plan_summary(plan: dict) -> dict:
+    """
+    Краткая сводка плана EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON):
+    время планирования и выполнения, прочитанные блоки и использованные индексы.
+    """
+    indexes, nodes = set(), [plan['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        nodes.extend(node.get('Plans', []))
+    return {
+        'planning_ms': plan['Planning Time'],
+        'execution_ms': plan['Execution Time'],
+        'shared_hit': plan['Plan'].get('Shared Hit Blocks', 0),
+        'shared_read': plan['Plan'].get('Shared Read Blocks', 0),
+        'indexes': sorted(indexes),
+    }
+
+
+def cmd_explain(extractor: DBExtractor, output: Optional[str] = None, compare: Optional[str] = None) -> None:
+    """
+    Режим explain: выполняем отчётные запросы (EXPLAIN_SCRIPTS) под EXPLAIN (ANALYZE, BUFFERS)
+    и выводим время, прочитанные блоки и использованные индексы.
+
+    Параметры:
+    -- output: путь к JSON-файлу, куда сохранить полные планы (например, до изменения индексов);
+    -- compare: путь к ранее сохранённому файлу — вывести время «было -> стало» по каждому запросу.
+    """
+    previous = {}
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    plans = {}
+    for name, path in EXPLAIN_SCRIPTS.items():
+        plans[name] = extractor.explain_sql_script(path)
+        summary = plan_summary(plans[name])
+        print(f"📋  {name}: выполнение {summary['execution_ms']:.1f} мс, планирование {summary['planning_ms']:.1f} мс, "
+              f"блоков shared hit/read: {summary['shared_hit']}/{summary['shared_read']}")
+        print(f"    индексы: {', '.join(summary['indexes']) or 'не используются'}")
+        if name in previous:
+            before = plan_summary(previous[name])
+            print(f"    было: {before['execution_ms']:.1f} мс, блоков {before['shared_hit'] + before['shared_read']}, "
+                  f"индексы: {', '.join(before['indexes']) or 'не используются'}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(plans, f, ensure_ascii=False, indent=2)
+        print(f"✅  Планы сохранены в {output}.")
+    print()
+
+
+@contextmanager
+def indexes_dropped(extractor: DBExtractor, enabled: bool = True) -> Iterator[None]:
+    """
+    На время блока удаляет управляемые вторичные индексы (drop_indexes.sql), а после него —
+    в том числе после ошибки — строит их заново (create_indexes.sql) и обновляет статистику.
+    Большая загрузка без индексов не обновляет их построчно, а одно построение быстрее.
+
+    Параметры:
+    -- extractor: экземпляр DBExtractor;
+    -- enabled: False — блок выполняется без изменения индексов.
+    """
+    if not enabled:
+        yield
+        return
+    extractor.execute_sql_script("database/scripts/DDL comands/drop_indexes.sql")
+    print("🗑️  Вторичные индексы удалены на время загрузки.\n")
+    try:
+        yield
+    finally:
+        extractor.execute_sql_script("database/scripts/DDL comands/create_indexes.sql")
+        extractor.execute_sql_script("database/scripts/DML comands/analyze_tables.sql")
+        print("✅  Вторичные индексы построены заново, статистика обновлена.\n")
+
+
+# Таблицы части в порядке загрузки; для каждой есть create_temp_table_<t>.sql, upsert_<t>.sql и insert_to_<t>.sql
+LOAD_TABLES = ("clients", "loans", "payments")
+
+
+def open_part(part_num: int,
+              parts_files_folder: str,
+              data_format: Optional[str] = None,
+              chunksize: Optional[int] = None) -> dict:
+    """
+    Проверяет папку и файлы части part_num, считает их контрольные суммы и открывает на потоковое чтение.
+    Возвращает {'part_num': N, 'files': {таблица: {'file_name', 'checksum'}},
+    'frames': {таблица: итератор порций DataFrame}}.
+
+    Параметры:
+    -- data_format: формат файлов части ('json' или 'parquet', None — из manifest.json);
+    -- chunksize: размер порции строк при чтении (None — значение по умолчанию).
     """
     if part_num < 1:
         print("❌  ОШИБКА: номер части должен быть >= 1.")
@@ -87,73 +352,531 @@ def cmd_load(part_num: int, parts_files_folder: str, extractor: DBExtractor) ->
         print(f"❌  ОШИБКА: папки '{part_folder}' не существует. Сначала выполните 'split'.")
         sys.exit(1)
 
-    # Проверяем наличие JSON-файлов внутри part_N
-    clients_path  = f"{part_folder}/clients_{part_num}.json"
-    loans_path    = f"{part_folder}/loans_{part_num}.json"
-    payments_path = f"{part_folder}/payments_{part_num}.json"
+    # Проверяем наличие файлов части внутри part_N
+    data_format = data_format or read_split_manifest(parts_files_folder)['format']
+    paths = {table: table_path(part_folder, f"{table}_{part_num}", data_format) for table in LOAD_TABLES}
 
-    for p in (clients_path, loans_path, payments_path):
+    for p in paths.values():
         if not os.path.exists(p):
             print(f"❌  ОШИБКА: не найден файл '{p}'. Невозможно загрузить часть {part_num}.")
             sys.exit(1)
 
-    # 0) Узнаём, какая часть уже загружена (по file_name в staging.clients)
-    with extractor.engine.connect() as conn:
-        result = conn.execute(text(
-            """
-            SELECT
-              MAX((regexp_match(file_name, 'clients_(\\d+)\\.json'))[1]::INTEGER) AS last_part
-            FROM staging.clients;
-            """
-        ))
-        last_part = result.scalar()  # None, если ещё не было записей
-
-    # 1) Проверка последовательности
-    if last_part is None:
-        if part_num != 1:
+    return {
+        'part_num': part_num,
+        'files': {
+            table: {'file_name': os.path.basename(path), 'checksum': file_checksum(path)}
+            for table, path in paths.items()
+        },
+        'frames': {table: file_to_batches(path, data_format, chunksize) for table, path in paths.items()},
+    }
+
+
+def prepare_part(part_num: int,
+                 parts_files_folder: str,
+                 data_format: Optional[str] = None,
+                 chunksize: Optional[int] = None,
+                 timer: Optional[StageTimer] = None) -> dict:
+    """
+    Полностью читает часть part_num в память (порциями DataFrame) и проверяет, что в каждой порции
+    есть все колонки таблицы. Используется конвейером load --all, чтобы готовить следующую часть,
+    пока текущая заливается в БД. Чтение каждой таблицы замеряется таймером timer.
+    """
+    timer = timer or StageTimer(enabled=False)
+    part = open_part(part_num, parts_files_folder, data_format, chunksize)
+
+    for table, frames in part['frames'].items():
+        with timer.stage(f"prepare:{table}", part=part_num) as stage:
+            frames = list(frames)
+            stage['rows_out'] = sum(len(df) for df in frames)
+        for df in frames:
+            missing = set(TABLE_DTYPES[table]) - set(df.columns)
+            if missing:
+                print(f"❌  ОШИБКА: в файле {table}_{part_num} нет колонок: {', '.join(sorted(missing))}.")
+                sys.exit(1)
+        part['frames'][table] = frames
+
+    return part
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 файла (читается блоками по 1 МБ) — сохраняется в журнал загрузок."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def last_loaded_part(extractor: DBExtractor, conn=None) -> Optional[int]:
+    """
+    Номер последней полностью загруженной части — по журналу staging.load_ledger
+    (часть загружена, если зафиксирован её последний этап 'mart'). None, если ещё не было загрузок.
+    """
+    from sqlalchemy import text
+
+    query = text(
+        """
+        SELECT part_num
+        FROM staging.load_ledger
+        WHERE table_name = 'mart' AND status = 'loaded'
+        ORDER BY part_num DESC
+        LIMIT 1;
+        """
+    )
+    if conn is not None:
+        return conn.execute(query).scalar()
+    with extractor.engine.connect() as new_conn:
+        return new_conn.execute(query).scalar()
+
+
+def read_part_ledger(extractor: DBExtractor, part_num: int, conn=None) -> dict:
+    """Строки журнала загрузок части part_num: {этап: {'status', 'checksum', 'row_count'}}."""
+    from sqlalchemy import text
+
+    query = text("SELECT table_name, status, checksum, row_count FROM staging.load_ledger WHERE part_num = :part_num")
+    if conn is not None:
+        return {row['table_name']: dict(row) for row in conn.execute(query, {'part_num': part_num}).mappings()}
+    with extractor.engine.connect() as new_conn:
+        return {row['table_name']: dict(row) for row in new_conn.execute(query, {'part_num': part_num}).mappings()}
+
+
+def next_load_ts(extractor: DBExtractor, conn=None) -> datetime:
+    """
+    Ключ порции (load_ts) для очередной части — из часов БД (clock_timestamp()), строго больше
+    всех водяных отметок и load_ts в staging. Часы клиента в сравнении с отметками не участвуют.
+    """
+    row = extractor.execute_sql_script("database/scripts/DML comands/next_load_ts.sql", conn=conn)
+    return row['load_ts']
+
+
+def record_ledger(extractor: DBExtractor, part_num: int, table_name: str, status: str,
+                  started_at: datetime, file_info: Optional[dict] = None, row_count: Optional[int] = None,
+                  conn=None) -> None:
+    """
+    Записывает строку журнала загрузок. Для статуса 'loaded' передаётся conn этапа,
+    чтобы строка зафиксировалась вместе с данными; 'failed' пишется отдельной транзакцией.
+    """
+    file_info = file_info or {}
+    extractor.execute_sql_script(
+        "database/scripts/DML comands/upsert_load_ledger.sql",
+        params={
+            'part_num': part_num,
+            'table_name': table_name,
+            'file_name': file_info.get('file_name'),
+            'row_count': row_count,
+            'checksum': file_info.get('checksum'),
+            'started_at': started_at,
+            'status': status,
+        },
+        conn=conn
+    )
+
+
+def plan_part(part_num: int, last_part: Optional[int]) -> str:
+    """
+    Решение по части part_num по журналу загрузок, где last_part — последняя полностью
+    загруженная часть (None — ещё ни одной):
+    'skip' — часть уже загружена; 'load' — это следующая по порядку часть;
+    'out_of_order' — загрузка пропустила бы предыдущие части.
+    """
+    if last_part is not None and part_num <= last_part:
+        return 'skip'
+    if part_num == (last_part or 0) + 1:
+        return 'load'
+    return 'out_of_order'
+
+
+def plan_stage(entry: Optional[dict], checksum: str) -> str:
+    """
+    Решение по этапу части по его строке журнала entry (None — этап ещё не начинался):
+    'load' — этап не загружен или упал ('failed') и загружается заново;
+    'skip' — этап уже загружен из того же файла (checksum совпадает);
+    'changed' — этап загружен, но файл с тех пор изменился.
+    """
+    if entry is None or entry['status'] != 'loaded':
+        return 'load'
+    return 'skip' if entry['checksum'] == checksum else 'changed'
+
+
+def run_stage(extractor: DBExtractor, stage, part_num: int, table_name: str,
+              file_info: Optional[dict] = None, conn=None, retries: int = 0):
+    """
+    Выполняет этап загрузки части stage(conn) и возвращает его результат.
+
+    Без conn этап идёт отдельной транзакцией. С conn (режим --atomic) — внутри SAVEPOINT
+    общей транзакции части: при ошибке откатывается только этот этап и повторяется
+    до retries раз, уже выполненные этапы части заново не отправляются.
+    Если этап так и не удался, в журнал пишется строка 'failed' (отдельной транзакцией).
+    """
+    started_at = datetime.now()
+    attempt = 0
+    while True:
+        try:
+            if conn is None:
+                with extractor.engine.begin() as stage_conn:
+                    return stage(stage_conn, started_at)
+            with conn.begin_nested():
+                return stage(conn, started_at)
+        except Exception:
+            if conn is not None and attempt < retries:
+                attempt += 1
+                print(f"🔁  Этап {table_name} части part_{part_num} откатан до точки сохранения, "
+                      f"повтор {attempt} из {retries} …")
+                continue
+            record_ledger(extractor, part_num, table_name, 'failed', started_at, file_info)
+            raise
+
+
+def load_part(part: dict,
+              extractor: DBExtractor,
+              method: str = "copy",
+              chunksize: Optional[int] = None,
+              atomic: bool = False,
+              retries: int = 2,
+              copy_workers: int = 1) -> None:
+    """
+    Инкрементально загружает открытую (open_part) или подготовленную (prepare_part) часть
+    в staging, core и mart. Перед загрузкой проверяет по журналу staging.load_ledger,
+    что части не пропускаются.
+
+    Каждый этап (clients, loans, payments — staging + core; mart — витрина и сводка) выполняется
+    вместе со своей строкой журнала. Уже зафиксированные этапы части пропускаются,
+    поэтому после сбоя посреди части её можно просто загрузить повторно.
+    Уже загруженная часть целиком пропускается.
+
+    Параметры:
+    -- atomic: загрузить часть одним соединением и одной транзакцией: часть фиксируется
+       целиком или не фиксируется вовсе, каждый этап — под своим SAVEPOINT;
+    -- retries: сколько раз в режиме atomic повторять упавший этап, не откатывая предыдущие;
+    -- copy_workers: сколько потоков параллельно заливают платежи через COPY (шарды по client_id).
+    """
+    with extractor.timer.stage(f"part_{part['part_num']}", atomic=atomic):
+        try:
+            if atomic:
+                with extractor.engine.connect() as conn:
+                    with conn.begin():
+                        load_part_stages(part, extractor, method, chunksize, conn, retries, copy_workers)
+                return
+            load_part_stages(part, extractor, method, chunksize, copy_workers=copy_workers)
+        finally:
+            # шарды параллельной заливки платежей удаляются, когда транзакции части уже
+            # зафиксированы или откачены (DROP внутри них откатился бы вместе с ними)
+            extractor.drop_pending_shards()
+
+
+def load_part_stages(part: dict,
+                     extractor: DBExtractor,
+                     method: str = "copy",
+                     chunksize: Optional[int] = None,
+                     conn=None,
+                     retries: int = 0,
+                     copy_workers: int = 1) -> None:
+    """Этапы загрузки части (см. load_part); с conn все этапы идут в его транзакции."""
+    part_num = part['part_num']
+    last_part = last_loaded_part(extractor, conn)
+
+    # Проверка последовательности
+    action = plan_part(part_num, last_part)
+    if action == 'skip':
+        print(f"⏭️  part_{part_num} уже загружена, пропускаем.\n")
+        return
+    if action == 'out_of_order':
+        if last_part is None:
             print("❌  ОШИБКА: ещё не загружена ни одна часть. Сначала выполните загрузку part_1.")
-            sys.exit(1)
-    else:
-        if part_num != last_part + 1:
+        else:
             print(f"❌ ОШИБКА: последняя загруженная часть — part_{last_part}. "
                   f"Теперь можно загружать только part_{last_part + 1}.")
+        sys.exit(1)
+
+    ledger = read_part_ledger(extractor, part_num, conn)
+
+    # Все строки части получают один load_ts: по нему insert_to_*.sql отбирают текущую порцию
+    load_ts = next_load_ts(extractor, conn)
+
+    # Инкрементальная загрузка клиентов, займов и платежей
+    for table in LOAD_TABLES:
+        file_info = part['files'][table]
+        entry = ledger.get(table)
+        action = plan_stage(entry, file_info['checksum'])
+        if action == 'changed':
+            print(f"❌  ОШИБКА: файл {file_info['file_name']} изменился после частичной загрузки part_{part_num}. "
+                  f"Восстановите исходный файл или пересоздайте БД.")
             sys.exit(1)
+        if action == 'skip':
+            print(f"⏭️  {table} из part_{part_num} уже загружены ({entry['row_count']} строк), пропускаем.")
+            continue
 
-    # 2) Инкрементальная загрузка клиентов
-    df_clients = json_to_dataframe(clients_path)
-    extractor.incremental_load(
-        df=df_clients,
-        create_temp_sql_path="database/scripts/DDL comands/create_temp_table_clients.sql",
-        insert_sql_path="database/scripts/DML comands/upsert_clients.sql",
-        temp_table_name="temp_clients"
-    )
-    extractor.execute_sql_script("database/scripts/DML comands/insert_to_clients.sql")
-    print(f"✅  Успешная загрузка clients из part_{part_num} -> staging.clients -> core.clients.")
+        def load_table(stage_conn, started_at: datetime) -> tuple:
+            core_stats = {}
 
-    # 3) Инкрементальная загрузка займов
-    df_loans = json_to_dataframe(loans_path)
-    extractor.incremental_load(
-        df=df_loans,
-        create_temp_sql_path="database/scripts/DDL comands/create_temp_table_loans.sql",
-        insert_sql_path="database/scripts/dml comands/upsert_loans.sql",
-        temp_table_name="temp_loans"
-    )
-    extractor.execute_sql_script("database/scripts/DML comands/insert_to_loans.sql")
-    print(f"✅  Успешная загрузка loans из part_{part_num} -> staging.loans -> core.loans.")
+            def finalize(finalize_conn, rows: int) -> None:
+                # перенос в core и строка журнала фиксируются в одной транзакции с заливкой в staging
+                core_stats.update(extractor.execute_sql_script(
+                    f"database/scripts/DML comands/insert_to_{table}.sql", conn=finalize_conn
+                ) or {})
+                record_ledger(extractor, part_num, table, 'loaded', started_at, file_info, rows, conn=finalize_conn)
 
-    # 4) Инкрементальная загрузка платежей
-    df_payments = json_to_dataframe(payments_path)
-    extractor.incremental_load(
-        df=df_payments,
-        create_temp_sql_path="database/scripts/DDL comands/create_temp_table_payments.sql",
-        insert_sql_path="database/scripts/DML comands/upsert_payments.sql",
-        temp_table_name="temp_payments"
-    )
-    extractor.execute_sql_script("database/scripts/DML comands/insert_to_payments.sql")
-    print(f"✅  Успешная загрузка payments из part_{part_num} -> staging.payments -> core.payments.\n")
+            extractor.incremental_load(
+                df=part['frames'][table],
+                create_temp_sql_path=f"database/scripts/DDL comands/create_temp_table_{table}.sql",
+                insert_sql_path=f"database/scripts/DML comands/upsert_{table}.sql",
+                temp_table_name=f"temp_{table}",
+                method=method,
+                chunksize=chunksize,
+                finalize=finalize,
+                conn=stage_conn,
+                # самая большая таблица — платежи — заливается параллельно шардами по client_id
+                workers=copy_workers if table == "payments" else 1,
+                shard_like_table=f"staging.{table}",
+                # имя файла и load_ts одинаковы для всех строк: задаются DEFAULT-ами временной таблицы
+                constants={'file_name': file_info['file_name'], 'load_ts': load_ts}
+            )
+            return extractor.last_insert_stats, core_stats
+
+        with extractor.timer.stage(f"load:{table}") as stage:
+            staging_stats, core_stats = run_stage(extractor, load_table, part_num, table, file_info, conn, retries)
+            stage['rows_out'] = staging_stats.get('inserted', 0) + staging_stats.get('updated', 0)
+            stage['affected'] = {'staging': staging_stats, 'core': core_stats}
+        print(f"✅  Успешная загрузка {table} из part_{part_num} -> staging.{table} -> core.{table}.")
+        for layer, stats in ((f"staging.{table}", staging_stats), (f"core.{table}", core_stats)):
+            print(f"   {layer}: вставлено {stats.get('inserted', 0)}, обновлено {stats.get('updated', 0)}, "
+                  f"пропущено без изменений {stats.get('skipped', 0)}")
+        if table == "payments" and copy_workers > 1:
+            for stat in extractor.last_load_stats:
+                speed = stat['rows'] / stat['seconds'] if stat['seconds'] else 0
+                print(f"   📊  поток COPY {stat['worker']}: {stat['rows']} строк за {stat['seconds']:.2f} с "
+                      f"({speed:,.0f} строк/с)")
+    print()
+
+    # Витрина и сводка просрочек — вместе со строкой журнала 'mart'
+    def load_mart(stage_conn, started_at: datetime) -> tuple:
+        mart_stats = extractor.execute_sql_script("database/scripts/DML comands/insert_to_mart.sql", conn=stage_conn)
+        rollup_stats = extractor.execute_sql_script("database/scripts/DML comands/refresh_overdue_rollup.sql", conn=stage_conn)
+        record_ledger(extractor, part_num, 'mart', 'loaded', started_at, row_count=mart_stats['inserted'], conn=stage_conn)
+        return mart_stats, rollup_stats
+
+    with extractor.timer.stage("load:mart") as stage:
+        mart_stats, rollup_stats = run_stage(extractor, load_mart, part_num, 'mart', conn=conn, retries=retries)
+        stage['rows_out'] = mart_stats['inserted'] + mart_stats['updated']
+        stage['affected'] = {'mart': mart_stats, 'rollup': rollup_stats}
+    # статистика планировщика должна учитывать новые строки до следующей части и отчётов
+    extractor.execute_sql_script("database/scripts/DML comands/analyze_tables.sql", conn=conn)
+
+    print(f"✅  Успешная загрузка clients, loans, payments из part_{part_num} -> staging.payments -> core.payments -> mart.data_mart "
+          f"(вставлено строк: {mart_stats['inserted']}, обновлено строк: {mart_stats['updated']}).\n")
+    print(f"✅  Сводка mart.overdue_rollup пересчитана за {rollup_stats['periods']} мес. "
+          f"(строк обновлено: {rollup_stats['rows_upserted']}).\n")
+
+
+def cmd_load(part_num: int,
+             parts_files_folder: str,
+             extractor: DBExtractor,
+             method: str = "copy",
+             chunksize: Optional[int] = None,
+             data_format: Optional[str] = None,
+             atomic: bool = False,
+             retries: int = 2,
+             copy_workers: int = 1) -> None:
+    """
+    Режим load: инкрементально загружаем в staging и core одну указанную часть part_num.
+    Файлы читаются потоково, порции сразу отправляются в БД.
+
+    Параметры:
+    -- method: способ заливки во временные таблицы ('copy' или 'multi');
+    -- chunksize: размер порции строк при чтении файлов и заливке (None — значение по умолчанию);
+    -- data_format: формат файлов части ('json' или 'parquet', None — из manifest.json);
+    -- atomic, retries: загрузка части одной транзакцией с повтором упавшего этапа (см. load_part);
+    -- copy_workers: сколько потоков параллельно заливают платежи (см. load_part).
+    """
+    part = open_part(part_num, parts_files_folder, data_format, chunksize)
+    load_part(part, extractor, method, chunksize, atomic, retries, copy_workers)
+
+
+def cmd_load_all(parts_files_folder: str,
+                 extractor: DBExtractor,
+                 method: str = "copy",
+                 chunksize: Optional[int] = None,
+                 data_format: Optional[str] = None,
+                 prefetch: int = 1,
+                 atomic: bool = False,
+                 retries: int = 2,
+                 copy_workers: int = 1) -> None:
+    """
+    Режим load --all: загружаем все части по порядку конвейером.
+    Фоновый поток читает и проверяет следующие части (prepare_part), пока основной поток
+    заливает текущую в БД. Между ними — ограниченная очередь на prefetch готовых частей,
+    поэтому в памяти одновременно не больше prefetch + 2 частей. Части загружаются строго
+    по возрастанию номера, проверка последовательности выполняется перед каждой частью.
+
+    Параметры:
+    -- prefetch: сколько частей готовить заранее (0 — без конвейера, части читаются потоково по очереди);
+    -- atomic, retries: каждая часть — одна транзакция с повтором упавшего этапа (см. load_part);
+    -- copy_workers: сколько потоков параллельно заливают платежи (см. load_part).
+    """
+    # Уже загруженные части (по журналу загрузок) не читаем
+    last_part = last_loaded_part(extractor) or 0
+    part_nums = list_part_numbers(parts_files_folder)
+    if part_nums and part_nums[0] <= last_part:
+        print(f"⏭️  Части до part_{last_part} включительно уже загружены, пропускаем.\n")
+        part_nums = [n for n in part_nums if n > last_part]
+
+    if prefetch < 1:
+        for part_num in part_nums:
+            print(f"▶️  Загружаем part_{part_num} …")
+            cmd_load(part_num, parts_files_folder, extractor, method, chunksize, data_format,
+                     atomic, retries, copy_workers)
+        return
+
+    prepared = queue.Queue(maxsize=prefetch)
+
+    def producer() -> None:
+        try:
+            for part_num in part_nums:
+                prepared.put(prepare_part(part_num, parts_files_folder, data_format, chunksize, extractor.timer))
+        except BaseException as e:
+            # ошибку (в том числе sys.exit из проверок) передаём основному потоку
+            prepared.put(e)
+
+    threading.Thread(target=producer, name="prepare-parts", daemon=True).start()
+
+    for _ in part_nums:
+        part = prepared.get()
+        if isinstance(part, BaseException):
+            raise part
+        print(f"▶️  Загружаем part_{part['part_num']} …")
+        load_part(part, extractor, method, chunksize, atomic, retries, copy_workers)
+
+
+def cmd_load_watch(parts_files_folder: str,
+                   extractor: DBExtractor,
+                   method: str = "copy",
+                   chunksize: Optional[int] = None,
+                   data_format: Optional[str] = None,
+                   atomic: bool = False,
+                   retries: int = 2,
+                   copy_workers: int = 1,
+                   poll_interval: float = 2.0,
+                   status_file: Optional[str] = None,
+                   counters: Optional[dict] = None) -> None:
+    """
+    Режим load --watch: долгоживущий загрузчик. Следит за папкой с частями и загружает
+    каждую следующую часть part_N, как только split её дописал (появилась метка _SUCCESS),
+    через один и тот же DBExtractor — пул соединений остаётся «тёплым» между частями.
+    Части загружаются строго по порядку, начиная со следующей за последней загруженной по журналу.
+
+    SIGTERM и SIGINT не прерывают загрузку: текущая часть догружается, после чего режим завершается
+    (повторный сигнал прерывает сразу — незафиксированные этапы части загрузятся при следующем запуске).
+
+    Счётчики (загружено частей и строк, пропускная способность, задержка от готовности части до конца
+    её загрузки, число готовых, но ещё не загруженных частей) выводятся после каждой части,
+    пишутся в status_file и в словарь counters (он попадает в сводку отчёта о запуске).
+
+    Параметры:
+    -- poll_interval: как часто (в секундах) проверять папку, если новых частей нет;
+    -- status_file: JSON-файл, который перезаписывается счётчиками после каждой части и проверки;
+    -- counters: словарь, в который складываются счётчики;
+    -- остальные — как у cmd_load.
+    """
+    counters = counters if counters is not None else {}
+    counters.update({
+        'parts_loaded': 0, 'rows_loaded': 0, 'load_seconds': 0.0, 'rows_per_s': None,
+        'last_part': None, 'last_lag_s': None, 'max_lag_s': None, 'pending_parts': 0,
+    })
+    stop = threading.Event()
+
+    def request_stop(signum, frame) -> None:
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print(f"🛑  Получен сигнал {signal.Signals(signum).name}: завершаем после текущей части.")
+
+    def pending_parts(next_part: int) -> list:
+        """
+        Номера готовых (с меткой _SUCCESS) частей подряд начиная с next_part — не больше количества частей
+        из манифеста, как в list_part_numbers (остатки прошлого разбиения не загружаются).
+        """
+        limit = read_split_manifest(parts_files_folder)['parts']
+        ready = []
+        while ((limit is None or next_part <= limit)
+               and os.path.exists(os.path.join(parts_files_folder, f"part_{next_part}", PART_COMPLETE_MARKER))):
+            ready.append(next_part)
+            next_part += 1
+        return ready
+
+    def write_status() -> None:
+        if status_file is None:
+            return
+        folder = os.path.dirname(status_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{status_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**counters, 'updated_at': datetime.now().isoformat(timespec='seconds')}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, status_file)
+
+    previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        next_part = (last_loaded_part(extractor) or 0) + 1
+        print(f"👀  Ожидаем части в '{parts_files_folder}', начиная с part_{next_part} "
+              f"(проверка каждые {poll_interval:g} с, остановка — SIGTERM или Ctrl+C).\n")
+
+        while not stop.is_set():
+            ready = pending_parts(next_part)
+            counters['pending_parts'] = len(ready)
+            if not ready:
+                write_status()
+                stop.wait(poll_interval)
+                continue
+
+            part_num = ready[0]
+            part_folder = os.path.join(parts_files_folder, f"part_{part_num}")
+            ready_at = os.path.getmtime(os.path.join(part_folder, PART_COMPLETE_MARKER))
+            part_format = data_format or detect_format(
+                part_folder, f"clients_{part_num}", read_split_manifest(parts_files_folder)['format']
+            )
+            started = time.perf_counter()
+
+            print(f"▶️  Загружаем part_{part_num} …")
+            part = prepare_part(part_num, parts_files_folder, part_format, chunksize, extractor.timer)
+            load_part(part, extractor, method, chunksize, atomic, retries, copy_workers)
 
-    extractor.execute_sql_script("database/scripts/DML comands/insert_to_mart.sql")
-    print(f"✅  Успешная загрузка clients, loans, payments из part_{part_num} -> staging.payments -> core.payments -> mart.data_mart.\n")
+            seconds = time.perf_counter() - started
+            rows = sum(len(df) for frames in part['frames'].values() for df in frames)
+            lag = time.time() - ready_at
+            counters['parts_loaded'] += 1
+            counters['rows_loaded'] += rows
+            counters['load_seconds'] = round(counters['load_seconds'] + seconds, 3)
+            if counters['load_seconds'] > 0:
+                counters['rows_per_s'] = round(counters['rows_loaded'] / counters['load_seconds'], 1)
+            counters['last_part'] = part_num
+            counters['last_lag_s'] = round(lag, 3)
+            counters['max_lag_s'] = round(max(lag, counters['max_lag_s'] or 0.0), 3)
+            counters['pending_parts'] = len(ready) - 1
+            write_status()
+
+            print(f"📡  part_{part_num}: {rows:,} строк за {seconds:.2f} с ({rows / seconds if seconds > 0 else 0:,.0f} строк/с), "
+                  f"задержка от готовности {lag:.2f} с, в очереди {counters['pending_parts']}.\n")
+            next_part = part_num + 1
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+
+    print(f"✅  Режим watch завершён: загружено частей {counters['parts_loaded']}, строк {counters['rows_loaded']:,}, "
+          f"средняя скорость {counters['rows_per_s'] or 0:,.0f} строк/с, максимальная задержка {counters['max_lag_s'] or 0:.2f} с.\n")
+
+
+def print_run_report(summary: dict, report_path: str, top: int = 8) -> None:
+    """Выводит самые долгие этапы запуска (по сумме времени) и путь к JSONL-отчёту."""
+    stages = [(name, total) for name, total in summary['stages'].items() if name != summary['command']]
+    if stages:
+        print(f"⏱️  Этапы {summary['command']} (всего {summary['seconds']:.2f} с, пиковый RSS {summary['peak_rss_mb']:.0f} МБ):")
+        for name, total in stages[:top]:
+            speed = f", {total['rows'] / total['seconds']:,.0f} строк/с" if total['rows'] and total['seconds'] else ""
+            print(f"    {name}: {total['seconds']:.2f} с × {total['count']}{speed}")
+    print(f"📝  Отчёт о запуске: {report_path}")
+    if summary.get('profile'):
+        print(f"📝  Профиль: {summary['profile']['profile']}")
 
 
 def main():
@@ -163,7 +886,8 @@ def main():
     DB_USER = os.getenv("DB_USER")
     DB_PASS = os.getenv("DB_PASS")
     DB_HOST = os.getenv("DB_HOST")
-    DB_PORT = int(os.getenv("DB_PORT"))
+    # порт по умолчанию — стандартный порт PostgreSQL: без .env должны работать хотя бы --help, generate и split
+    DB_PORT = int(os.getenv("DB_PORT") or 5432)
 
     # Папки с данными
     RAW_DIR = os.getenv("RAW_DIR")
@@ -177,26 +901,97 @@ def main():
     )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    # --- Общие параметры всех подкоманд: отчёт о запуске и профилирование ---
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument(
+        "--report",
+        help="Куда записать JSONL-отчёт с замерами этапов (по умолчанию REPORT_DIR/<команда>_<время>.jsonl, REPORT_DIR=reports)"
+    )
+    common_parser.add_argument(
+        "--profile", choices=PROFILERS, default=None,
+        help="Выполнить команду под cProfile или tracemalloc и сохранить профиль рядом с отчётом"
+    )
+
     # --- Подкоманда generate ---
-    gen_parser = subparsers.add_parser("generate", help="Сгенерировать новые «сырые» JSON-файлы")
+    gen_parser = subparsers.add_parser(
+        "generate", parents=[common_parser], help="Сгенерировать новые «сырые» файлы (JSON или Parquet)"
+    )
     gen_parser.add_argument(
         "--num-clients", type=int, default=20,
         help="Сколько клиентов генерировать (по умолчанию 20)"
     )
+    gen_parser.add_argument(
+        "--engine", choices=GENERATION_ENGINES, default="python",
+        help="Движок генерации: python (построчный) или numpy (векторизованный), по умолчанию python"
+    )
+    gen_parser.add_argument(
+        "--stream", action="store_true",
+        help="Потоковая генерация блоками с записью на диск (для объёмов больше оперативной памяти)"
+    )
+    gen_parser.add_argument(
+        "--chunk-size", type=int, default=50_000,
+        help="Сколько клиентов в одном блоке потоковой генерации (по умолчанию 50000)"
+    )
+    gen_parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Сколько процессов генерируют блоки клиентов параллельно (только --engine numpy, включает --stream)"
+    )
+    gen_parser.add_argument(
+        "--format", choices=DATA_FORMATS, default="json",
+        help="Формат «сырых» файлов: json или parquet (колоночный, с явными типами), по умолчанию json"
+    )
+    gen_parser.add_argument(
+        "--seed", type=int, default=None,
+        help="Зерно генерации: включает генерацию блоками (как --stream), результат зависит только "
+             "от seed и --chunk-size (одинаков при любом --workers) и берётся из кэша фикстур, если уже генерировался"
+    )
+    gen_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Не брать данные из кэша фикстур и не сохранять их туда"
+    )
 
     # --- Подкоманда split ---
-    split_parser = subparsers.add_parser("split", help="Разбить существующие JSON на кумулятивные части")
+    split_parser = subparsers.add_parser("split", parents=[common_parser], help="Разбить существующие «сырые» файлы на части")
     split_parser.add_argument(
         "--parts", type=int, default=5,
         help="На сколько частей разбивать (по умолчанию 5)"
     )
+    split_parser.add_argument(
+        "--mode", choices=SPLIT_MODES, default="cumulative",
+        help="cumulative — каждая часть содержит все предыдущие; delta — только новые строки (по умолчанию cumulative)"
+    )
+    split_parser.add_argument(
+        "--format", choices=DATA_FORMATS, default="json",
+        help="Формат файлов частей: json или parquet (по умолчанию json)"
+    )
+    split_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Не брать части из кэша фикстур и не сохранять их туда"
+    )
 
     # --- Подкоманда shema ---
-    subparsers.add_parser("shema", help="Создать схемы и таблицы в БД (once)")
+    shema_parser = subparsers.add_parser("shema", parents=[common_parser], help="Создать схемы и таблицы в БД (once)")
+    shema_parser.add_argument(
+        "--partitioned", action="store_true",
+        help="Секционировать core.payments и mart.data_mart по месяцу payment_date"
+    )
+
+    # --- Подкоманда check ---
+    subparsers.add_parser(
+        "check", parents=[common_parser], help="Сверить сводку просрочек с полным пересчётом по витрине"
+    )
+
+    # --- Подкоманда explain ---
+    explain_parser = subparsers.add_parser(
+        "explain", parents=[common_parser], help="Выполнить отчётные запросы под EXPLAIN (ANALYZE, BUFFERS) и сравнить планы"
+    )
+    explain_parser.add_argument("--output", help="Сохранить планы в JSON-файл (например, explain_before.json)")
+    explain_parser.add_argument("--compare", help="Сравнить с планами, сохранёнными ранее через --output")
 
     # --- Подкоманда load ---
     load_parser = subparsers.add_parser(
         "load",
+        parents=[common_parser],
         help="Инкрементально загрузить одну часть в staging и core"
     )
     group = load_parser.add_mutually_exclusive_group(required=True)
@@ -208,41 +1003,129 @@ def main():
         "--all", action="store_true",
         help="Загрузить все доступные части последовательно"
     )
+    group.add_argument(
+        "--watch", action="store_true",
+        help="Следить за SPLIT_DIR и загружать новые части по мере появления (до SIGTERM или Ctrl+C)"
+    )
+    load_parser.add_argument(
+        "--method", choices=LOAD_METHODS, default="copy",
+        help="Способ заливки во временные таблицы: copy (COPY FROM STDIN) или multi (to_sql), по умолчанию copy"
+    )
+    load_parser.add_argument(
+        "--chunk-size", type=int, default=100_000,
+        help="Сколько строк читать из файла и отправлять в БД одной порцией (по умолчанию 100000)"
+    )
+    load_parser.add_argument(
+        "--format", choices=DATA_FORMATS, default=None,
+        help="Формат файлов частей: json или parquet (по умолчанию — из manifest.json, записанного split)"
+    )
+    load_parser.add_argument(
+        "--prefetch", type=int, default=1,
+        help="Для --all: сколько следующих частей читать заранее, пока текущая загружается (0 — без конвейера, по умолчанию 1)"
+    )
+    load_parser.add_argument(
+        "--atomic", action="store_true",
+        help="Загружать каждую часть одним соединением и одной транзакцией (этапы — под SAVEPOINT)"
+    )
+    load_parser.add_argument(
+        "--retries", type=int, default=2,
+        help="Для --atomic: сколько раз повторять упавший этап, не откатывая предыдущие (по умолчанию 2)"
+    )
+    load_parser.add_argument(
+        "--copy-workers", type=int, default=1,
+        help="Сколько соединений параллельно заливают платежи через COPY (шарды по client_id, по умолчанию 1)"
+    )
+    load_parser.add_argument(
+        "--rebuild-indexes", action="store_true",
+        help="Удалить вторичные индексы на время загрузки и построить их заново после неё (для больших загрузок)"
+    )
+    load_parser.add_argument(
+        "--poll-interval", type=float, default=2.0,
+        help="Для --watch: как часто проверять SPLIT_DIR на новые части, в секундах (по умолчанию 2)"
+    )
+    load_parser.add_argument(
+        "--status-file",
+        help="Для --watch: JSON-файл со счётчиками (частей и строк загружено, строк/с, задержка, очередь)"
+    )
 
     args = parser.parse_args()
+    if args.command == "load" and args.watch and args.rebuild_indexes:
+        parser.error("--rebuild-indexes нельзя использовать с --watch: индексы были бы удалены на всё время работы")
 
-    if args.command == "generate":
-        cmd_generate(args, RAW_DIR, START_LOAN_DATE)
+    # Замеры этапов запуска: JSONL-отчёт пишется всегда, в том числе при ошибке
+    timer = StageTimer(args.command)
+    report_path = args.report or os.path.join(
+        os.getenv("REPORT_DIR", "reports"), f"{args.command}_{timer.started_at:%Y%m%d_%H%M%S}.jsonl"
+    )
+    profile_info = {}
+    watch_counters = {}
+    try:
+        with profiled(args.profile, os.path.splitext(report_path)[0]) as info, timer.stage(args.command):
+            profile_info = info
 
-    elif args.command == "split":
-        cmd_split(args, RAW_DIR, SPLIT_DIR)
+            if args.command in ("shema", "check", "explain", "load"):
+                from database.db_extractor import DBExtractor
 
-    elif args.command == "shema":
-        extractor = DBExtractor(
-            dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-        )
-        cmd_shema(extractor)
+            if args.command == "generate":
+                cmd_generate(args, RAW_DIR, START_LOAN_DATE, timer)
 
-    elif args.command == "load":
-        extractor = DBExtractor(
-            dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-        )
+            elif args.command == "split":
+                cmd_split(args, RAW_DIR, SPLIT_DIR, timer)
 
-        if args.all:
-            # Загружаем все папки part_1, part_2, … последовательно
-            subdirs = sorted([d for d in os.listdir(SPLIT_DIR)], key=lambda x: int(x.split("_")[1]))
+            elif args.command == "shema":
+                extractor = DBExtractor(
+                    dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT, timer=timer
+                )
+                cmd_shema(extractor, args.partitioned)
 
-            for d in subdirs:
-                part_num = int(d.split("_")[1])
-                print(f"▶️  Загружаем {d} …")
-                cmd_load(part_num, SPLIT_DIR, extractor)
-        else:
-            # Загрузка конкретной части
-            cmd_load(args.part, SPLIT_DIR, extractor)
+            elif args.command == "check":
+                extractor = DBExtractor(
+                    dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT, timer=timer
+                )
+                cmd_check(extractor)
 
-    else:
-        parser.print_help()
-        sys.exit(1)
+            elif args.command == "explain":
+                extractor = DBExtractor(
+                    dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT, timer=timer
+                )
+                cmd_explain(extractor, args.output, args.compare)
+
+            elif args.command == "load":
+                extractor = DBExtractor(
+                    dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT, timer=timer
+                )
+                if args.method == "copy" and args.copy_workers > 1 and args.copy_workers + 1 > extractor.pool_capacity:
+                    print(f"❌  ОШИБКА: --copy-workers {args.copy_workers} требует {args.copy_workers + 1} соединений, "
+                          f"а пул выдаёт не больше {extractor.pool_capacity}. "
+                          f"Уменьшите --copy-workers или увеличьте DB_POOL_SIZE / DB_MAX_OVERFLOW.")
+                    sys.exit(1)
+
+                with indexes_dropped(extractor, args.rebuild_indexes):
+                    if args.watch:
+                        # Долгоживущий режим: загружаем новые части по мере появления через один пул соединений
+                        cmd_load_watch(SPLIT_DIR, extractor, args.method, args.chunk_size, args.format, args.atomic,
+                                       args.retries, args.copy_workers, args.poll_interval, args.status_file,
+                                       watch_counters)
+                    elif args.all:
+                        # Загружаем все папки part_1, part_2, … по порядку, следующую часть готовим заранее
+                        cmd_load_all(SPLIT_DIR, extractor, args.method, args.chunk_size, args.format, args.prefetch,
+                                     args.atomic, args.retries, args.copy_workers)
+                    else:
+                        # Загрузка конкретной части
+                        cmd_load(args.part, SPLIT_DIR, extractor, args.method, args.chunk_size, args.format,
+                                 args.atomic, args.retries, args.copy_workers)
+
+            else:
+                parser.print_help()
+                sys.exit(1)
+    finally:
+        extra = {}
+        if profile_info:
+            extra['profile'] = profile_info
+        if watch_counters:
+            extra['watch'] = watch_counters
+        summary = timer.write_report(report_path, extra)
+        print_run_report(summary, report_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Тесты импортируют модули проекта так же, как main.py: от корня репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def db_extractor():
+    """
+    DBExtractor для тестов с PostgreSQL по параметрам из .env (DB_NAME, DB_USER, DB_PASS, DB_HOST, DB_PORT).
+    Если БД не настроена или недоступна, такие тесты пропускаются.
+    """
+    from dotenv import load_dotenv
+    from sqlalchemy.exc import SQLAlchemyError
+    from database.db_extractor import DBExtractor
+
+    load_dotenv()
+    if not os.getenv("DB_NAME"):
+        pytest.skip("БД не настроена (DB_NAME в .env)")
+    try:
+        return DBExtractor(dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+                           host=os.getenv("DB_HOST"), port=int(os.getenv("DB_PORT") or 5432), verbose=False)
+    except SQLAlchemyError as e:
+        pytest.skip(f"БД недоступна: {e}")
@@ -0,0 +1,138 @@
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from database.db_extractor import DBExtractor
+
+
+class FakeCursor:
+    def execute(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Соединение, на котором DDL шардов и их удаление «выполняются» без БД."""
+
+    def __init__(self):
+        self.connection = self
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class ExhaustedPoolEngine:
+    """Движок, у которого отдельные соединения потоков COPY не выдаются (пул исчерпан)."""
+
+    @contextmanager
+    def begin(self):
+        yield FakeConnection()
+
+    def connect(self):
+        raise ConnectionError("пул соединений исчерпан")
+
+
+def make_extractor(engine=None, pool_capacity: int = 15) -> DBExtractor:
+    extractor = DBExtractor.__new__(DBExtractor)
+    extractor.engine = engine
+    extractor.pool_capacity = pool_capacity
+    extractor.last_load_stats = []
+    extractor.pending_shards = []
+    extractor.last_insert_stats = {}
+    return extractor
+
+
+def test_copy_sharded_reports_worker_connect_failure():
+    extractor = make_extractor(ExhaustedPoolEngine())
+    # порций больше, чем вмещают очереди шардов: без вычитывания очередей производитель повис бы на put
+    frames = [pd.DataFrame({'client_id': range(i * 10, i * 10 + 10), 'amount': 1}) for i in range(20)]
+    outcome = {}
+
+    def run():
+        try:
+            extractor._copy_sharded(FakeConnection(), frames, "temp_payments", "staging.payments",
+                                    "client_id", workers=2)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive(), "заливка зависла после ошибки подключения потока"
+    assert isinstance(outcome.get('error'), ConnectionError)
+
+
+def test_incremental_load_rejects_workers_above_pool_capacity():
+    extractor = make_extractor(pool_capacity=4)
+
+    with pytest.raises(ValueError, match="DB_POOL_SIZE"):
+        extractor.incremental_load(pd.DataFrame({'client_id': [1]}), "create.sql", "insert.sql", "temp_payments",
+                                   workers=4, shard_like_table="staging.payments")
+
+
+@pytest.fixture
+def shard_schema(db_extractor, tmp_path):
+    """Схема test_shards с постоянной таблицей items и SQL-скриптами временной таблицы и переноса."""
+    with db_extractor.engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS test_shards CASCADE"))
+        conn.execute(text("CREATE SCHEMA test_shards"))
+        conn.execute(text("CREATE TABLE test_shards.items (client_id INTEGER NOT NULL, amount INTEGER NOT NULL)"))
+    create_temp = tmp_path / "create_temp_items.sql"
+    create_temp.write_text("DROP TABLE IF EXISTS temp_items;\n"
+                           "CREATE TEMPORARY TABLE temp_items (client_id INTEGER NOT NULL, amount INTEGER NOT NULL);")
+    insert = tmp_path / "insert_items.sql"
+    insert.write_text("INSERT INTO test_shards.items SELECT client_id, amount FROM temp_items;")
+    yield str(create_temp), str(insert)
+    with db_extractor.engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS test_shards CASCADE"))
+
+
+def shard_tables(extractor) -> list:
+    with extractor.engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = 'test_shards' AND tablename LIKE 'temp_items_shard_%'"
+        )).scalars().all()
+
+
+def items_frames() -> list:
+    return [pd.DataFrame({'client_id': range(i * 100, i * 100 + 100), 'amount': i}) for i in range(5)]
+
+
+def test_sharded_load_drops_shards_after_rollback(db_extractor, shard_schema):
+    create_temp, insert = shard_schema
+
+    def finalize(conn, rows):
+        raise RuntimeError("сбой после переноса шардов")
+
+    with pytest.raises(RuntimeError):
+        db_extractor.incremental_load(items_frames(), create_temp, insert, "temp_items", workers=3,
+                                      finalize=finalize, shard_like_table="test_shards.items")
+
+    assert shard_tables(db_extractor) == []
+    assert db_extractor.pending_shards == []
+
+
+def test_sharded_load_in_caller_transaction_keeps_shards_until_it_ends(db_extractor, shard_schema):
+    create_temp, insert = shard_schema
+
+    with pytest.raises(RuntimeError):
+        with db_extractor.engine.connect() as conn:
+            with conn.begin():
+                rows = db_extractor.incremental_load(items_frames(), create_temp, insert, "temp_items", conn=conn,
+                                                     workers=3, shard_like_table="test_shards.items")
+                assert rows == 500
+                # транзакция загрузки откатывается уже после переноса шардов
+                raise RuntimeError("сбой следующего этапа")
+    assert len(shard_tables(db_extractor)) == 3
+
+    db_extractor.drop_pending_shards()
+
+    assert shard_tables(db_extractor) == []
+    with db_extractor.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM test_shards.items")).scalar() == 0
@@ -0,0 +1,191 @@
+import os
+import shutil
+
+import pytest
+
+from data_generation import fixture_cache
+from data_generation.fixture_cache import FixtureCache
+
+
+def write_files(folder, files: dict) -> list:
+    """Создаёт в папке folder файлы {относительный путь: содержимое} и возвращает их пути."""
+    for name, content in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return list(files)
+
+
+def split_files(version: str) -> dict:
+    return {
+        "manifest.json": '{"mode": "cumulative", "parts": 2, "format": "json"}',
+        "part_1/clients_1.json": f"[{version}]",
+        "part_1/_SUCCESS": "",
+        "part_2/clients_2.json": f"[{version}, {version}]",
+        "part_2/_SUCCESS": "",
+    }
+
+
+def completion_files(folder) -> list:
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, names in os.walk(folder)
+                  for name in names if name in ("_SUCCESS", "manifest.json"))
+
+
+def test_restore_removes_markers_before_data_and_writes_them_last(tmp_path, monkeypatch):
+    cache = FixtureCache(str(tmp_path / "cache"))
+    source, target = tmp_path / "source", tmp_path / "target"
+    cache.store("split_new", str(source), write_files(source, split_files("2")))
+    # в папке частей — прошлое разбиение: старые данные, метки и лишняя часть
+    write_files(target, {**split_files("1"), "part_3/clients_3.json": "[1]", "part_3/_SUCCESS": ""})
+
+    copied = []
+    copy2 = shutil.copy2
+
+    def recording_copy(src, dst):
+        name = os.path.relpath(dst, target)
+        if os.path.basename(name) not in ("_SUCCESS", "manifest.json"):
+            # пока копируются данные, ни одна часть не должна выглядеть готовой
+            assert completion_files(target) == []
+        copied.append(name)
+        return copy2(src, dst)
+
+    monkeypatch.setattr(fixture_cache.shutil, "copy2", recording_copy)
+    files = cache.restore("split_new", str(target))
+
+    assert sorted(files) == sorted(split_files("2"))
+    assert copied[-3:] == ["manifest.json", "part_1/_SUCCESS", "part_2/_SUCCESS"]
+    assert completion_files(target) == ["manifest.json", "part_1/_SUCCESS", "part_2/_SUCCESS"]
+    assert (target / "part_2" / "clients_2.json").read_text() == "[2, 2]"
+
+
+class FakeClock:
+    """Часы для fixture_cache.time: каждое обращение на секунду позже предыдущего."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+def generation_key(cache: FixtureCache) -> str:
+    key, _ = cache.generation_key(1000, 42, "2020-01-01", {'gender': {'role': ['М', 'Ж']}}, "numpy", "json", 100)
+    return key
+
+
+def test_generation_key_changes_with_date_and_code(tmp_path, monkeypatch):
+    cache = FixtureCache(str(tmp_path / "cache"))
+    key = generation_key(cache)
+    assert generation_key(cache) == key
+
+    monkeypatch.setattr(fixture_cache, "code_hash", lambda: "changed-code")
+    code_key = generation_key(cache)
+    assert code_key != key
+
+    class Tomorrow(fixture_cache.date):
+        @classmethod
+        def today(cls):
+            return cls(2099, 1, 1)
+
+    monkeypatch.setattr(fixture_cache, "date", Tomorrow)
+    assert generation_key(cache) not in (key, code_key)
+
+
+def test_generation_and_split_keys_depend_on_parameters(tmp_path):
+    cache = FixtureCache(str(tmp_path / "cache"))
+    key, params = cache.generation_key(1000, 42, "2020-01-01", {}, "numpy", "json")
+    other_seed, _ = cache.generation_key(1000, 43, "2020-01-01", {}, "numpy", "json")
+    other_config, _ = cache.generation_key(1000, 42, "2020-01-01", {'x': 1}, "numpy", "json")
+
+    assert len({key, other_seed, other_config}) == 3
+    assert params['seed'] == 42 and params['feature_config'] == fixture_cache.config_hash({})
+    assert cache.split_key(key, 5, "delta", "json")[0] != cache.split_key(key, 5, "cumulative", "json")[0]
+    assert cache.split_key(key, 5, "delta", "json")[0] != cache.split_key(other_seed, 5, "delta", "json")[0]
+
+
+def test_read_marker_detects_changed_and_deleted_files(tmp_path):
+    folder = tmp_path / "raw"
+    files = write_files(folder, {"clients.json": "[1]", "loans.json": "[2]"})
+    fixture_cache.write_marker(str(folder), "raw_key", files)
+    assert fixture_cache.read_marker(str(folder)) == "raw_key"
+
+    (folder / "clients.json").write_text("[1, 3]")
+    assert fixture_cache.read_marker(str(folder)) is None
+
+    fixture_cache.write_marker(str(folder), "raw_key", files)
+    (folder / "loans.json").unlink()
+    assert fixture_cache.read_marker(str(folder)) is None
+
+    fixture_cache.clear_marker(str(folder))
+    assert fixture_cache.read_marker(str(folder)) is None
+
+
+def test_store_and_restore_round_trip(tmp_path):
+    cache = FixtureCache(str(tmp_path / "cache"))
+    source, target = tmp_path / "source", tmp_path / "target"
+    files = write_files(source, {"clients.json": "[1]", "loans.json": "[2]"})
+
+    assert cache.restore("raw_a", str(target)) is None
+    assert cache.store("raw_a", str(source), files, {'seed': 1})
+    assert cache.restore("raw_a", str(target)) == files
+    assert (target / "loans.json").read_text() == "[2]"
+
+    [meta] = cache.entries()
+    assert meta['hits'] == 1 and meta['params'] == {'seed': 1} and meta['size_bytes'] == 6
+
+
+def test_interrupted_store_keeps_previous_entry(tmp_path, monkeypatch):
+    cache = FixtureCache(str(tmp_path / "cache"))
+    source = tmp_path / "source"
+    files = write_files(source, {"clients.json": "[1]", "loans.json": "[2]"})
+    cache.store("raw_a", str(source), files)
+
+    (source / "loans.json").write_text("[3]")
+    copy2 = shutil.copy2
+
+    def failing_copy(src, dst):
+        if src.endswith("loans.json"):
+            raise OSError("диск заполнен")
+        return copy2(src, dst)
+
+    monkeypatch.setattr(fixture_cache.shutil, "copy2", failing_copy)
+    with pytest.raises(OSError):
+        cache.store("raw_a", str(source), files)
+    monkeypatch.setattr(fixture_cache.shutil, "copy2", copy2)
+
+    # прерванное сохранение не оставляет ни временной папки, ни испорченной записи
+    assert os.listdir(cache.cache_dir) == ["raw_a"]
+    target = tmp_path / "target"
+    cache.restore("raw_a", str(target))
+    assert (target / "loans.json").read_text() == "[2]"
+
+
+def test_store_rejects_entry_larger_than_cache(tmp_path):
+    cache = FixtureCache(str(tmp_path / "cache"), max_mb=10 / 1024 / 1024)
+    source = tmp_path / "source"
+    files = write_files(source, {"clients.json": "x" * 20})
+
+    assert not cache.store("raw_big", str(source), files)
+    assert cache.entries() == []
+
+
+def test_evict_removes_least_recently_used_but_keeps_new_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(fixture_cache, "time", FakeClock())
+    cache = FixtureCache(str(tmp_path / "cache"), max_mb=250 / 1024 / 1024)
+    for key in ("raw_a", "raw_b"):
+        source = tmp_path / key
+        cache.store(key, str(source), write_files(source, {"data.json": "x" * 100}))
+
+    # raw_a использована позже raw_b, поэтому при переполнении вытесняется raw_b
+    cache.restore("raw_a", str(tmp_path / "target"))
+    source = tmp_path / "raw_c"
+    cache.store("raw_c", str(source), write_files(source, {"data.json": "x" * 100}))
+    assert sorted(meta['key'] for meta in cache.entries()) == ["raw_a", "raw_c"]
+
+    # keep не вытесняется, даже если она дольше всех не использовалась
+    cache.restore("raw_a", str(tmp_path / "target"))
+    cache.max_bytes = 100
+    assert cache.evict(keep="raw_c") == ["raw_a"]
+    assert [meta['key'] for meta in cache.entries()] == ["raw_c"]
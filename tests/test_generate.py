@@ -0,0 +1,33 @@
+import os
+import argparse
+
+from main import cmd_generate
+
+
+def generate_args(workers: int, **overrides) -> argparse.Namespace:
+    """Аргументы generate без потокового режима и без кэша фикстур."""
+    args = dict(num_clients=300, engine="numpy", workers=workers, stream=False, seed=7,
+                chunk_size=100, format="json", no_cache=True)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def read_files(folder: str) -> dict:
+    return {name: open(os.path.join(folder, name), 'rb').read()
+            for name in ("clients.json", "loans.json", "payments.json")}
+
+
+def test_seeded_generate_does_not_depend_on_workers(tmp_path):
+    single, parallel = tmp_path / "workers_1", tmp_path / "workers_2"
+    cmd_generate(generate_args(workers=1), str(single), "2020-01-01")
+    cmd_generate(generate_args(workers=2), str(parallel), "2020-01-01")
+
+    assert read_files(single) == read_files(parallel)
+
+
+def test_seeded_generate_does_not_depend_on_stream(tmp_path):
+    plain, stream = tmp_path / "plain", tmp_path / "stream"
+    cmd_generate(generate_args(workers=1), str(plain), "2020-01-01")
+    cmd_generate(generate_args(workers=1, stream=True), str(stream), "2020-01-01")
+
+    assert read_files(plain) == read_files(stream)
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+
+import pytest
+
+from main import plan_part, plan_stage, run_stage
+
+
+@pytest.mark.parametrize("part_num, last_part, action", [
+    (1, None, 'load'),
+    (2, None, 'out_of_order'),
+    (3, 2, 'load'),
+    (2, 2, 'skip'),
+    (1, 2, 'skip'),
+    (4, 2, 'out_of_order'),
+])
+def test_plan_part(part_num, last_part, action):
+    assert plan_part(part_num, last_part) == action
+
+
+@pytest.mark.parametrize("entry, action", [
+    (None, 'load'),
+    ({'status': 'failed', 'checksum': 'abc', 'row_count': None}, 'load'),
+    ({'status': 'loaded', 'checksum': 'abc', 'row_count': 10}, 'skip'),
+    ({'status': 'loaded', 'checksum': 'old', 'row_count': 10}, 'changed'),
+])
+def test_plan_stage(entry, action):
+    assert plan_stage(entry, 'abc') == action
+
+
+class FakeConnection:
+    """Соединение, которое записывает точки сохранения и их откаты."""
+
+    def __init__(self, events: list):
+        self.events = events
+
+    @contextmanager
+    def begin_nested(self):
+        self.events.append('savepoint')
+        try:
+            yield
+        except Exception:
+            self.events.append('rollback to savepoint')
+            raise
+
+
+class FakeExtractor:
+    """DBExtractor без БД: SQL-скрипты (строки журнала) только записываются."""
+
+    def __init__(self):
+        self.events = []
+        self.ledger = []
+        self.engine = self
+
+    @contextmanager
+    def begin(self):
+        self.events.append('transaction')
+        yield FakeConnection(self.events)
+
+    def execute_sql_script(self, path, params=None, conn=None):
+        self.ledger.append((params['table_name'], params['status'], conn is not None))
+
+
+def flaky_stage(failures: int):
+    """Этап, который падает failures раз, а потом возвращает номер попытки."""
+    attempts = []
+
+    def stage(conn, started_at):
+        attempts.append(started_at)
+        if len(attempts) <= failures:
+            raise RuntimeError(f"сбой попытки {len(attempts)}")
+        return len(attempts)
+
+    return stage
+
+
+def test_atomic_stage_is_retried_under_savepoint():
+    extractor = FakeExtractor()
+    conn = FakeConnection(extractor.events)
+
+    assert run_stage(extractor, flaky_stage(failures=2), 1, 'payments', conn=conn, retries=2) == 3
+    assert extractor.events == ['savepoint', 'rollback to savepoint'] * 2 + ['savepoint']
+    assert extractor.ledger == []
+
+
+def test_atomic_stage_records_failure_after_retries():
+    extractor = FakeExtractor()
+    conn = FakeConnection(extractor.events)
+
+    with pytest.raises(RuntimeError, match="попытки 3"):
+        run_stage(extractor, flaky_stage(failures=5), 1, 'payments', {'file_name': 'payments_1.json'},
+                  conn=conn, retries=2)
+    # строка 'failed' пишется отдельной транзакцией, а не в откатываемой транзакции части
+    assert extractor.ledger == [('payments', 'failed', False)]
+
+
+def test_stage_without_atomic_is_not_retried():
+    extractor = FakeExtractor()
+
+    with pytest.raises(RuntimeError, match="попытки 1"):
+        run_stage(extractor, flaky_stage(failures=1), 1, 'clients', retries=2)
+    assert extractor.events == ['transaction']
+    assert extractor.ledger == [('clients', 'failed', False)]
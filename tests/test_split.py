@@ -0,0 +1,126 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from data_generation import generator as generator_module
+from data_generation.config import FEATURE_CONFIG, PART_COMPLETE_MARKER, SPLIT_MANIFEST
+from data_generation.generator import DataGenerator
+from data_generation.storage import read_table, table_path
+
+PARTS = 4
+
+
+@pytest.fixture(scope="module")
+def raw_folder(tmp_path_factory) -> str:
+    """Небольшой детерминированный набор «сырых» JSON-файлов."""
+    folder = tmp_path_factory.mktemp("raw")
+    DataGenerator(FEATURE_CONFIG, str(folder), engine="numpy", seed=11).generate_data_stream(300, "2020-01-01", 100)
+    return str(folder)
+
+
+def read_part(folder, i: int, table: str) -> pd.DataFrame:
+    return read_table(table_path(Path(folder) / f"part_{i}", f"{table}_{i}", "json"), "json")
+
+
+def reference_split(raw_folder: str, parts: int, mode: str) -> list:
+    """
+    Прежний (многопроходный) алгоритм разбиения в памяти: для каждой части — срез отсортированных
+    по дате старта кредитов, их платежи и клиенты (в delta — только ещё не встречавшиеся).
+    """
+    raw = {table: read_table(table_path(raw_folder, table, "json"), "json") for table in ("clients", "loans", "payments")}
+    loans_sorted = raw['loans'].sort_values('loan_start_date', kind='stable').reset_index(drop=True)
+    rows_per_part = len(loans_sorted) // parts + 1
+    seen_client_ids, result = set(), []
+    for i in range(1, parts + 1):
+        first_row = 0 if mode == "cumulative" else (i - 1) * rows_per_part
+        part_loans = loans_sorted.iloc[first_row: i * rows_per_part]
+        payments = raw['payments'].merge(part_loans[['client_id', 'loan_name']], on=['client_id', 'loan_name'])
+        client_ids = part_loans['client_id'].unique()
+        if mode == "delta":
+            client_ids = [client_id for client_id in client_ids if client_id not in seen_client_ids]
+            seen_client_ids.update(client_ids)
+        clients = raw['clients'][raw['clients']['client_id'].isin(client_ids)]
+        result.append({'loans': part_loans, 'payments': payments, 'clients': clients})
+    return result
+
+
+def assert_same_rows(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    assert len(actual) == len(expected)
+    if len(expected):
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False)
+
+
+@pytest.mark.parametrize("mode", ["cumulative", "delta"])
+def test_single_pass_split_matches_reference(raw_folder, tmp_path, mode):
+    DataGenerator.split_jsons_by_loan_start_date(raw_folder, str(tmp_path), parts=PARTS, mode=mode, batch_size=97)
+
+    for i, expected in enumerate(reference_split(raw_folder, PARTS, mode), start=1):
+        for table in ("clients", "loans", "payments"):
+            assert_same_rows(read_part(tmp_path, i, table), expected[table])
+
+
+def test_split_writes_manifest_and_markers_after_data(raw_folder, tmp_path, monkeypatch):
+    # остатки прошлого разбиения: метки готовности должны сняться до записи данных
+    for i in range(1, PARTS + 1):
+        (tmp_path / f"part_{i}").mkdir()
+        (tmp_path / f"part_{i}" / PART_COMPLETE_MARKER).touch()
+
+    def markers() -> list:
+        return sorted(str(path.relative_to(tmp_path)) for path in tmp_path.glob(f"part_*/{PART_COMPLETE_MARKER}"))
+
+    def data_files() -> list:
+        return [table_path(tmp_path / f"part_{i}", f"{table}_{i}", "json")
+                for i in range(1, PARTS + 1) for table in ("clients", "loans", "payments")]
+
+    write_table, open_table_writer = generator_module.write_table, generator_module.open_table_writer
+
+    def checked_write_table(df, path, *args):
+        assert not os.path.exists(Path(path).parent / PART_COMPLETE_MARKER), f"метка уже стоит при записи {path}"
+        return write_table(df, path, *args)
+
+    def checked_open_table_writer(path, *args):
+        assert markers() == [], f"метки уже стоят при записи {path}"
+        return open_table_writer(path, *args)
+
+    touch = Path.touch
+
+    def checked_touch(path, *args, **kwargs):
+        if path.name == PART_COMPLETE_MARKER:
+            # метка ставится последней: все файлы частей дописаны, манифест записан
+            assert (tmp_path / SPLIT_MANIFEST).exists()
+            assert all(os.path.getsize(data_file) > 0 for data_file in data_files())
+        return touch(path, *args, **kwargs)
+
+    monkeypatch.setattr(generator_module, "write_table", checked_write_table)
+    monkeypatch.setattr(generator_module, "open_table_writer", checked_open_table_writer)
+    monkeypatch.setattr(Path, "touch", checked_touch)
+
+    DataGenerator.split_jsons_by_loan_start_date(raw_folder, str(tmp_path), parts=PARTS)
+
+    assert markers() == [f"part_{i}/{PART_COMPLETE_MARKER}" for i in range(1, PARTS + 1)]
+
+
+def row_keys(df: pd.DataFrame, key: list) -> list:
+    return [tuple(row) for row in df[key].to_numpy()] if len(df) else []
+
+
+def test_delta_parts_are_disjoint_and_add_up_to_raw(raw_folder, tmp_path):
+    delta, cumulative = tmp_path / "delta", tmp_path / "cumulative"
+    DataGenerator.split_jsons_by_loan_start_date(raw_folder, str(delta), parts=PARTS, mode="delta")
+    DataGenerator.split_jsons_by_loan_start_date(raw_folder, str(cumulative), parts=PARTS, mode="cumulative")
+
+    raw = {table: read_table(table_path(raw_folder, table, "json"), "json") for table in ("loans", "payments")}
+    # в части попадают только клиенты, у которых есть кредиты
+    raw['clients'] = raw['loans'][['client_id']].drop_duplicates()
+    keys = {'clients': ['client_id'], 'loans': ['client_id', 'loan_name'],
+            'payments': ['client_id', 'loan_name', 'payment_number']}
+
+    for table, key in keys.items():
+        delta_keys = [row for i in range(1, PARTS + 1) for row in row_keys(read_part(delta, i, table), key)]
+        # каждая строка «сырого» файла попадает ровно в одну дельта-часть
+        assert sorted(delta_keys) == sorted(row_keys(raw[table], key))
+        # и последняя кумулятивная часть содержит то же самое
+        assert sorted(row_keys(read_part(cumulative, PARTS, table), key)) == sorted(delta_keys)
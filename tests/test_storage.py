@@ -0,0 +1,97 @@
+import json
+
+import pandas as pd
+import pytest
+
+from data_generation import storage
+from data_generation.config import FEATURE_CONFIG
+from data_generation.storage import apply_dtypes, iter_json_records
+
+
+def test_apply_dtypes_keeps_known_categories_and_missing_values():
+    education = FEATURE_CONFIG['education']['role']
+    df = pd.DataFrame({'client_id': [1, 2], 'education': [education[0], None]})
+
+    result = apply_dtypes(df, 'clients')
+
+    assert list(result['education'].cat.categories) == list(education)
+    assert result['education'].iloc[0] == education[0]
+    assert pd.isna(result['education'].iloc[1])
+
+
+def test_apply_dtypes_rejects_unknown_category():
+    education = FEATURE_CONFIG['education']['role']
+    df = pd.DataFrame({'client_id': [1, 2, 3], 'education': [education[0], 'Аспирантура', None]})
+
+    with pytest.raises(ValueError, match=r"clients\.education.*Аспирантура"):
+        apply_dtypes(df, 'clients')
+
+
+RECORDS = [{'client_id': i, 'fio': f"Клиент {i}", 'income': i * 1000, 'region': None} for i in range(1, 8)]
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    """Читать файл по 7 символов: записи гарантированно разрываются между порциями чтения."""
+    monkeypatch.setattr(storage, "JSON_READ_SIZE", 7)
+
+
+def read_records(path, batch_size: int = 3) -> list:
+    return [record for batch in iter_json_records(str(path), batch_size) for record in batch]
+
+
+def test_iter_json_records_reads_json_array_in_batches(tmp_path):
+    path = tmp_path / "clients.json"
+    path.write_text(json.dumps(RECORDS, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    batches = list(iter_json_records(str(path), batch_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [record for batch in batches for record in batch] == RECORDS
+
+
+def test_iter_json_records_reads_ndjson(tmp_path):
+    path = tmp_path / "clients.json"
+    path.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + "\n", encoding='utf-8')
+
+    assert read_records(path) == RECORDS
+
+
+@pytest.mark.parametrize("layout", ["array", "ndjson"])
+def test_iter_json_records_handles_records_split_across_reads(tmp_path, small_reads, layout):
+    path = tmp_path / "clients.json"
+    if layout == "array":
+        path.write_text(json.dumps(RECORDS, ensure_ascii=False), encoding='utf-8')
+    else:
+        path.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in RECORDS), encoding='utf-8')
+
+    assert read_records(path, batch_size=2) == RECORDS
+
+
+@pytest.mark.parametrize("content", ["", "  \n", "[]", "[\n]\n"])
+def test_iter_json_records_empty_file(tmp_path, content):
+    path = tmp_path / "clients.json"
+    path.write_text(content, encoding='utf-8')
+
+    assert list(iter_json_records(str(path))) == []
+
+
+@pytest.mark.parametrize("cut", [
+    lambda text: text[:-1],
+    lambda text: text[:len(text) // 2],
+], ids=["no_closing_bracket", "mid_record"])
+def test_iter_json_records_rejects_truncated_array(tmp_path, small_reads, cut):
+    path = tmp_path / "clients.json"
+    path.write_text(cut(json.dumps(RECORDS, ensure_ascii=False)), encoding='utf-8')
+
+    with pytest.raises(json.JSONDecodeError):
+        read_records(path)
+
+
+def test_iter_json_records_rejects_truncated_ndjson(tmp_path, small_reads):
+    path = tmp_path / "clients.json"
+    text = "\n".join(json.dumps(record, ensure_ascii=False) for record in RECORDS)
+    path.write_text(text[:-5], encoding='utf-8')
+
+    with pytest.raises(json.JSONDecodeError):
+        read_records(path)
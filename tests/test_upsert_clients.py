@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+CREATE_TEMP_SQL = "database/scripts/DDL comands/create_temp_table_clients.sql"
+UPSERT_SQL = "database/scripts/DML comands/upsert_clients.sql"
+
+# Изменение каждого из хешируемых полей (row_hash) клиента
+CHANGES = {
+    'client_id': lambda value: value + 1000,
+    'fio': lambda value: value + ' (изм.)',
+    'gender': lambda value: 'Женщина' if value == 'Мужчина' else 'Мужчина',
+    'birth_date': lambda value: value + timedelta(days=1),
+    'education': lambda value: 'Два высших',
+    'count_of_children': lambda value: None,
+    'job_type': lambda value: 'ИП',
+    'region': lambda value: None,
+    'family_status': lambda value: 'Не в браке',
+    'address': lambda value: value + ', кв. 2',
+    'phone': lambda value: '+7 900 000-00-00',
+    'income': lambda value: value + 1,
+}
+
+
+def clients_df() -> pd.DataFrame:
+    """Три тестовых клиента с паспортами и id, которых нет в сгенерированных данных."""
+    return pd.DataFrame([
+        {'client_id': 2_000_000_000 + i, 'passport': f"TEST {i:06d}", 'fio': f"Тестов Тест {i}",
+         'gender': 'Мужчина', 'birth_date': date(1990, 1, i), 'education': 'Высшее', 'count_of_children': i,
+         'job_type': 'Работает по найму', 'region': 'Москва', 'family_status': 'В браке',
+         'address': f"ул. Тестовая, д. {i}", 'phone': f"+7 999 000-00-0{i}", 'income': 100_000 * i}
+        for i in range(1, 4)
+    ])
+
+
+@pytest.fixture
+def load_clients(db_extractor):
+    """
+    Заливает клиентов через incremental_load + upsert_clients.sql в одной транзакции,
+    которая в конце откатывается. Возвращает функцию load(df) -> (inserted, updated, skipped).
+    """
+    with db_extractor.engine.connect() as conn:
+        trans = conn.begin()
+        if conn.execute(text("SELECT to_regclass('staging.clients')")).scalar() is None:
+            trans.rollback()
+            pytest.skip("в БД нет staging.clients (сначала выполните: python main.py shema)")
+
+        def load(df: pd.DataFrame, load_ts: datetime) -> tuple:
+            db_extractor.incremental_load(df, CREATE_TEMP_SQL, UPSERT_SQL, "temp_clients", conn=conn,
+                                          constants={'file_name': 'clients_test.json', 'load_ts': load_ts})
+            stats = db_extractor.last_insert_stats
+            return stats['inserted'], stats['updated'], stats['skipped']
+
+        load.conn = conn
+        try:
+            yield load
+        finally:
+            trans.rollback()
+
+
+def test_unchanged_clients_are_skipped(load_clients):
+    first_ts, second_ts = datetime(2030, 1, 1), datetime(2030, 1, 2)
+    assert load_clients(clients_df(), first_ts) == (3, 0, 0)
+    assert load_clients(clients_df(), second_ts) == (0, 0, 3)
+
+    # пропущенные строки не перезаписываются и сохраняют прежний load_ts
+    load_ts = load_clients.conn.execute(
+        text("SELECT DISTINCT load_ts FROM staging.clients WHERE passport LIKE 'TEST %'")
+    ).scalars().all()
+    assert load_ts == [first_ts]
+
+
+@pytest.mark.parametrize("column", sorted(CHANGES))
+def test_change_of_any_hashed_column_is_updated(load_clients, column):
+    assert load_clients(clients_df(), datetime(2030, 1, 1)) == (3, 0, 0)
+
+    changed = clients_df()
+    changed.loc[1, column] = CHANGES[column](changed.loc[1, column])
+    assert load_clients(changed, datetime(2030, 1, 2)) == (0, 1, 2)
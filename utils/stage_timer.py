@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+# Варианты --profile: профиль вызовов (cProfile) или распределений памяти (tracemalloc)
+PROFILERS = ("cprofile", "tracemalloc")
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в мегабайтах (ru_maxrss в Linux — в килобайтах, в macOS — в байтах)."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class StageTimer:
+    """
+    Замеры этапов конвейера: время (wall), строки на входе и выходе, строки/с,
+    затронутые SQL-скриптом строки и пиковый RSS процесса на конец этапа.
+
+    Этапы вкладываются друг в друга (stage внутри stage): у записи сохраняется путь родительских этапов.
+    Записи можно добавлять из нескольких потоков. Выключенный таймер (enabled=False) ничего не замеряет,
+    поэтому DataGenerator и DBExtractor вызывают его всегда, даже если отчёт не нужен.
+    """
+
+    def __init__(self, command: Optional[str] = None, enabled: bool = True):
+        """
+        Параметры:
+        -- command: имя подкоманды CLI (попадает в сводку отчёта);
+        -- enabled: False — таймер-заглушка без замеров.
+        """
+        self.command = command
+        self.enabled = enabled
+        self.records = []
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _path(self) -> list:
+        if not hasattr(self._local, 'path'):
+            self._local.path = []
+        return self._local.path
+
+    def record(self, stage: str, seconds: float, rows_in: Optional[int] = None, rows_out: Optional[int] = None,
+               affected: Optional[dict] = None, **meta) -> Optional[dict]:
+        """
+        Добавляет готовый замер (например, накопленное за несколько порций время чтения файла).
+        rows_per_s считается по rows_out, а если его нет — по rows_in. Возвращает запись.
+        """
+        if not self.enabled:
+            return None
+        rows = rows_out if rows_out is not None else rows_in
+        entry = {
+            'stage': stage,
+            'parent': '/'.join(self._path()) or None,
+            'seconds': round(seconds, 6),
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'rows_per_s': round(rows / seconds, 1) if rows and seconds > 0 else None,
+            'affected': affected,
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'thread': threading.current_thread().name,
+        }
+        entry.update(meta)
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    @contextmanager
+    def stage(self, stage: str, rows_in: Optional[int] = None, **meta) -> Iterator[dict]:
+        """
+        Замеряет блок кода как этап stage. Внутри блока в отдаваемый dict можно дописать
+        'rows_out', 'rows_in' и 'affected' (например, статистику SQL-скрипта) — они попадут в запись.
+        Этап, завершившийся исключением, записывается с полем error.
+        """
+        info = {'rows_in': rows_in, 'rows_out': None, 'affected': None}
+        if not self.enabled:
+            yield info
+            return
+
+        started = time.perf_counter()
+        path = self._path()
+        path.append(stage)
+        error = None
+        try:
+            yield info
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            path.pop()
+            extra = dict(meta)
+            if error is not None:
+                extra['error'] = error
+            self.record(stage, time.perf_counter() - started, info['rows_in'], info['rows_out'], info['affected'],
+                        **extra)
+
+    def summary(self) -> dict:
+        """Итог запуска: команда, общее время, пиковый RSS и сумма времени/строк по именам этапов."""
+        totals = {}
+        for entry in self.records:
+            total = totals.setdefault(entry['stage'], {'count': 0, 'seconds': 0.0, 'rows': 0})
+            total['count'] += 1
+            total['seconds'] += entry['seconds']
+            total['rows'] += entry['rows_out'] if entry['rows_out'] is not None else (entry['rows_in'] or 0)
+        return {
+            'command': self.command,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self._started, 6),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'stages': {
+                name: {**total, 'seconds': round(total['seconds'], 6)}
+                for name, total in sorted(totals.items(), key=lambda item: -item[1]['seconds'])
+            },
+        }
+
+    def write_report(self, path: str, extra: Optional[dict] = None) -> dict:
+        """
+        Пишет JSONL-отчёт: по строке на каждый этап ({"type": "stage", ...})
+        и последней строкой сводку ({"type": "summary", ...}, см. summary). Возвращает сводку.
+        """
+        summary = self.summary()
+        if extra:
+            summary.update(extra)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self.records:
+                f.write(json.dumps({'type': 'stage', **entry}, ensure_ascii=False, default=str) + '\n')
+            f.write(json.dumps({'type': 'summary', **summary}, ensure_ascii=False, default=str) + '\n')
+        return summary
+
+
+@contextmanager
+def profiled(profiler: Optional[str], output_stem: str) -> Iterator[dict]:
+    """
+    Выполняет блок под профилировщиком profiler и сохраняет результат рядом с отчётом:
+      cprofile    — <output_stem>.prof (для pstats/snakeviz) и <output_stem>.prof.txt (топ по cumulative);
+      tracemalloc — <output_stem>.tracemalloc.txt (топ мест распределения памяти).
+    cProfile видит только основной поток. В отдаваемый dict записываются пути файлов
+    и, для tracemalloc, пик отслеживаемой памяти — их удобно добавить в сводку отчёта.
+
+    Параметры:
+    -- profiler: 'cprofile', 'tracemalloc' или None (без профилирования);
+    -- output_stem: путь к файлам профиля без расширения.
+    """
+    info = {}
+    if profiler is None:
+        yield info
+        return
+    if profiler not in PROFILERS:
+        raise ValueError(f"Неизвестный профилировщик '{profiler}'. Допустимые: {', '.join(PROFILERS)}")
+
+    folder = os.path.dirname(output_stem)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    if profiler == "cprofile":
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield info
+        finally:
+            profile.disable()
+            info['profile'] = f"{output_stem}.prof"
+            profile.dump_stats(info['profile'])
+            with open(f"{output_stem}.prof.txt", 'w', encoding='utf-8') as f:
+                pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(50)
+        return
+
+    import tracemalloc
+
+    tracemalloc.start(25)
+    try:
+        yield info
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        info['profile'] = f"{output_stem}.tracemalloc.txt"
+        info['traced_peak_mb'] = round(peak / (1024 * 1024), 1)
+        with open(info['profile'], 'w', encoding='utf-8') as f:
+            f.write(f"Пик отслеживаемой памяти: {info['traced_peak_mb']} МБ\n\n")
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")